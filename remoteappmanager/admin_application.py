@@ -1,20 +1,102 @@
+import re
+
 from tornado import web
+from traitlets import Instance, default
 
 from remoteappmanager.base_application import BaseApplication
+from remoteappmanager.cache import TTLCache
 from remoteappmanager.handlers.api import (
     AdminHomeHandler,
 )
+from remoteappmanager.idle_culler import IdleCuller
+from remoteappmanager.image_synchronizer import ImageSynchronizer
+from remoteappmanager.route_reconciler import RouteReconciler
+from remoteappmanager.utils import without_end_slash
 from remoteappmanager.webapi import admin
 
 
 class AdminApplication(BaseApplication):
     """Tornado main application"""
 
+    #: Stops the idle containers of every user. None if disabled.
+    #: Only the admin application runs it, so that each container is
+    #: checked by a single process.
+    idle_culler = Instance(IdleCuller, allow_none=True)
+
+    #: Keeps the proxy routes in line with the containers of every user.
+    #: None if disabled. Only the admin application runs it.
+    route_reconciler = Instance(RouteReconciler, allow_none=True)
+
+    #: Pulls the missing application images. None if disabled.
+    image_synchronizer = Instance(ImageSynchronizer, allow_none=True)
+
+    #: The outcome of the recently applied accounting batches, by batch
+    #: identifier. Batches are not stored in the database, so their
+    #: outcome can be retrieved only for an hour.
+    accounting_batches = Instance(TTLCache, args=(256, 3600.0))
+
+    @default("image_synchronizer")
+    def _image_synchronizer_default(self):
+        """Initializes the image synchronizer, if enabled."""
+        if not self.file_config.image_sync:
+            return None
+
+        return ImageSynchronizer(
+            container_manager=self.container_manager,
+            async_db=self.async_db,
+            metrics=self.metrics,
+            concurrency=self.file_config.image_sync_concurrency,
+            attempts=self.file_config.image_sync_attempts,
+            interval=self.file_config.image_sync_interval,
+        )
+
+    @default("idle_culler")
+    def _idle_culler_default(self):
+        """Initializes the idle container culler, if any timeout
+        is configured."""
+        if (self.file_config.idle_timeout <= 0 and
+                not self.file_config.idle_timeouts):
+            return None
+
+        return IdleCuller(
+            container_manager=self.container_manager,
+            reverse_proxy=self.reverse_proxy,
+            default_timeout=self.file_config.idle_timeout,
+            timeouts=self.file_config.idle_timeouts,
+            interval=self.file_config.idle_check_interval,
+        )
+
+    @default("route_reconciler")
+    def _route_reconciler_default(self):
+        """Initializes the proxy route reconciler, if enabled."""
+        if self.file_config.route_reconcile_interval <= 0:
+            return None
+
+        return RouteReconciler(
+            container_manager=self.container_manager,
+            reverse_proxy=self.reverse_proxy,
+            interval=self.file_config.route_reconcile_interval,
+            managed_urlpaths=self._managed_urlpaths(),
+        )
+
+    def start(self):
+        if self.image_synchronizer is not None:
+            self.image_synchronizer.start()
+
+        if self.idle_culler is not None:
+            self.idle_culler.start()
+
+        if self.route_reconciler is not None:
+            self.route_reconciler.start()
+
+        super().start()
+
     def _webapi_resources(self):
         return [admin.ContainerHandler,
                 admin.ApplicationHandler,
                 admin.UserHandler,
                 admin.AccountingHandler,
+                admin.AccountingBatchHandler,
                 admin.StatsHandler]
 
     def _web_handlers(self):
@@ -24,3 +106,12 @@ class AdminApplication(BaseApplication):
             (base_urlpath.rstrip('/'),
              web.RedirectHandler, {"url": base_urlpath}),
         ]
+
+    def _managed_urlpaths(self):
+        """Return a regular expression matching the urlpaths of the
+        containers whose routes are reconciled: the containers of every
+        user, which are below the base urlpath of their own user,
+        e.g. /user/<name>/containers/<id>"""
+        users_urlpath = without_end_slash(
+            self.command_line_config.base_urlpath).rsplit("/", 1)[0]
+        return re.escape(users_urlpath) + "/[^/]+/containers/[^/]+"
@@ -1,18 +1,77 @@
-from tornado import web
+from tornado import gen, web
+from tornado.ioloop import IOLoop
+from traitlets import Instance, default
 
 from remoteappmanager.base_application import BaseApplication
+from remoteappmanager.operations import OperationTracker
 from remoteappmanager.handlers.api import (
     UserHomeHandler, RegisterContainerHandler)
 from remoteappmanager.utils import url_path_join, without_end_slash
 from remoteappmanager import webapi
+from remoteappmanager.webapi.container import container_volumes
 
 
 class Application(BaseApplication):
     """Tornado main application"""
 
+    #: The container starts running in background.
+    operations = Instance(OperationTracker)
+
+    @default("operations")
+    def _operations_default(self):
+        return OperationTracker(ttl=self.file_config.operation_ttl)
+
+    def start(self):
+        if self.file_config.warm_pool_policy:
+            IOLoop.current().spawn_callback(self._prefill_warm_pool)
+
+        super().start()
+
+    @gen.coroutine
+    def _prefill_warm_pool(self):
+        """Creates in advance the containers of the applications of the
+        user listed in the warm pool policy, so that their first start
+        uses a pooled container too. The containers are created for the
+        default configurables of the image."""
+        try:
+            accountings = yield self.async_db.get_accounting_for_user(
+                self.user.account)
+        except Exception:
+            self.log.exception("Unable to retrieve the applications of "
+                               "user {}".format(self.user.name))
+            return
+
+        for accounting in accountings:
+            image_name = accounting.application.image
+            if image_name not in self.file_config.warm_pool_policy:
+                continue
+
+            try:
+                image = yield self.container_manager.image(image_name)
+                if image is None:
+                    continue
+
+                environment = {}
+                for img_conf in image.configurables:
+                    environment.update(img_conf.config_dict_to_env(None))
+
+                yield self.container_manager.prefill_warm_pool(
+                    self.user.name,
+                    image_name,
+                    accounting.id,
+                    self.command_line_config.base_urlpath,
+                    container_volumes(self.user.name,
+                                      accounting.application_policy,
+                                      self.log),
+                    environment)
+            except Exception:
+                self.log.exception("Unable to prefill the warm pool for "
+                                   "image {}".format(image_name))
+
     def _webapi_resources(self):
         return [webapi.ApplicationHandler,
-                webapi.ContainerHandler]
+                webapi.ContainerHandler,
+                webapi.OperationHandler]
 
     def _web_handlers(self):
         base_urlpath = self.command_line_config.base_urlpath
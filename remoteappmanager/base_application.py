@@ -1,17 +1,29 @@
 import importlib
+import signal
+from datetime import timedelta
 
 from remoteappmanager.handlers.handler_authenticator import HubAuthenticator
-from traitlets import Instance, default
-from tornado import web
+from traitlets import Instance, Union, default
+from tornado import gen, web, locks
 import tornado.ioloop
 
 from tornadowebapi.registry import Registry
 
+from remoteappmanager.db.async_db import AsyncDatabase
 from remoteappmanager.db.interfaces import ABCDatabase
+from remoteappmanager.db.orm import AdmissionTicket, ORMDatabase
+from remoteappmanager.docker.admission import (
+    AdmissionController, SharedAdmissionController)
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.docker.multi_host_container_manager import (
+    MultiHostContainerManager)
+from remoteappmanager.handlers.api import MetricsHandler, LogoutHandler
+from remoteappmanager.http_client import HTTPClient, configure_http_client
+from remoteappmanager.metrics import MetricsRegistry
 from remoteappmanager.user import User
 from remoteappmanager.traitlets import as_dict
+from remoteappmanager.utils import url_path_join
 from remoteappmanager.services.hub import Hub
 from remoteappmanager.services.reverse_proxy import ReverseProxy
 
@@ -33,6 +45,10 @@ class BaseApplication(web.Application, LoggingMixin):
     #: they can run etc.
     db = Instance(ABCDatabase, allow_none=True)
 
+    #: The accounting system, for use from the request handlers.
+    #: Its methods return futures and do not block the IOLoop.
+    async_db = Instance(AsyncDatabase)
+
     #: API access to the configurable-http-proxy
     reverse_proxy = Instance(ReverseProxy)
 
@@ -42,9 +58,22 @@ class BaseApplication(web.Application, LoggingMixin):
     #: Manages the docker interface
     container_manager = Instance(ContainerManager)
 
+    #: Limits the number of docker images looked up at the same time.
+    image_lookup_slots = Instance(locks.Semaphore)
+
+    #: Limits and orders the container starts.
+    admission_controller = Union([Instance(AdmissionController),
+                                  Instance(SharedAdmissionController)])
+
     #: The WebAPI registry for resources.
     registry = Instance(Registry)
 
+    #: The performance metrics of the application.
+    metrics = Instance(MetricsRegistry, args=())
+
+    #: Performs the HTTP requests to the other services.
+    http_client = Instance(HTTPClient)
+
     @property
     def command_line_config(self):
         return self._command_line_config
@@ -90,19 +119,38 @@ class BaseApplication(web.Application, LoggingMixin):
     @default("container_manager")
     def _container_manager_default(self):
         """Initializes the docker container manager."""
-        return ContainerManager(
+        docker_configs = self.file_config.docker_configs()
+        kwargs = dict(
             realm=self.file_config.docker_realm,
-            docker_config=self.file_config.docker_config()
+            docker_query_workers=self.file_config.docker_query_workers,
+            docker_mutating_workers=self.file_config.docker_mutating_workers,
+            docker_pull_workers=self.file_config.docker_pull_workers,
+            docker_native_client=self.file_config.docker_native_client,
+            docker_event_cache=self.file_config.docker_event_cache,
+            docker_port_resolution=self.file_config.docker_port_resolution,
+            image_cache_size=self.file_config.image_cache_size,
+            image_cache_ttl=self.file_config.image_cache_ttl,
+            warm_pool_policy=self.file_config.warm_pool_policy,
+            warm_pool_max_containers=(
+                self.file_config.warm_pool_max_containers),
+            warm_pool_ttl=self.file_config.warm_pool_ttl,
+            warm_pool_owner=self.command_line_config.user,
+            coalesce_operations=self.file_config.coalesce_operations,
+            metrics=self.metrics,
         )
 
+        if len(docker_configs) > 1:
+            return MultiHostContainerManager(docker_configs, **kwargs)
+
+        return ContainerManager(docker_config=docker_configs[0], **kwargs)
+
     @default("reverse_proxy")
     def _reverse_proxy_default(self):
         """Initializes the reverse proxy connection object."""
-        # Note, we use jupyterhub orm Proxy, but not for database access,
-        # just for interface convenience.
         return ReverseProxy(
             endpoint_url=self.command_line_config.proxy_api_url,
             api_token=self.environment_config.proxy_api_token,
+            http_client=self.http_client,
         )
 
     @default("hub")
@@ -110,6 +158,11 @@ class BaseApplication(web.Application, LoggingMixin):
         """Initializes the Hub instance."""
         return Hub(endpoint_url=self.command_line_config.hub_api_url,
                    api_token=self.environment_config.jpy_api_token,
+                   http_client=self.http_client,
+                   cache_size=self.file_config.hub_auth_cache_size,
+                   cache_ttl=self.file_config.hub_auth_cache_ttl,
+                   negative_cache_ttl=(
+                       self.file_config.hub_auth_negative_cache_ttl),
                    )
 
     @default("db")
@@ -125,6 +178,16 @@ class BaseApplication(web.Application, LoggingMixin):
             self.log.exception(reason)
             raise web.HTTPError(reason=reason)
 
+    @default("async_db")
+    def _async_db_default(self):
+        """Initializes the asynchronous access to the database."""
+        return AsyncDatabase(self.db,
+                             max_workers=self.file_config.database_workers)
+
+    @default("image_lookup_slots")
+    def _image_lookup_slots_default(self):
+        return locks.Semaphore(self.file_config.image_lookup_concurrency)
+
     @default("user")
     def _user_default(self):
         """Initializes the user at the database level."""
@@ -133,6 +196,38 @@ class BaseApplication(web.Application, LoggingMixin):
         user.account = self.db.get_user(user_name=user_name)
         return user
 
+    @default("admission_controller")
+    def _admission_controller_default(self):
+        """Initializes the admission controller. The limits on the starts
+        in progress and waiting apply to all the processes, which share
+        them through the database. The quota of the user alone does not
+        need sharing, as each user has its own process."""
+        kwargs = dict(
+            max_concurrent=self.file_config.admission_max_concurrent,
+            max_queued=self.file_config.admission_max_queued,
+            user_quota=self.file_config.admission_user_quota,
+        )
+
+        if kwargs["max_concurrent"] <= 0 and kwargs["max_queued"] <= 0:
+            return AdmissionController(**kwargs)
+
+        if self._has_admission_tickets():
+            return SharedAdmissionController(database=self.db.db, **kwargs)
+
+        self.log.warning("The database can not hold the admission tickets. "
+                         "The container start limits apply to each process "
+                         "separately. If the database is an outdated "
+                         "sqlite database, upgrade it with remoteappdb.")
+        return AdmissionController(**kwargs)
+
+    @default("http_client")
+    def _http_client_default(self):
+        return HTTPClient(
+            connect_timeout=self.file_config.http_connect_timeout,
+            request_timeout=self.file_config.http_request_timeout,
+            metrics=self.metrics,
+        )
+
     @default("registry")
     def _registry_default(self):
         reg = Registry()
@@ -144,6 +239,10 @@ class BaseApplication(web.Application, LoggingMixin):
     # Public
     def start(self):
         """Start the application and the ioloop"""
+        http_client_impl = configure_http_client(
+            max_clients=self.file_config.http_max_clients,
+            use_curl=self.file_config.http_use_curl)
+        self.log.info("Using the {} HTTP client".format(http_client_impl))
 
         self.log.info("Starting server with options:")
         for trait_name in self._command_line_config.trait_names():
@@ -158,9 +257,29 @@ class BaseApplication(web.Application, LoggingMixin):
 
         self.listen(self.command_line_config.port)
 
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._signal_received)
+
         tornado.ioloop.IOLoop.current().start()
 
+    @gen.coroutine
+    def stop(self):
+        """Removes the containers created in advance by the warm pool,
+        then stops the ioloop."""
+        try:
+            yield gen.with_timeout(
+                timedelta(seconds=self.file_config.network_timeout),
+                self.container_manager.drain_warm_pool())
+        except Exception:
+            self.log.exception("Unable to remove the pooled containers")
+        finally:
+            tornado.ioloop.IOLoop.current().stop()
+
     # Private
+    def _signal_received(self, signum, frame):
+        self.log.info("Received signal {}, shutting down".format(signum))
+        tornado.ioloop.IOLoop.current().add_callback_from_signal(self.stop)
+
     def _webapi_resources(self):
         """Return a list of resources to be exported by the Web API.
         Reimplement this in subclasses to export specific resources"""
@@ -171,9 +290,25 @@ class BaseApplication(web.Application, LoggingMixin):
         Reimplement this in subclasses to export the specified endpoints"""
         return []
 
+    def _has_admission_tickets(self):
+        """Return True if the database is shared by the processes and
+        has the admission ticket table."""
+        # The in-memory databases are private to each process.
+        if not isinstance(self.db, ORMDatabase) or not self.db.blocking:
+            return False
+
+        engine = self.db.db.engine
+        with engine.connect() as connection:
+            return engine.dialect.has_table(connection,
+                                            AdmissionTicket.__tablename__)
+
     def _get_handlers(self):
         """Returns the registered handlers"""
         base_urlpath = self.command_line_config.base_urlpath
         web_api = self.registry.api_handlers(base_urlpath)
         web_handlers = self._web_handlers()
-        return web_api+web_handlers
+        common_handlers = [
+            (url_path_join(base_urlpath, "metrics"), MetricsHandler),
+            (url_path_join(base_urlpath, "logout"), LogoutHandler),
+        ]
+        return web_api+common_handlers+web_handlers
@@ -0,0 +1,114 @@
+import collections
+import time
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire after a given time.
+
+    When the cache is full, the least recently used entry is evicted to
+    make room for a new one. Expired entries are never returned, and are
+    purged lazily.
+
+    This class is not thread safe.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        """Initialises the cache.
+
+        Parameters
+        ----------
+        maxsize: int
+            The maximum number of entries. Must be positive.
+        ttl: float
+            The default time (in seconds) after which an entry expires.
+        timer: callable
+            A function returning the current time in seconds. Useful for
+            testing.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+
+        # key -> (expiration time, value), least recently used first.
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns the value associated to the key, or the default if
+        the key is not present or expired."""
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            return default
+
+        if expires_at <= self._timer():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Associates a value to a key.
+
+        Parameters
+        ----------
+        key: hashable
+            The key
+        value: object
+            The value
+        ttl: float or None
+            The time (in seconds) after which the entry expires. If None,
+            the cache default is used.
+        """
+        if ttl is None:
+            ttl = self.ttl
+
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+
+        self._entries[key] = (self._timer() + ttl, value)
+
+    def pop(self, key, default=None):
+        """Removes a key and returns its value, or the default if the
+        key is not present or expired."""
+        try:
+            expires_at, value = self._entries.pop(key)
+        except KeyError:
+            return default
+
+        if expires_at <= self._timer():
+            return default
+
+        return value
+
+    def items(self):
+        """Returns a list of the (key, value) pairs that are not
+        expired."""
+        self.purge()
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def purge(self):
+        """Removes the expired entries."""
+        now = self._timer()
+        for key in [key for key, (expires_at, _) in self._entries.items()
+                    if expires_at <= now]:
+            del self._entries[key]
+
+    def clear(self):
+        """Removes all the entries."""
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        self.purge()
+        return len(self._entries)
+
+
+#: Marker for missing entries.
+_MISSING = object()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 """Script to perform operations on the database of our application."""
+import csv
 import os
 import sys
 import uuid
@@ -9,10 +10,23 @@ import sqlalchemy.exc
 import sqlalchemy.orm.exc
 import click
 import tabulate
+from alembic import command as alembic_command
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
 
-from remoteappmanager.db import orm
+from remoteappmanager.db import exceptions, orm
 from remoteappmanager.utils import parse_volume_string
 
+#: The directory of the alembic migration scripts.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(orm.__file__), "alembic")
+
+#: The migration matching the tables of a database that was initialised
+#: before the migrations were introduced, most recent table first.
+UNVERSIONED_SCHEMAS = [
+    ("revision", "5e2f8a1d3c60"),
+    ("user", "1a0c4b5e9d27"),
+]
+
 
 def sqlite_url_to_path(url):
     """Converts a sqlalchemy sqlite url to the disk path.
@@ -68,6 +82,94 @@ def database(db_url):
     return orm.Database(url=db_url)
 
 
+def alembic_config(db_url):
+    """Returns the alembic configuration to migrate a database.
+
+    Parameters
+    ----------
+    db_url : str
+        A string containing a db sqlalchemy url.
+
+    Returns
+    -------
+    alembic.config.Config instance.
+    """
+    config = AlembicConfig()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    # Escape the interpolation character, e.g. in url-encoded passwords.
+    config.set_main_option("sqlalchemy.url", db_url.replace("%", "%%"))
+    return config
+
+
+def unversioned_revision(db):
+    """Returns the migration matching the tables of a database initialised
+    before the migrations were introduced.
+
+    Parameters
+    ----------
+    db : orm.Database
+        The database
+
+    Returns
+    -------
+    str or None
+        The migration, or None if the database keeps track of its
+        migrations, or is empty.
+    """
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        if context.get_current_revision() is not None:
+            return None
+
+        for table, revision in UNVERSIONED_SCHEMAS:
+            if db.engine.dialect.has_table(connection, table):
+                return revision
+
+    return None
+
+
+def read_grants(grants_file, allow_home=False, allow_view=False,
+                volume=None):
+    """Reads the grants from a CSV file.
+
+    Parameters
+    ----------
+    grants_file: file
+        The CSV file. The header must contain the image and user columns,
+        and may contain the allow_home, allow_view and volume columns.
+    allow_home, allow_view, volume:
+        The policy of the grants, if the file does not specify it.
+
+    Returns
+    -------
+    list
+        A list of dictionaries, with the arguments of grant_access.
+    """
+    reader = csv.DictReader(grants_file)
+    missing = {"image", "user"} - set(reader.fieldnames or [])
+    if missing:
+        raise click.BadParameter(
+            "Missing columns {}".format(", ".join(sorted(missing))),
+            param_hint="--from-file")
+
+    def flag(value, default):
+        if value is None or value.strip() == "":
+            return default
+        return value.strip().lower() in ("1", "true", "yes")
+
+    grants = []
+    for row in reader:
+        grants.append(dict(
+            app_name=row["image"].strip(),
+            user_name=row["user"].strip(),
+            allow_home=flag(row.get("allow_home"), allow_home),
+            allow_view=flag(row.get("allow_view"), allow_view),
+            volume=(row.get("volume") or "").strip() or volume,
+        ))
+
+    return grants
+
+
 def print_error(error):
     """Prints an error message to stderr"""
     print("Error: {}".format(error), file=sys.stderr)
@@ -149,6 +251,29 @@ def init(ctx):
                                "at {}".format(db_url))
     db.reset()
 
+    # The tables are already the latest ones.
+    alembic_command.stamp(alembic_config(db_url), "head")
+
+
+@cli.command()
+@click.option("--revision", default="head",
+              help="The migration to upgrade to. Defaults to the latest.")
+@click.pass_context
+def upgrade(ctx, revision):
+    """Migrates the database to the latest schema."""
+    db = ctx.obj.db
+    db_url = db.url
+
+    if is_sqlitedb_url(db_url) and not sqlitedb_present(db_url):
+        raise click.UsageError("Could not find database at {}".format(db_url))
+
+    config = alembic_config(db_url)
+    current = unversioned_revision(db)
+    if current is not None:
+        alembic_command.stamp(config, current)
+
+    alembic_command.upgrade(config, revision)
+
 
 # -------------------------------------------------------------------------
 # User commands
@@ -200,6 +325,7 @@ def remove(ctx, user):
                 orm.User.name == user).one()
 
             session.delete(orm_user)
+            orm.bump_revision(session)
 
     except sqlalchemy.orm.exc.NoResultFound:
         print_error("Could not find user {}".format(user))
@@ -311,6 +437,7 @@ def remove(ctx, image):
                 orm.Application.image == image).one()
 
             session.delete(app)
+            orm.bump_revision(session)
     except sqlalchemy.orm.exc.NoResultFound:
         print_error("Could not find application for image {}".format(image))
 
@@ -338,8 +465,8 @@ def list(ctx, no_decoration):
 
 
 @app.command()
-@click.argument("image")
-@click.argument("user")
+@click.argument("image", required=False)
+@click.argument("user", required=False)
 @click.option("--allow-home",
               is_flag=True,
               help="Enable mounting of home directory")
@@ -349,10 +476,33 @@ def list(ctx, no_decoration):
 @click.option("--volume", type=click.STRING,
               help="Application data volume, format=SOURCE:TARGET:MODE, "
                    "where mode is 'ro' or 'rw'.")
+@click.option("--from-file", type=click.File("r"),
+              help="CSV file with the grants, one per row, instead of "
+                   "IMAGE and USER. The header must contain the image and "
+                   "user columns, and may contain allow_home, allow_view "
+                   "and volume, that override the options.")
 @click.pass_context
-def grant(ctx, image, user, allow_home, allow_view, volume):
+def grant(ctx, image, user, allow_home, allow_view, volume, from_file):
     """Grants access to application identified by IMAGE to a specific
     user USER and specified access policy."""
+    if from_file is not None:
+        if image is not None or user is not None:
+            raise click.UsageError(
+                "IMAGE and USER cannot be used with --from-file")
+
+        grants = read_grants(from_file, allow_home, allow_view, volume)
+
+        session = ctx.obj.session
+        try:
+            with orm.transaction(session):
+                orm.grant_access_bulk(session, grants)
+        except (exceptions.NotFound, ValueError) as e:
+            raise click.BadParameter(str(e), param_hint="--from-file")
+        return
+
+    if image is None or user is None:
+        raise click.UsageError("IMAGE and USER are required")
+
     allow_common = False
     source = target = mode = None
 
@@ -414,6 +564,7 @@ def grant(ctx, image, user, allow_home, allow_view, volume):
                 application_policy=orm_policy,
             )
             session.add(accounting)
+            orm.bump_revision(session)
 
 
 @app.command()
@@ -476,6 +627,8 @@ def revoke(ctx, image, user, revoke_all, allow_home, allow_view, volume):
                 orm.Accounting.application_policy == orm_policy,
             ).delete()
 
+        orm.bump_revision(session)
+
 
 def main():
     cli(obj={})
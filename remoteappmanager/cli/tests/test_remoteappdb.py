@@ -1,10 +1,17 @@
+import contextlib
 import os
 from tornado.testing import LogTrapTestCase
 from unittest import mock
 
+import sqlalchemy
+from alembic import command as alembic_command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from click.testing import CliRunner
 
 from remoteappmanager.cli.remoteappdb import __main__ as remoteappdb
+from remoteappmanager.db import orm
 from remoteappmanager.tests.temp_mixin import TempMixin
 from remoteappmanager.tests.mocking.virtual.docker_client import (
     VirtualDockerClient)
@@ -47,6 +54,67 @@ class TestRemoteAppDbCLI(TempMixin, LogTrapTestCase):
         exit_code, output = self._remoteappdb("init")
         self.assertNotEqual(exit_code, 0)
 
+    def test_init_is_up_to_date(self):
+        db_url = "sqlite:///"+self.db
+        self.assertEqual(self._current_revision(), self._head_revision())
+
+        # Nothing to do
+        exit_code, _ = self._remoteappdb("upgrade")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._current_revision(), self._head_revision())
+        self._assert_schema_matches_orm(db_url)
+
+    def test_upgrade_from_empty(self):
+        db_url = "sqlite:///"+self.db
+        os.remove(self.db)
+        open(self.db, "w").close()
+
+        exit_code, _ = self._remoteappdb("upgrade")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._current_revision(), self._head_revision())
+        self._assert_schema_matches_orm(db_url)
+
+    def test_upgrade_unversioned(self):
+        db_url = "sqlite:///"+self.db
+        os.remove(self.db)
+
+        # A database as created by init before the migrations.
+        engine = sqlalchemy.create_engine(db_url)
+        alembic_command.upgrade(remoteappdb.alembic_config(db_url),
+                                "1a0c4b5e9d27")
+        engine.execute("DROP TABLE alembic_version")
+        engine.execute("INSERT INTO user (name) VALUES ('foo')")
+
+        exit_code, _ = self._remoteappdb("upgrade")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self._current_revision(), self._head_revision())
+        self._assert_schema_matches_orm(db_url)
+
+        _, out = self._remoteappdb("user list")
+        self.assertIn("foo", out)
+
+        indexes = {index["name"]
+                   for index in sqlalchemy.inspect(engine).get_indexes(
+                       "application_policy")}
+        self.assertIn("ix_application_policy_values", indexes)
+
+    def _current_revision(self):
+        engine = sqlalchemy.create_engine("sqlite:///"+self.db)
+        with engine.connect() as connection:
+            return MigrationContext.configure(
+                connection).get_current_revision()
+
+    def _head_revision(self):
+        config = remoteappdb.alembic_config("sqlite:///"+self.db)
+        return ScriptDirectory.from_config(config).get_current_head()
+
+    def _assert_schema_matches_orm(self, db_url):
+        engine = sqlalchemy.create_engine(db_url)
+        with engine.connect() as connection:
+            diff = compare_metadata(MigrationContext.configure(connection),
+                                    orm.Base.metadata)
+        self.assertEqual(diff, [])
+
     def test_user_create(self):
         _, out = self._remoteappdb("user create foo")
         self.assertEqual(out, "1\n")
@@ -110,6 +178,70 @@ class TestRemoteAppDbCLI(TempMixin, LogTrapTestCase):
         self.assertIn("froble", out)
         self.assertIn(" ro\n", out)
 
+    def test_app_grant_from_file(self):
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("app create otherapp --no-verify")
+        self._remoteappdb("user create user1")
+        self._remoteappdb("user create user2")
+
+        grants_file = os.path.join(self.tempdir, "grants.csv")
+        with open(grants_file, "w") as f:
+            f.write("image,user,allow_view,volume\n"
+                    "myapp,user1,,\n"
+                    "otherapp,user1,1,\n"
+                    "myapp,user2,0,frobniz:froble:ro\n")
+
+        exit_code, _ = self._remoteappdb(
+            "app grant --allow-home --from-file " + grants_file)
+        self.assertEqual(exit_code, 0)
+
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        rows = [row.split() for row in out.splitlines()]
+        # Columns: home, view, common, volume
+        self.assertEqual(rows, [
+            ["1", "user1", "myapp", "1", "0", "0"],
+            ["otherapp", "1", "1", "0"],
+            ["2", "user2", "myapp", "1", "0", "1",
+             "frobniz", "froble", "ro"],
+        ])
+
+        # Granting again does not add anything
+        self._remoteappdb("app grant --allow-home --from-file " + grants_file)
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertEqual(len(out.splitlines()), 3)
+
+    def test_app_grant_from_file_errors(self):
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("user create user1")
+
+        grants_file = os.path.join(self.tempdir, "grants.csv")
+        with open(grants_file, "w") as f:
+            f.write("image,user\n"
+                    "myapp,user1\n"
+                    "myapp,unknown\n")
+
+        exit_code, out = self._remoteappdb(
+            "app grant --from-file " + grants_file)
+        self.assertEqual(exit_code, 2)
+        self.assertIn("user unknown", out)
+
+        # Nothing has been granted
+        _, out = self._remoteappdb("user list --show-apps")
+        self.assertNotIn("myapp", out)
+
+        with open(grants_file, "w") as f:
+            f.write("image\nmyapp\n")
+        exit_code, _ = self._remoteappdb(
+            "app grant --from-file " + grants_file)
+        self.assertEqual(exit_code, 2)
+
+        exit_code, _ = self._remoteappdb(
+            "app grant myapp user1 --from-file " + grants_file)
+        self.assertEqual(exit_code, 2)
+
+        exit_code, _ = self._remoteappdb("app grant myapp")
+        self.assertEqual(exit_code, 2)
+
     def test_app_revoke(self):
         self._remoteappdb("app create myapp --no-verify")
         self._remoteappdb("user create user")
@@ -142,6 +274,28 @@ class TestRemoteAppDbCLI(TempMixin, LogTrapTestCase):
         self.assertIn("frobniz", out)
         self.assertIn("froble", out)
 
+    def test_changes_bump_revision(self):
+        def revision():
+            db = remoteappdb.database("sqlite:///"+self.db)
+            with contextlib.closing(db.create_session()) as session:
+                return session.query(orm.Revision.value).scalar()
+
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("user create user")
+        self.assertEqual(revision(), 0)
+
+        self._remoteappdb("app grant myapp user")
+        self.assertEqual(revision(), 1)
+
+        self._remoteappdb("app revoke myapp user")
+        self.assertEqual(revision(), 2)
+
+        self._remoteappdb("user remove user")
+        self.assertEqual(revision(), 3)
+
+        self._remoteappdb("app remove myapp")
+        self.assertEqual(revision(), 4)
+
     def test_delete_user_cascade(self):
         """ Test if deleting user cascade to deleting accounting rows
         """
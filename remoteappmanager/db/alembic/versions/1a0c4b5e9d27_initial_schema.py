@@ -0,0 +1,68 @@
+"""Initial schema
+
+Revision ID: 1a0c4b5e9d27
+Revises:
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a0c4b5e9d27'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.Unicode(), nullable=True),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_user_name', 'user', ['name'], unique=True)
+
+    op.create_table(
+        'application',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('image', sa.Unicode(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('image'))
+
+    op.create_table(
+        'application_policy',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('allow_home', sa.Boolean(), nullable=True),
+        sa.Column('allow_common', sa.Boolean(), nullable=True),
+        sa.Column('allow_view', sa.Boolean(), nullable=True),
+        sa.Column('volume_source', sa.Unicode(), nullable=True),
+        sa.Column('volume_target', sa.Unicode(), nullable=True),
+        sa.Column('volume_mode', sa.Enum('ro', 'rw'), nullable=True),
+        sa.PrimaryKeyConstraint('id'))
+
+    op.create_table(
+        'accounting',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('application_id', sa.Integer(), nullable=True),
+        sa.Column('application_policy_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['application_id'], ['application.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['application_policy_id'],
+                                ['application_policy.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'application_id',
+                            'application_policy_id'))
+
+
+def downgrade():
+    op.drop_table('accounting')
+    op.drop_table('application_policy')
+    op.drop_table('application')
+    op.drop_index('ix_user_name', table_name='user')
+    op.drop_table('user')
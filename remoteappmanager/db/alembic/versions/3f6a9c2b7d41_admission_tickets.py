@@ -0,0 +1,36 @@
+"""Admission tickets shared by the processes
+
+Revision ID: 3f6a9c2b7d41
+Revises: 9b7d6c3e4a18
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a9c2b7d41'
+down_revision = '9b7d6c3e4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'admission_ticket',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('user_name', sa.Unicode(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.Column('turn', sa.Float(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_admission_ticket_user_name', 'admission_ticket',
+                    ['user_name'])
+
+
+def downgrade():
+    op.drop_index('ix_admission_ticket_user_name',
+                  table_name='admission_ticket')
+    op.drop_table('admission_ticket')
@@ -0,0 +1,30 @@
+"""Accounting revision counter
+
+Revision ID: 5e2f8a1d3c60
+Revises: 1a0c4b5e9d27
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2f8a1d3c60'
+down_revision = '1a0c4b5e9d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    revision_table = op.create_table(
+        'revision',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+
+    op.bulk_insert(revision_table, [{'id': 1, 'value': 0}])
+
+
+def downgrade():
+    op.drop_table('revision')
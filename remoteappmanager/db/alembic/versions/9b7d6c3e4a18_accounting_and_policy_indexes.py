@@ -0,0 +1,33 @@
+"""Indexes for the accounting and policy lookups
+
+Revision ID: 9b7d6c3e4a18
+Revises: 5e2f8a1d3c60
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9b7d6c3e4a18'
+down_revision = '5e2f8a1d3c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_accounting_application_id', 'accounting',
+                    ['application_id'])
+    op.create_index('ix_accounting_application_policy_id', 'accounting',
+                    ['application_policy_id'])
+    op.create_index('ix_application_policy_values', 'application_policy',
+                    ['allow_home', 'allow_common', 'allow_view',
+                     'volume_source', 'volume_target', 'volume_mode'])
+
+
+def downgrade():
+    op.drop_index('ix_application_policy_values',
+                  table_name='application_policy')
+    op.drop_index('ix_accounting_application_policy_id',
+                  table_name='accounting')
+    op.drop_index('ix_accounting_application_id', table_name='accounting')
@@ -0,0 +1,92 @@
+import functools
+
+from tornado.concurrent import Future, chain_future
+from tornado.ioloop import IOLoop
+
+from remoteappmanager.db.interfaces import ABCDatabase
+from remoteappmanager.executor_lane import ExecutorLane
+
+#: The ABCDatabase methods made available by AsyncDatabase.
+DATABASE_METHODS = frozenset(ABCDatabase.__abstractmethods__) | frozenset([
+    "grant_access_bulk",
+    "revoke_access_bulk",
+])
+
+
+class AsyncDatabase:
+    """Provides an asynchronous interface to an ABCDatabase.
+    All the ABCDatabase methods are available, returning a future
+    instead of the actual result. The resulting future can be yielded.
+
+    This class is thread safe, provided that the wrapped database
+    can be used from multiple threads.
+    """
+
+    def __init__(self, db, max_workers=4):
+        """Initialises the async database.
+
+        The calls to a blocking database (see ABCDatabase.blocking) are
+        executed by a bounded pool of threads, so that a slow query
+        does not stall the IOLoop. The calls to a non blocking database
+        are executed immediately.
+
+        Parameters
+        ----------
+        db: ABCDatabase
+            The synchronous database.
+        max_workers: int
+            The number of threads executing the database calls.
+        """
+        self.db = db
+        self._lane = ExecutorLane("database", max_workers)
+
+    def __getattr__(self, attr):
+        """Returns the database method, wrapped in an async execution
+        environment. The returned method must be used in conjunction with
+        the yield keyword."""
+        if attr in DATABASE_METHODS:
+            return functools.partial(self._submit, attr)
+
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(
+                type(self).__name__,
+                attr
+            )
+        )
+
+    def stats(self):
+        """Returns the statistics of the worker pool, as returned by
+        ExecutorLane.stats()"""
+        return self._lane.stats()
+
+    # Private
+
+    def _submit(self, method, *args, **kwargs):
+        """Calls a database method, in a worker thread if the database
+        is blocking.
+
+        Parameters
+        ----------
+        method : str
+            The name of the ABCDatabase method
+        *args, **kwargs:
+            Arguments to the invoked method
+
+        Return
+        ------
+        A tornado future, holding the result or the exception of the call.
+        """
+        func = getattr(self.db, method)
+        future = Future()
+
+        if not getattr(self.db, "blocking", True):
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        IOLoop.current().add_future(
+            self._lane.submit(func, *args, **kwargs),
+            lambda executor_future: chain_future(executor_future, future))
+        return future
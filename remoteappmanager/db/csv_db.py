@@ -90,6 +90,9 @@ class CSVDatabase(ABCDatabase):
     remoteappmanager.  Currently only accepts one csv file.
     """
 
+    #: The records are read at startup and kept in memory.
+    blocking = False
+
     def __init__(self, csv_file_path, **kwargs):
         """ Initialiser
 
@@ -68,6 +68,11 @@ class ABCDatabase(metaclass=ABCMeta):
     """ Main accounting interface required by the single user application.
     """
 
+    #: True if the methods can block on I/O (e.g. a database server or
+    #: file). AsyncDatabase executes the calls to a blocking database
+    #: in a worker thread, and the others straight on the IOLoop.
+    blocking = True
+
     @abstractmethod
     def get_user(self, *, user_name=None, id=None):
         """ Return a User for a given user_name or id, or return
@@ -269,3 +274,55 @@ class ABCDatabase(metaclass=ABCMeta):
     @abstractmethod
     def revoke_access_by_id(self, mapping_id):
         """Like revoke_access, but uses the mapping id instead."""
+
+    def grant_access_bulk(self, grants):
+        """Grant access to many users and applications at once.
+
+        The default implementation invokes grant_access for each grant.
+        Backends should override it to perform all the grants in a
+        single transaction, that fails as a whole.
+
+        Parameters
+        ----------
+        grants: list
+            A list of dictionaries, each with the arguments of
+            grant_access: app_name, user_name, allow_home, allow_view
+            and volume.
+
+        Raises
+        ------
+        exception.NotFound:
+            if any app or user are not found.
+        ValueError:
+            if any volume string is invalid.
+
+        Returns
+        -------
+        ids : list
+            The mapping ids, in the same order as the grants.
+        """
+        return [self.grant_access(**grant) for grant in grants]
+
+    def revoke_access_bulk(self, grants):
+        """Revoke access to many users and applications at once.
+
+        The default implementation invokes revoke_access for each grant.
+        Backends should override it to perform all the revocations in a
+        single transaction, that fails as a whole.
+
+        Parameters
+        ----------
+        grants: list
+            A list of dictionaries, each with the arguments of
+            revoke_access: app_name, user_name, allow_home, allow_view
+            and volume.
+
+        Raises
+        ------
+        exception.NotFound:
+            if any app, user or policy are not found.
+        ValueError:
+            if any volume string is invalid.
+        """
+        for grant in grants:
+            self.revoke_access(**grant)
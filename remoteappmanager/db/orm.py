@@ -1,15 +1,22 @@
+import collections
 import contextlib
+import functools
+import threading
+import time
 import uuid
 import os
+import weakref
 
 from sqlalchemy import (
-    Column, Integer, Boolean, String, Unicode, ForeignKey, UniqueConstraint,
-    create_engine, Enum, event)
+    Column, Integer, Boolean, Float, String, Unicode, ForeignKey,
+    UniqueConstraint, Index, create_engine, Enum, event, and_, or_)
 from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import OperationalError, IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, joinedload
 from sqlalchemy.orm.exc import DetachedInstanceError, NoResultFound
+from sqlalchemy.pool import QueuePool
 
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.db.interfaces import ABCDatabase
@@ -72,6 +79,13 @@ class ApplicationPolicy(IdMixin, Base):
     # In which mode
     volume_mode = Column(Enum("ro", "rw"), nullable=True)
 
+    # grant_access and revoke_access look up the policy by all its values.
+    __table_args__ = (
+        Index("ix_application_policy_values",
+              "allow_home", "allow_common", "allow_view",
+              "volume_source", "volume_target", "volume_mode"),
+    )
+
 
 class Accounting(Base):
     """Holds the information about who is allowed to run what."""
@@ -99,11 +113,56 @@ class Accounting(Base):
 
     application_policy = relationship("ApplicationPolicy")
 
+    # The unique constraint also serves the lookups by user_id, and by
+    # user_id and application_id. The other two indexes serve the lookups
+    # by application and the cascading deletes.
     __table_args__ = (
         UniqueConstraint('user_id', 'application_id', 'application_policy_id'),
+        Index("ix_accounting_application_id", "application_id"),
+        Index("ix_accounting_application_policy_id", "application_policy_id"),
     )
 
 
+class Revision(Base):
+    """Counts the changes to the accounting, so that the processes
+    sharing the database can tell if their cached accounting is stale.
+    Holds a single row."""
+    __tablename__ = "revision"
+
+    id = Column(Integer, primary_key=True)
+
+    #: Incremented by every change to the accounting.
+    value = Column(Integer, nullable=False, default=0)
+
+
+class AdmissionTicket(Base):
+    """A container start, waiting for or holding one of the start slots
+    shared by the processes using the database.
+    See remoteappmanager.docker.admission.SharedAdmissionController."""
+    __tablename__ = "admission_ticket"
+
+    id = Column(String(32), primary_key=True)
+
+    #: The user starting the container.
+    user_name = Column(Unicode, nullable=False, index=True)
+
+    #: True if the ticket holds a start slot, False if it is waiting.
+    active = Column(Boolean, nullable=False, default=False)
+
+    #: When the ticket was issued. The oldest tickets of a user are
+    #: served first.
+    created_at = Column(Float, nullable=False)
+
+    #: The turn of the user in the rotation. The user whose waiting ticket
+    #: has the lowest turn is served first. Moved to the current time when
+    #: another start of the user is admitted.
+    turn = Column(Float, nullable=False)
+
+    #: The ticket is discarded after this time, unless renewed, so that
+    #: a process that died does not hold its slots forever.
+    expires_at = Column(Float, nullable=False)
+
+
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     """ Set pragma for sqlite3 when the engine connects
@@ -122,14 +181,60 @@ def _set_sqlite_pragma(dbapi_connection, connection_record):
                 cursor.execute("PRAGMA foreign_keys=ON")
 
 
+#: The pragmas of the sqlite performance profiles, in the order they are
+#: executed on each new connection.
+SQLITE_PROFILES = {
+    # The sqlite defaults.
+    "default": [],
+
+    # For a database shared by many processes: the readers do not block
+    # the writer, and the writers wait for each other instead of failing
+    # with "database is locked". Requires a local filesystem.
+    "concurrent": [
+        ("busy_timeout", 10000),
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("mmap_size", 64 * 1024 * 1024),
+    ],
+}
+
+
+def _is_sqlite_file(url):
+    """Returns True if the url refers to a sqlite database file."""
+    url = make_url(url)
+    return (url.get_backend_name() == "sqlite" and
+            url.database not in (None, "", ":memory:"))
+
+
+def _set_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    """Executes the given pragmas on a new sqlite connection."""
+    with contextlib.closing(dbapi_connection.cursor()) as cursor:
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA {}={}".format(name, value))
+
+
+# Engine -> True if the database has the revision table.
+_revision_tables = weakref.WeakKeyDictionary()
+_revision_tables_lock = threading.Lock()
+
+
 class Database(LoggingMixin):
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, sqlite_profile="default", sqlite_pragmas=None,
+                 **kwargs):
         """Initialises a database connection to a given database url.
 
         Parameters
         ----------
         url : url
             A sqlalchemy url to connect to a specified database.
+        sqlite_profile : str
+            The performance profile of a sqlite database file, one of
+            SQLITE_PROFILES. The "concurrent" profile also keeps the
+            connections open in a pool, so that they are configured
+            only once. Ignored for the other databases.
+        sqlite_pragmas : dict or None
+            Additional pragmas for a sqlite database file, e.g.
+            {"busy_timeout": 30000}. They override the profile ones.
         kwargs : dict
             Additional keys will be passed at create_engine.
         """
@@ -137,9 +242,27 @@ class Database(LoggingMixin):
 
         self.url = url
 
+        if sqlite_profile not in SQLITE_PROFILES:
+            raise ValueError(
+                "Unknown sqlite profile {}. Expected one of {}".format(
+                    sqlite_profile, ", ".join(sorted(SQLITE_PROFILES))))
+
+        pragmas = collections.OrderedDict(SQLITE_PROFILES[sqlite_profile])
+        pragmas.update(sqlite_pragmas or {})
+
         self.log.info("Creating session to db: {}".format(self.url))
+        if _is_sqlite_file(self.url) and sqlite_profile != "default":
+            # Each connection is used by one thread at a time.
+            kwargs.setdefault("poolclass", QueuePool)
+            kwargs.setdefault("connect_args", {}).setdefault(
+                "check_same_thread", False)
+
         self.engine = create_engine(self.url, **kwargs)
 
+        if _is_sqlite_file(self.url) and len(pragmas):
+            event.listen(self.engine, "connect",
+                         functools.partial(_set_sqlite_pragmas, pragmas))
+
         try:
             self.session_class = sessionmaker(bind=self.engine)
         except OperationalError:
@@ -162,11 +285,17 @@ class Database(LoggingMixin):
         Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
 
+        with _revision_tables_lock:
+            _revision_tables[self.engine] = True
+
+        with detached_session(self) as session, transaction(session):
+            session.add(Revision(id=1, value=0))
+
 
 @mergedocs(ABCDatabase)
 class ORMDatabase(ABCDatabase):
 
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, accounting_cache_ttl=5.0, **kwargs):
         ''' Initialiser
 
         Parameters
@@ -174,6 +303,11 @@ class ORMDatabase(ABCDatabase):
         url : str
             the url for connecting to a database
 
+        accounting_cache_ttl : float
+            the time (in seconds) the accounting of a user is served from
+            memory, before checking the database for changes. 0 disables
+            the cache.
+
         **kwargs
             optional keyword arguments for `Database`
 
@@ -185,6 +319,26 @@ class ORMDatabase(ABCDatabase):
         self.db = Database(url, **kwargs)
         self.check_database_readable()
 
+        # SQLAlchemy gives each thread its own in-memory sqlite database,
+        # so the queries to it must stay in the thread that created it.
+        engine_url = self.db.engine.url
+        self.blocking = (engine_url.get_backend_name() != "sqlite" or
+                         _is_sqlite_file(engine_url))
+
+        self.accounting_cache_ttl = accounting_cache_ttl
+
+        # user name -> (revision, expiration time, accountings)
+        self._accounting_cache = {}
+        self._accounting_cache_lock = threading.Lock()
+
+        # Incremented by every local change, so that an accounting loaded
+        # before the change is not cached after it.
+        self._accounting_generation = 0
+
+        # Databases created before the revision table was introduced
+        # are cached for the TTL only.
+        self._has_revision = has_revision_table(self.db.engine)
+
     def check_database_readable(self):
         ''' Raise IOError if the database url points to a sqlite database
         that is not readable
@@ -227,17 +381,36 @@ class ORMDatabase(ABCDatabase):
         return user
 
     def get_accounting_for_user(self, user):
-        # We create a session here to make sure it is only
-        # used in one thread
-        with contextlib.closing(self.db.create_session()) as session:
-            result = accounting_for_user(session, user)
+        if user is None or self.accounting_cache_ttl <= 0:
+            return self._load_accounting(user)
 
-            # Removing internal references to the session is
-            # required such that the objects can be reused
-            # in a different thread
-            session.expunge_all()
+        try:
+            key = user.name
+        except DetachedInstanceError:
+            return self._load_accounting(user)
 
-        return result
+        with self._accounting_cache_lock:
+            entry = self._accounting_cache.get(key)
+            generation = self._accounting_generation
+
+        if entry is not None:
+            revision, expires_at, result = entry
+            if time.monotonic() < expires_at:
+                return list(result)
+
+            # Expired. If nobody changed the accounting in the meantime,
+            # the cached one is still good for another TTL.
+            if revision is not None and revision == self._read_revision():
+                self._cache_accounting(key, revision, result, generation)
+                return list(result)
+
+        # Read the revision first: a change committed while loading
+        # makes the entry look stale, never fresh.
+        revision = self._read_revision()
+        result = self._load_accounting(user)
+        self._cache_accounting(key, revision, result, generation)
+
+        return list(result)
 
     def create_user(self, user_name):
         with detached_session(self.db) as session:
@@ -264,6 +437,9 @@ class ORMDatabase(ABCDatabase):
         with detached_session(self.db) as session:
             with transaction(session):
                 session.query(User).filter(filter).delete()
+                bump_revision(session)
+
+        self._invalidate_accounting()
 
     def list_users(self):
         with detached_session(self.db) as session:
@@ -296,6 +472,9 @@ class ORMDatabase(ABCDatabase):
         with detached_session(self.db) as session:
             with transaction(session):
                 session.query(Application).filter(filter).delete()
+                bump_revision(session)
+
+        self._invalidate_accounting()
 
     def list_applications(self):
         with detached_session(self.db) as session:
@@ -359,11 +538,14 @@ class ORMDatabase(ABCDatabase):
                         application_policy=orm_policy,
                     )
                     session.add(accounting)
+                    bump_revision(session)
 
                 else:
                     id = acc.id
 
-                return id
+        self._invalidate_accounting(user_name)
+
+        return id
 
     def revoke_access(self, app_name, user_name,
                       allow_home, allow_view, volume):
@@ -398,6 +580,9 @@ class ORMDatabase(ABCDatabase):
                 Accounting.user == orm_user,
                 Accounting.application_policy == orm_policy,
                 ).delete()
+            bump_revision(session)
+
+        self._invalidate_accounting(user_name)
 
     def revoke_access_by_id(self, mapping_id):
         with detached_session(self.db) as session, \
@@ -405,6 +590,75 @@ class ORMDatabase(ABCDatabase):
                 session.query(Accounting).filter(
                     Accounting.id == mapping_id
                     ).delete()
+                bump_revision(session)
+
+        self._invalidate_accounting()
+
+    def grant_access_bulk(self, grants):
+        with detached_session(self.db) as session:
+            with transaction(session):
+                ids = grant_access_bulk(session, grants)
+
+        self._invalidate_accounting()
+
+        return ids
+
+    def revoke_access_bulk(self, grants):
+        with detached_session(self.db) as session:
+            with transaction(session):
+                revoke_access_bulk(session, grants)
+
+        self._invalidate_accounting()
+
+    # Private
+
+    def _load_accounting(self, user):
+        """Queries the accounting of a user."""
+        # We create a session here to make sure it is only
+        # used in one thread
+        with contextlib.closing(self.db.create_session()) as session:
+            result = accounting_for_user(session, user)
+
+            # Removing internal references to the session is
+            # required such that the objects can be reused
+            # in a different thread
+            session.expunge_all()
+
+        return result
+
+    def _cache_accounting(self, user_name, revision, result, generation):
+        """Caches the accounting of a user, unless a local change
+        happened after the given generation."""
+        with self._accounting_cache_lock:
+            if generation != self._accounting_generation:
+                return
+
+            self._accounting_cache[user_name] = (
+                revision,
+                time.monotonic() + self.accounting_cache_ttl,
+                result)
+
+    def _invalidate_accounting(self, user_name=None):
+        """Drops the cached accounting of a user, or of all the users
+        if user_name is None."""
+        with self._accounting_cache_lock:
+            self._accounting_generation += 1
+            if user_name is None:
+                self._accounting_cache.clear()
+            else:
+                self._accounting_cache.pop(user_name, None)
+
+    def _read_revision(self):
+        """Returns the current revision of the accounting, or None
+        if the database does not keep track of it."""
+        if not self._has_revision:
+            return None
+
+        with contextlib.closing(self.db.create_session()) as session:
+            revision = session.query(Revision.value).filter(
+                Revision.id == 1).scalar()
+
+        return revision
 
 
 @contextlib.contextmanager
@@ -436,6 +690,157 @@ def transaction(session):
         session.commit()
 
 
+def has_revision_table(engine):
+    """Returns True if the database has the revision table.
+    The database schema is inspected only once per engine.
+
+    Parameters
+    ----------
+    engine : Engine
+        The database engine
+    """
+    with _revision_tables_lock:
+        if engine not in _revision_tables:
+            with engine.connect() as connection:
+                _revision_tables[engine] = engine.dialect.has_table(
+                    connection, Revision.__tablename__)
+
+        return _revision_tables[engine]
+
+
+def bump_revision(session):
+    """Increments the revision of the accounting, as part of the
+    transaction of the session. Must be invoked by every change to the
+    accounting, so that the cached copies are reloaded.
+    Does nothing if the database has no revision table.
+
+    Parameters
+    ----------
+    session : Session
+        The current session
+    """
+    if not has_revision_table(session.get_bind()):
+        return
+
+    updated = session.query(Revision).filter(Revision.id == 1).update(
+        {Revision.value: Revision.value + 1},
+        synchronize_session=False)
+
+    if not updated:
+        session.add(Revision(id=1, value=1))
+
+
+def grant_access_bulk(session, grants):
+    """Grants access to many users and applications, with a handful of
+    queries regardless of the number of grants. The users, applications
+    and missing policies are resolved first, so that nothing is granted
+    if any of them is not found.
+
+    Parameters
+    ----------
+    session : Session
+        The current session. The caller handles the transaction.
+    grants : list
+        A list of dictionaries, each with the arguments of
+        ORMDatabase.grant_access.
+
+    Returns
+    -------
+    A list of mapping ids, in the same order as the grants.
+
+    Raises
+    ------
+    exceptions.NotFound
+        if any application or user is not found.
+    ValueError
+        if any volume string is invalid.
+    """
+    entries = [_grant_entry(grant) for grant in grants]
+    if not entries:
+        return []
+
+    apps, users = _resolve_apps_and_users(session, entries)
+
+    policies = _find_policies(session, {entry[2:] for entry in entries})
+    for values in {entry[2:] for entry in entries} - set(policies):
+        policy = ApplicationPolicy(**dict(zip(_POLICY_COLUMNS, values)))
+        session.add(policy)
+        policies[values] = policy
+
+    # Assigns the ids of the new policies.
+    session.flush()
+
+    existing = _find_accountings(session, apps.values(), users.values())
+
+    ids = []
+    for entry in entries:
+        key = (users[entry[1]].id,
+               apps[entry[0]].id,
+               policies[entry[2:]].id)
+
+        if key not in existing:
+            existing[key] = Accounting(
+                id=uuid.uuid4().hex,
+                user_id=key[0],
+                application_id=key[1],
+                application_policy_id=key[2])
+            session.add(existing[key])
+
+        ids.append(existing[key].id)
+
+    bump_revision(session)
+
+    return ids
+
+
+def revoke_access_bulk(session, grants):
+    """Revokes access to many users and applications, with a handful of
+    queries regardless of the number of grants. Nothing is revoked if any
+    user, application or policy is not found.
+
+    Parameters
+    ----------
+    session : Session
+        The current session. The caller handles the transaction.
+    grants : list
+        A list of dictionaries, each with the arguments of
+        ORMDatabase.revoke_access.
+
+    Raises
+    ------
+    exceptions.NotFound
+        if any application, user or policy is not found.
+    ValueError
+        if any volume string is invalid.
+    """
+    entries = [_grant_entry(grant) for grant in grants]
+    if not entries:
+        return
+
+    apps, users = _resolve_apps_and_users(session, entries)
+
+    policies = _find_policies(session, {entry[2:] for entry in entries})
+    if len(policies) != len({entry[2:] for entry in entries}):
+        raise exceptions.NotFound()
+
+    revoked = {(users[entry[1]].id,
+                apps[entry[0]].id,
+                policies[entry[2:]].id)
+               for entry in entries}
+
+    existing = _find_accountings(session, apps.values(), users.values())
+    ids = [accounting.id
+           for key, accounting in existing.items()
+           if key in revoked]
+
+    for chunk in _chunks(ids):
+        session.query(Accounting).filter(
+            Accounting.id.in_(chunk)
+        ).delete(synchronize_session=False)
+
+    bump_revision(session)
+
+
 def accounting_for_user(session, user):
     """Returns a list of Accounting objects, each containing
     an application and the associated policy that the specified orm user is
@@ -476,3 +881,107 @@ def accounting_for_user(session, user):
         .filter_by(name=user_name).all()
 
     return res
+
+
+# The policy columns, in the order used by _grant_entry.
+_POLICY_COLUMNS = ("allow_home", "allow_common", "allow_view",
+                   "volume_source", "volume_target", "volume_mode")
+
+# The number of values in a single IN clause. sqlite does not allow
+# more than 999 parameters in a query.
+_CHUNK_SIZE = 500
+
+
+def _chunks(values, size=_CHUNK_SIZE):
+    """Splits a sequence of values in lists of at most size elements."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start+size]
+
+
+def _grant_entry(grant):
+    """Converts the arguments of a grant into a tuple
+    (app_name, user_name) + the policy values, in _POLICY_COLUMNS order."""
+    allow_common = False
+    source = target = mode = None
+
+    if grant.get("volume") is not None:
+        allow_common = True
+        source, target, mode = parse_volume_string(grant["volume"])
+
+    return (grant["app_name"],
+            grant["user_name"],
+            bool(grant.get("allow_home", False)),
+            allow_common,
+            bool(grant.get("allow_view", False)),
+            source,
+            target,
+            mode)
+
+
+def _resolve_apps_and_users(session, entries):
+    """Returns two dictionaries, image -> Application and
+    name -> User, for the applications and users of the grant entries.
+    Raises exceptions.NotFound if any of them is not found."""
+    app_names = {entry[0] for entry in entries}
+    user_names = {entry[1] for entry in entries}
+
+    apps = {}
+    for chunk in _chunks(app_names):
+        apps.update(
+            (app.image, app)
+            for app in session.query(Application).filter(
+                Application.image.in_(chunk)))
+
+    users = {}
+    for chunk in _chunks(user_names):
+        users.update(
+            (user.name, user)
+            for user in session.query(User).filter(User.name.in_(chunk)))
+
+    missing = (["application {}".format(name)
+                for name in sorted(app_names - set(apps))] +
+               ["user {}".format(name)
+                for name in sorted(user_names - set(users))])
+    if missing:
+        raise exceptions.NotFound("Unknown {}".format(", ".join(missing)))
+
+    return apps, users
+
+
+def _find_policies(session, policy_values):
+    """Returns a dictionary policy values -> ApplicationPolicy, for the
+    existing policies among the given ones."""
+    policies = {}
+    for chunk in _chunks(policy_values, 50):
+        query = session.query(ApplicationPolicy).filter(or_(*[
+            and_(*[getattr(ApplicationPolicy, column) == value
+                   for column, value in zip(_POLICY_COLUMNS, values)])
+            for values in chunk]))
+
+        for policy in query:
+            policies[tuple(getattr(policy, column)
+                           for column in _POLICY_COLUMNS)] = policy
+
+    return policies
+
+
+def _find_accountings(session, apps, users):
+    """Returns a dictionary (user id, application id, policy id) ->
+    Accounting, for the accountings of the given users and applications.
+    """
+    app_ids = [app.id for app in apps]
+
+    accountings = {}
+    for chunk in _chunks([user.id for user in users]):
+        for chunk_app_ids in _chunks(app_ids, _CHUNK_SIZE // 2):
+            query = session.query(Accounting).filter(
+                Accounting.user_id.in_(chunk),
+                Accounting.application_id.in_(chunk_app_ids))
+
+            for accounting in query:
+                accountings[(accounting.user_id,
+                             accounting.application_id,
+                             accounting.application_policy_id)] = accounting
+
+    return accountings
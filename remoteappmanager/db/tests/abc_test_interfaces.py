@@ -149,3 +149,9 @@ class ABCTestDatabaseInterface(metaclass=ABCMeta):
 
         with self.assertRaises(exceptions.UnsupportedOperation):
             db.revoke_access_by_id(12345)
+
+        for method in [db.grant_access_bulk, db.revoke_access_bulk]:
+            with self.assertRaises(exceptions.UnsupportedOperation):
+                method([dict(app_name="bonkers", user_name="uuu",
+                             allow_home=True, allow_view=False,
+                             volume="/a:/b:ro")])
@@ -0,0 +1,88 @@
+import os
+import threading
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.db import exceptions
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.db.csv_db import CSVDatabase
+from remoteappmanager.db.orm import ORMDatabase
+from remoteappmanager.db.tests.test_csv_db import GoodTable, write_csv_file
+from remoteappmanager.tests import utils
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class TestAsyncDatabase(TempMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
+        utils.init_sqlite_db(self.sqlite_file_path)
+
+    @gen_test
+    def test_blocking_database(self):
+        db = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        self.assertTrue(db.blocking)
+        async_db = AsyncDatabase(db, max_workers=2)
+
+        user_id = yield async_db.create_user("johndoe")
+        user = yield async_db.get_user(id=user_id)
+        self.assertEqual(user.name, "johndoe")
+
+        users = yield async_db.list_users()
+        self.assertEqual([u.name for u in users], ["johndoe"])
+
+        with self.assertRaises(exceptions.Exists):
+            yield async_db.create_user("johndoe")
+
+        stats = async_db.stats()
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(stats["num_started"], 4)
+
+    @gen_test
+    def test_calls_run_in_worker_threads(self):
+        db = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        async_db = AsyncDatabase(db)
+
+        threads = []
+        original = db.list_users
+
+        def list_users():
+            threads.append(threading.current_thread())
+            return original()
+
+        db.list_users = list_users
+        yield [async_db.list_users() for _ in range(3)]
+
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    @gen_test
+    def test_non_blocking_database(self):
+        csv_file_path = os.path.join(self.tempdir, "test.csv")
+        write_csv_file(csv_file_path, GoodTable.headers, GoodTable.records)
+        db = CSVDatabase(csv_file_path)
+        self.assertFalse(db.blocking)
+        async_db = AsyncDatabase(db)
+
+        # The in-memory database answers straight away.
+        future = async_db.get_user(user_name="markdoe")
+        self.assertTrue(future.done())
+        user = yield future
+        self.assertEqual(user.name, "markdoe")
+
+        future = async_db.create_user("foo")
+        self.assertTrue(future.done())
+        with self.assertRaises(exceptions.UnsupportedOperation):
+            yield future
+
+        self.assertEqual(async_db.stats()["num_started"], 0)
+
+    def test_in_memory_sqlite_is_not_blocking(self):
+        self.assertFalse(ORMDatabase(url="sqlite://").blocking)
+
+    def test_unknown_method(self):
+        async_db = AsyncDatabase(
+            ORMDatabase(url="sqlite:///"+self.sqlite_file_path))
+
+        with self.assertRaises(AttributeError):
+            async_db.reset()
@@ -1,7 +1,10 @@
 import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import os
+from unittest import mock
 
+from sqlalchemy.pool import QueuePool
 from tornado.testing import LogTrapTestCase
 
 from remoteappmanager.db import orm
@@ -65,6 +68,39 @@ class TestOrm(TempMixin, LogTrapTestCase):
         session = db.create_session()
         self.assertIsNotNone(session)
 
+    def test_sqlite_profiles(self):
+        def pragmas(db):
+            with db.engine.connect() as connection:
+                return tuple(
+                    connection.execute("PRAGMA {}".format(name)).scalar()
+                    for name in ["journal_mode", "synchronous",
+                                 "busy_timeout", "foreign_keys"])
+
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        self.assertEqual(pragmas(db), ("delete", 2, 5000, 1))
+
+        db = Database(url="sqlite:///"+self.sqlite_file_path,
+                      sqlite_profile="concurrent")
+        self.assertEqual(pragmas(db), ("wal", 1, 10000, 1))
+        self.assertIsInstance(db.engine.pool, QueuePool)
+
+        db = Database(url="sqlite:///"+self.sqlite_file_path,
+                      sqlite_profile="concurrent",
+                      sqlite_pragmas={"busy_timeout": 30000})
+        self.assertEqual(pragmas(db), ("wal", 1, 30000, 1))
+
+        # The pooled connections can be used by different threads.
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path,
+                               sqlite_profile="concurrent")
+        with ThreadPoolExecutor(4) as executor:
+            ids = list(executor.map(database.create_user,
+                                    ["user"+str(i) for i in range(20)]))
+        self.assertEqual(len(set(ids)), 20)
+
+        with self.assertRaises(ValueError):
+            Database(url="sqlite:///"+self.sqlite_file_path,
+                     sqlite_profile="whatever")
+
     def test_orm_objects(self):
         db = Database(url="sqlite:///"+self.sqlite_file_path)
         session = db.create_session()
@@ -408,3 +444,161 @@ class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
         """Override to silence the base class assumption that most of
         our backends are unable to create."""
         pass
+
+    def test_accounting_cache(self):
+        database = self.create_database()
+        user = database.get_user(user_name="user1")
+
+        with mock.patch.object(database, "_load_accounting",
+                               wraps=database._load_accounting) as load:
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+            self.assertEqual(load.call_count, 1)
+
+            # Local changes invalidate the cache.
+            database.grant_access("docker/image1", "user1", True, False, None)
+            self.assertEqual(len(database.get_accounting_for_user(user)), 3)
+            self.assertEqual(load.call_count, 2)
+
+            database.remove_application(app_name="docker/image1")
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+            self.assertEqual(load.call_count, 3)
+
+    def test_accounting_cache_revision(self):
+        database = self.create_database()
+        other = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        user = database.get_user(user_name="user1")
+
+        with mock.patch.object(database, "_load_accounting",
+                               wraps=database._load_accounting) as load, \
+                mock.patch("time.monotonic", return_value=100):
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+
+        # Expired, but unchanged: no need to reload.
+        with mock.patch.object(database, "_load_accounting",
+                               wraps=database._load_accounting) as load, \
+                mock.patch("time.monotonic", return_value=110):
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+            self.assertEqual(load.call_count, 0)
+
+        # Another process changes the accounting.
+        other.grant_access("docker/image1", "user1", True, False, None)
+
+        with mock.patch("time.monotonic", return_value=112):
+            self.assertEqual(len(database.get_accounting_for_user(user)), 2)
+
+        with mock.patch("time.monotonic", return_value=120):
+            self.assertEqual(len(database.get_accounting_for_user(user)), 3)
+
+    def test_accounting_cache_disabled(self):
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path,
+                               accounting_cache_ttl=0)
+        with contextlib.closing(database.db.create_session()) as session:
+            fill_db(session)
+        user = database.get_user(user_name="user1")
+
+        with mock.patch.object(database, "_load_accounting",
+                               wraps=database._load_accounting) as load:
+            database.get_accounting_for_user(user)
+            database.get_accounting_for_user(user)
+            self.assertEqual(load.call_count, 2)
+
+    def test_grant_revoke_access_bulk(self):
+        database = self.create_database()
+        database.create_user("ciccio")
+        database.create_application("simphonyremote/amazing")
+
+        grants = [
+            dict(app_name="simphonyremote/amazing", user_name="ciccio",
+                 allow_home=True, allow_view=False, volume=None),
+            dict(app_name="simphonyremote/amazing", user_name="ciccio",
+                 allow_home=False, allow_view=True, volume="/a:/b:ro"),
+            dict(app_name="docker/image0", user_name="user2",
+                 allow_home=False, allow_view=False, volume=None),
+        ]
+        ids = database.grant_access_bulk(grants)
+        self.assertEqual(len(set(ids)), 3)
+
+        # Same ids as the single grants, and no duplicates.
+        self.assertEqual(database.grant_access(**grants[1]), ids[1])
+        self.assertEqual(database.grant_access_bulk(grants + grants), ids * 2)
+
+        user = database.get_user(user_name="ciccio")
+        accountings = database.get_accounting_for_user(user)
+        self.assertEqual({acc.id for acc in accountings}, set(ids[:2]))
+
+        user2 = database.get_user(user_name="user2")
+        self.assertEqual(len(database.get_accounting_for_user(user2)), 1)
+
+        database.revoke_access_bulk(grants[1:])
+        self.assertEqual(
+            [acc.id for acc in database.get_accounting_for_user(user)],
+            ids[:1])
+        self.assertEqual(database.get_accounting_for_user(user2), [])
+
+        self.assertEqual(database.grant_access_bulk([]), [])
+        database.revoke_access_bulk([])
+
+    def test_grant_access_bulk_is_atomic(self):
+        database = self.create_database()
+        user = database.get_user(user_name="user2")
+
+        for grants in [
+                [dict(app_name="docker/image0", user_name="user2"),
+                 dict(app_name="docker/image0", user_name="unknown")],
+                [dict(app_name="docker/image0", user_name="user2"),
+                 dict(app_name="unknown", user_name="user2")]]:
+            with self.assertRaises(exceptions.NotFound):
+                database.grant_access_bulk(grants)
+
+        with self.assertRaises(ValueError):
+            database.grant_access_bulk([
+                dict(app_name="docker/image0", user_name="user2"),
+                dict(app_name="docker/image0", user_name="user2",
+                     volume="whatever")])
+
+        self.assertEqual(database.get_accounting_for_user(user), [])
+
+        # Unknown policy
+        database.grant_access_bulk([
+            dict(app_name="docker/image0", user_name="user2")])
+        with self.assertRaises(exceptions.NotFound):
+            database.revoke_access_bulk([
+                dict(app_name="docker/image0", user_name="user2"),
+                dict(app_name="docker/image0", user_name="user2",
+                     allow_home=True)])
+        self.assertEqual(len(database.get_accounting_for_user(user)), 1)
+
+    def test_grant_access_bulk_many(self):
+        database = self.create_database()
+        with contextlib.closing(database.db.create_session()) as session, \
+                transaction(session):
+            session.add_all([orm.User(name="student"+str(i))
+                             for i in range(1200)])
+
+        grants = [dict(app_name="docker/image"+str(i % 3),
+                       user_name="student"+str(i))
+                  for i in range(1200)]
+        ids = database.grant_access_bulk(grants)
+        self.assertEqual(len(set(ids)), 1200)
+
+        user = database.get_user(user_name="student1100")
+        accountings = database.get_accounting_for_user(user)
+        self.assertEqual(len(accountings), 1)
+        self.assertEqual(accountings[0].application.image, "docker/image2")
+
+        database.revoke_access_bulk(grants)
+        self.assertEqual(database.get_accounting_for_user(user), [])
+
+    def test_revision_table_is_inspected_once(self):
+        database = self.create_database()
+        database.create_user("ciccio")
+        database.create_application("simphonyremote/amazing")
+
+        with mock.patch.object(database.db.engine.dialect, "has_table",
+                               return_value=True) as has_table:
+            database.grant_access("simphonyremote/amazing", "ciccio",
+                                  True, False, None)
+            database.revoke_access("simphonyremote/amazing", "ciccio",
+                                   True, False, None)
+            self.assertFalse(has_table.called)
@@ -0,0 +1,525 @@
+import collections
+import contextlib
+import time
+import uuid
+from datetime import timedelta
+
+from tornado import gen, locks
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop, PeriodicCallback
+from traitlets import HasTraits, Int, Float, Dict, Any, Instance, default
+
+from remoteappmanager.db import orm
+from remoteappmanager.executor_lane import ExecutorLane
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+
+
+class AdmissionError(Exception):
+    """Base class of the reasons why a container start is not admitted."""
+
+
+class QuotaExceeded(AdmissionError):
+    """Raised when the user already runs (or is starting) as many
+    containers as allowed."""
+
+
+class QueueFull(AdmissionError):
+    """Raised when too many container starts are waiting."""
+
+
+class AdmissionTimeout(AdmissionError):
+    """Raised when a container start waited too long for its turn."""
+
+
+class AdmissionController(LoggingMixin, HasTraits):
+    """Limits the number of container starts performed at the same time.
+
+    The starts exceeding the limit wait in a queue per user. The queues
+    are served in turn, one start per user at a time, so that a user
+    starting many containers does not hold back the others. The starts
+    of the same user are served in order of arrival.
+
+    This class is not thread safe.
+    """
+    #: The maximum number of starts in progress. Zero means unlimited.
+    max_concurrent = Int(0)
+
+    #: The maximum number of starts waiting for their turn. Zero means
+    #: unlimited.
+    max_queued = Int(0)
+
+    #: The maximum number of containers a user can run, including the ones
+    #: being started and waiting. Zero means unlimited.
+    user_quota = Int(0)
+
+    #: The number of starts in progress.
+    _active = Int(0)
+
+    #: user name -> number of starts in progress.
+    _active_per_user = Instance(collections.Counter, args=())
+
+    #: user name -> deque of the futures waiting for a slot, oldest first.
+    #: The users are in the order they will be served.
+    _queues = Instance(collections.OrderedDict, args=())
+
+    @gen.coroutine
+    def admit(self, user_name, running=0, timeout=None):
+        """Waits until a container start for the user can proceed.
+
+        Parameters
+        ----------
+        user_name: str
+            The name of the user starting the container
+        running: int
+            The number of containers the user is running, for the quota.
+        timeout: float or None
+            The maximum time (in seconds) to wait in the queue. None
+            means forever.
+
+        Return
+        ------
+        An Admission, that must be released when the start is over.
+        It can be used as a context manager.
+
+        Raises
+        ------
+        QuotaExceeded, QueueFull, AdmissionTimeout
+        """
+        if self.user_quota > 0:
+            pending = (self._active_per_user[user_name] +
+                       len(self._queues.get(user_name, ())))
+            if running + pending >= self.user_quota:
+                raise QuotaExceeded(
+                    "User {} reached the quota of {} containers".format(
+                        user_name, self.user_quota))
+
+        if not self._queues and self._has_free_slot():
+            return self._grant(user_name)
+
+        if self.max_queued > 0 and self.num_queued() >= self.max_queued:
+            raise QueueFull(
+                "Too many containers are starting. {} requests are "
+                "waiting. Please retry later.".format(self.num_queued()))
+
+        waiter = Future()
+        self._queues.setdefault(user_name, collections.deque()).append(
+            waiter)
+        self.log.info("Start for user {} queued at position {}".format(
+            user_name, self.queue_position(user_name)))
+
+        try:
+            if timeout is None:
+                admission = yield waiter
+            else:
+                admission = yield gen.with_timeout(timedelta(seconds=timeout),
+                                                   waiter)
+        except gen.TimeoutError:
+            if waiter.done():
+                # Admitted at the last moment.
+                waiter.result().release()
+            else:
+                position = self.queue_position(user_name)
+                self._remove_waiter(user_name, waiter)
+                raise AdmissionTimeout(
+                    "Waited {} seconds for a container start slot, still at "
+                    "position {}. Please retry later.".format(
+                        timeout, position))
+            raise AdmissionTimeout(
+                "Waited {} seconds for a container start slot".format(
+                    timeout))
+
+        return admission
+
+    def num_active(self):
+        """Returns the number of starts in progress."""
+        return self._active
+
+    def num_queued(self):
+        """Returns the number of starts waiting for their turn."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def queue_position(self, user_name):
+        """Returns the position (starting from 1) in the queue of the
+        oldest waiting start of the user, or 0 if the user has none."""
+        if user_name not in self._queues:
+            return 0
+
+        # Each user ahead in the rotation is served once before us.
+        position = 1
+        for other_user in self._queues:
+            if other_user == user_name:
+                break
+            position += 1
+
+        return position
+
+    # Private
+
+    def _has_free_slot(self):
+        return self.max_concurrent <= 0 or self._active < self.max_concurrent
+
+    def _grant(self, user_name):
+        self._active += 1
+        self._active_per_user[user_name] += 1
+        return Admission(self, user_name)
+
+    def _release(self, admission):
+        user_name = admission.user_name
+        self._active -= 1
+        self._active_per_user[user_name] -= 1
+        if self._active_per_user[user_name] <= 0:
+            del self._active_per_user[user_name]
+
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admits the waiting starts, serving the users in turn."""
+        while self._queues and self._has_free_slot():
+            user_name, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_name)
+            else:
+                del self._queues[user_name]
+
+            waiter.set_result(self._grant(user_name))
+
+    def _remove_waiter(self, user_name, waiter):
+        queue = self._queues.get(user_name)
+        if queue is None:
+            return
+
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+
+        if not queue:
+            del self._queues[user_name]
+
+
+class SharedAdmissionController(LoggingMixin, HasTraits):
+    """Limits the number of container starts performed at the same time
+    by all the processes sharing the database, e.g. the remoteappmanagers
+    of all the users.
+
+    Each start takes a ticket in the admission_ticket table, and the
+    waiting tickets check for a free slot when a ticket of the same
+    process is released, or otherwise at increasing intervals. As with the
+    AdmissionController, the users are served in turn, and the starts of
+    the same user in order of arrival. The tickets are renewed while their
+    start waits or runs, and the tickets of a process that died expire.
+
+    The database is accessed from a worker thread, as the calls block.
+    """
+    #: The database shared by the processes.
+    database = Instance(orm.Database)
+
+    #: The maximum number of starts in progress. Zero means unlimited.
+    max_concurrent = Int(0)
+
+    #: The maximum number of starts waiting for their turn. Zero means
+    #: unlimited.
+    max_queued = Int(0)
+
+    #: The maximum number of containers a user can run, including the ones
+    #: being started and waiting. Zero means unlimited.
+    user_quota = Int(0)
+
+    #: The interval (in seconds) between two checks for a free slot.
+    #: It doubles, up to max_poll_interval, while the queue position of
+    #: the start does not improve.
+    poll_interval = Float(0.5)
+
+    #: The maximum interval (in seconds) between two checks for a free
+    #: slot.
+    max_poll_interval = Float(5.0)
+
+    #: The time (in seconds) after which a ticket that has not been renewed
+    #: is discarded. The tickets are renewed at a third of it.
+    ticket_ttl = Float(30.0)
+
+    #: ticket id -> (user name, queue position) of the waiting starts of
+    #: this process, as of their last check.
+    _waiting = Dict()
+
+    #: ticket id -> user name of the tickets of this process.
+    _tickets = Dict()
+
+    #: The periodic renewal of the tickets, while there are any.
+    _renewal = Any(None)
+
+    #: Notified when a ticket of this process is released, so that the
+    #: waiting starts check for the free slot straight away.
+    _wakeup = Instance(locks.Condition, args=())
+
+    #: Performs the database calls.
+    _lane = Instance(ExecutorLane)
+
+    @gen.coroutine
+    def admit(self, user_name, running=0, timeout=None):
+        """Waits until a container start for the user can proceed.
+        See AdmissionController.admit."""
+        ticket_id = uuid.uuid4().hex
+        yield self._lane.submit(self._issue, ticket_id, user_name, running)
+        self._tickets[ticket_id] = user_name
+        self._start_renewal()
+
+        deadline = None
+        if timeout is not None:
+            deadline = IOLoop.current().time() + timeout
+
+        interval = self.poll_interval
+        try:
+            while True:
+                position = yield self._lane.submit(self._activate, ticket_id)
+                if position == 0:
+                    break
+
+                previous = self._waiting.get(ticket_id)
+                if previous is not None and position < previous[1]:
+                    interval = self.poll_interval
+                elif previous is not None:
+                    interval = min(interval * 2, self.max_poll_interval)
+
+                self._waiting[ticket_id] = (user_name, position)
+                now = IOLoop.current().time()
+                if deadline is not None and now >= deadline:
+                    raise AdmissionTimeout(
+                        "Waited {} seconds for a container start slot, "
+                        "still at position {}. Please retry later.".format(
+                            timeout, position))
+
+                wake_at = now + interval
+                if deadline is not None:
+                    wake_at = min(wake_at, deadline)
+                yield self._wakeup.wait(timeout=wake_at)
+        except Exception:
+            self._release_ticket(ticket_id)
+            raise
+        finally:
+            self._waiting.pop(ticket_id, None)
+
+        return Admission(self, user_name, ticket_id)
+
+    def queue_position(self, user_name):
+        """Returns the position (starting from 1) in the queue of the
+        oldest waiting start of the user in this process, or 0 if the user
+        has none. The position is updated at each check."""
+        positions = [position
+                     for waiting_user, position in self._waiting.values()
+                     if waiting_user == user_name]
+        return min(positions, default=0)
+
+    # Private
+
+    def _release(self, admission):
+        self._release_ticket(admission.ticket_id)
+
+    def _release_ticket(self, ticket_id):
+        """Frees the slot held, or the place in the queue, by a ticket."""
+        self._tickets.pop(ticket_id, None)
+        if not self._tickets:
+            self._stop_renewal()
+
+        future = self._lane.submit(self._delete, ticket_id)
+        IOLoop.current().add_future(future, self._ticket_deleted)
+
+    def _ticket_deleted(self, future):
+        self._log_failure(future)
+        self._wakeup.notify_all()
+
+    def _start_renewal(self):
+        if self._renewal is None:
+            self._renewal = PeriodicCallback(self._renew,
+                                             self.ticket_ttl * 1000 / 3)
+            self._renewal.start()
+
+    def _stop_renewal(self):
+        if self._renewal is not None:
+            self._renewal.stop()
+            self._renewal = None
+
+    def _renew(self):
+        future = self._lane.submit(self._extend, list(self._tickets))
+        IOLoop.current().add_future(future, self._log_failure)
+
+    def _log_failure(self, future):
+        if future.exception() is not None:
+            self.log.error("Unable to update the admission tickets: "
+                           "{}".format(future.exception()))
+
+    # The following methods are executed by the worker thread.
+
+    @contextlib.contextmanager
+    def _session(self):
+        """A session whose transaction is committed at the end."""
+        with contextlib.closing(self.database.create_session()) as session, \
+                orm.transaction(session):
+            yield session
+
+    def _discard_expired(self, session):
+        """Deletes the expired tickets. Only called before a change of the
+        queue, as it is the first write of the transaction: it locks the
+        tickets, on the databases with table or file locks, until the
+        change is committed."""
+        session.query(orm.AdmissionTicket).filter(
+            orm.AdmissionTicket.expires_at < time.time()
+        ).delete(synchronize_session=False)
+
+    def _issue(self, ticket_id, user_name, running):
+        """Adds a waiting ticket for the user, if the quota and the queue
+        allow it."""
+        Ticket = orm.AdmissionTicket
+        with self._session() as session:
+            self._discard_expired(session)
+            if self.user_quota > 0:
+                pending = session.query(Ticket).filter(
+                    Ticket.user_name == user_name).count()
+                if running + pending >= self.user_quota:
+                    raise QuotaExceeded(
+                        "User {} reached the quota of {} containers".format(
+                            user_name, self.user_quota))
+
+            if self.max_queued > 0:
+                queued = session.query(Ticket).filter(
+                    Ticket.active.is_(False)).count()
+                if queued >= self.max_queued:
+                    raise QueueFull(
+                        "Too many containers are starting. {} requests are "
+                        "waiting. Please retry later.".format(queued))
+
+            now = time.time()
+            session.add(Ticket(id=ticket_id,
+                               user_name=user_name,
+                               active=False,
+                               created_at=now,
+                               turn=now,
+                               expires_at=now + self.ticket_ttl))
+
+    def _activate(self, ticket_id):
+        """Makes the ticket hold a slot, if it is its turn and a slot
+        is free.
+
+        The queue is first read without writing. Only the ticket
+        whose turn it is, when a slot is free, locks the tickets and
+        checks again before taking the slot.
+
+        Return
+        ------
+        0 if the ticket holds a slot, otherwise the position of its user
+        in the queue.
+        """
+        Ticket = orm.AdmissionTicket
+        with self._session() as session:
+            tickets = session.query(Ticket).filter(
+                Ticket.expires_at >= time.time()).all()
+            position, next_up = self._position(tickets, ticket_id)
+            if not next_up or not self._slot_free(tickets):
+                return position
+
+        with self._session() as session:
+            self._discard_expired(session)
+            tickets = session.query(Ticket).with_for_update().all()
+            position, next_up = self._position(tickets, ticket_id)
+            if not next_up or not self._slot_free(tickets):
+                return position
+
+            ticket = next(t for t in tickets if t.id == ticket_id)
+            ticket.active = True
+
+            # The other starts of the user wait for the next round.
+            now = time.time()
+            for other in tickets:
+                if other.user_name == ticket.user_name and not other.active:
+                    other.turn = now
+
+            return 0
+
+    def _position(self, tickets, ticket_id):
+        """Returns the position of the ticket in the queue formed by the
+        tickets.
+
+        Return
+        ------
+        A tuple with 0 if the ticket holds a slot, otherwise the position
+        of its user in the queue, and True if the ticket is the next one
+        to take a slot.
+        """
+        ticket = next((t for t in tickets if t.id == ticket_id), None)
+        if ticket is None:
+            raise AdmissionTimeout(
+                "The container start waited too long to be renewed")
+        if ticket.active:
+            return 0, False
+
+        # The users in the order they are served, with their oldest
+        # waiting ticket.
+        turns = {}
+        oldest = {}
+        for waiting in sorted((t for t in tickets if not t.active),
+                              key=lambda t: (t.created_at, t.id)):
+            oldest.setdefault(waiting.user_name, waiting)
+            turns[waiting.user_name] = min(
+                waiting.turn, turns.get(waiting.user_name, waiting.turn))
+        queue = sorted(oldest.values(),
+                       key=lambda t: (turns[t.user_name], t.user_name))
+
+        position = [t.user_name for t in queue].index(ticket.user_name) + 1
+        return position, queue[0] is ticket
+
+    def _slot_free(self, tickets):
+        """Returns True if the tickets leave a slot free."""
+        if self.max_concurrent <= 0:
+            return True
+        return sum(1 for t in tickets if t.active) < self.max_concurrent
+
+    def _extend(self, ticket_ids):
+        """Renews the given tickets."""
+        if not ticket_ids:
+            return
+
+        Ticket = orm.AdmissionTicket
+        with self._session() as session:
+            session.query(Ticket).filter(Ticket.id.in_(ticket_ids)).update(
+                {Ticket.expires_at: time.time() + self.ticket_ttl},
+                synchronize_session=False)
+
+    def _delete(self, ticket_id):
+        """Removes a ticket."""
+        Ticket = orm.AdmissionTicket
+        with self._session() as session:
+            session.query(Ticket).filter(Ticket.id == ticket_id).delete(
+                synchronize_session=False)
+
+    @default("_lane")
+    def _lane_default(self):
+        return ExecutorLane("admission", 1)
+
+
+class Admission:
+    """The permission to start a container, obtained from the
+    AdmissionController. It must be released once the start is over."""
+
+    def __init__(self, controller, user_name, ticket_id=None):
+        self.user_name = user_name
+
+        #: The ticket of the SharedAdmissionController, if any.
+        self.ticket_id = ticket_id
+
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        """Releases the admission. Subsequent calls have no effect."""
+        if self._released:
+            return
+
+        self._released = True
+        self._controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
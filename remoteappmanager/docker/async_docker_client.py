@@ -1,11 +1,39 @@
-from concurrent.futures import ThreadPoolExecutor
+import threading
 
 import docker
 import functools
-
-# Common threaded executor for asynchronous jobs.
-# Required for the AsyncDockerClient to operate.
-_executor = ThreadPoolExecutor(1)
+from tornado.concurrent import Future, chain_future
+from tornado.ioloop import IOLoop
+
+from remoteappmanager.executor_lane import ExecutorLane
+
+#: The docker client methods that change the state of the docker host.
+#: Some of them (e.g. stop, which waits for the container grace period)
+#: can take a long time, so they are executed in a separate lane and
+#: don't hold back the cheap read operations.
+MUTATING_METHODS = frozenset([
+    "build",
+    "commit",
+    "create_container",
+    "kill",
+    "pause",
+    "remove_container",
+    "remove_image",
+    "rename",
+    "restart",
+    "start",
+    "stop",
+    "tag",
+    "unpause",
+])
+
+#: The docker client methods that transfer images. They can take minutes,
+#: so they have their own lane and don't hold back the container
+#: operations.
+TRANSFER_METHODS = frozenset([
+    "pull",
+    "push",
+])
 
 
 class AsyncDockerClient:
@@ -13,23 +41,44 @@ class AsyncDockerClient:
     All Client interface is available as methods returning a future
     instead of the actual result. The resulting future can be yielded.
 
-    This class is thread safe. Note that all instances use the same
-    executor.
+    This class is thread safe.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, query_workers=4, mutating_workers=2,
+                 pull_workers=2, **kwargs):
         """Initialises the docker async client.
 
-        The client uses a single, module level executor to submit
-        requests and obtain futures. The futures must be yielded
-        according to the tornado asynchronous interface.
+        The client submits requests to one of three executor lanes and
+        obtains futures. The futures must be yielded according to the
+        tornado asynchronous interface.
 
         The exported methods are the same as from the docker-py
         synchronous client, with the exception of their async nature.
 
-        Note that the executor is a ThreadPoolExecutor with a single thread.
+        Image transfers (see TRANSFER_METHODS) go to the "pull" lane,
+        calls that modify the docker host (see MUTATING_METHODS) go to the
+        "mutating" lane, everything else to the "query" lane, so that a
+        slow operation does not delay the cheap ones queued behind it.
+
+        Parameters
+        ----------
+        query_workers: int
+            The number of threads serving the read-only calls.
+        mutating_workers: int
+            The number of threads serving the mutating calls.
+        pull_workers: int
+            The number of threads serving the image transfers.
+
+        All other arguments are passed to the docker-py client.
         """
         self._sync_client = docker.Client(*args, **kwargs)
+        self._client_args = args
+        self._client_kwargs = kwargs
+        self._lanes = {
+            "query": ExecutorLane("query", query_workers),
+            "mutating": ExecutorLane("mutating", mutating_workers),
+            "pull": ExecutorLane("pull", pull_workers),
+        }
 
     def __getattr__(self, attr):
         """Returns the docker client method, wrapped in an async execution
@@ -45,11 +94,122 @@ class AsyncDockerClient:
                 )
             )
 
+    def stream_events(self, callback, filters=None):
+        """Subscribes to the docker event stream.
+
+        The stream is consumed by a dedicated thread, so that it does not
+        hold a lane worker for its whole lifetime, through its own docker
+        client without read timeout, as the stream can stay quiet for
+        longer than the timeout of the other calls.
+
+        Parameters
+        ----------
+        callback: callable
+            Invoked on the current IOLoop with each decoded event
+            dictionary, in the order they are received.
+        filters: dict or None
+            The event filters, as in dockerpy.
+
+        Return
+        ------
+        A future that resolves once the subscription is established.
+        Its result is another future, that resolves when the stream ends,
+        or raises if the stream is interrupted by an error.
+        """
+        io_loop = IOLoop.current()
+        subscribed = Future()
+        closed = Future()
+
+        def failed(exc):
+            if subscribed.done():
+                closed.set_exception(exc)
+            else:
+                subscribed.set_exception(exc)
+
+        def consume():
+            try:
+                client = self._create_stream_client()
+                try:
+                    events = client.events(filters=filters, decode=True)
+                    io_loop.add_callback(subscribed.set_result, closed)
+                    for event in events:
+                        io_loop.add_callback(callback, event)
+                finally:
+                    client.close()
+            except Exception as e:
+                io_loop.add_callback(failed, e)
+            else:
+                io_loop.add_callback(closed.set_result, None)
+
+        thread = threading.Thread(target=consume, name="docker-events")
+        thread.daemon = True
+        thread.start()
+
+        return subscribed
+
+    def stream_pull(self, repository, tag=None, progress_callback=None):
+        """Pulls an image, reporting the progress.
+
+        The pull runs in the pull lane, for its whole duration, so that
+        it does not delay the container operations.
+
+        Parameters
+        ----------
+        repository: str
+            The image repository, e.g. simphonyproject/simphony-mayavi
+        tag: str or None
+            The tag to pull. If None, all the tags are pulled.
+        progress_callback: callable or None
+            Invoked on the current IOLoop with each decoded progress
+            dictionary, in the order they are received.
+
+        Return
+        ------
+        A future that resolves when the pull is complete. It raises
+        docker.errors.DockerException if docker reports an error.
+        """
+        io_loop = IOLoop.current()
+
+        def pull():
+            pull_error = None
+            for item in self._sync_client.pull(repository, tag=tag,
+                                               stream=True, decode=True):
+                if "error" in item:
+                    pull_error = item["error"]
+                if progress_callback is not None:
+                    io_loop.add_callback(progress_callback, item)
+
+            if pull_error is not None:
+                raise docker.errors.DockerException(
+                    "Failed to pull {}: {}".format(repository, pull_error))
+
+        future = Future()
+        io_loop.add_future(
+            self._lanes["pull"].submit(pull),
+            lambda executor_future: chain_future(executor_future, future))
+        return future
+
+    def lane_stats(self):
+        """Returns the statistics of the executor lanes.
+
+        Return
+        ------
+        A dictionary lane name -> lane statistics, as returned by
+        ExecutorLane.stats()
+        """
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
     # Private
 
+    def _create_stream_client(self):
+        """Returns a new docker client for a stream, configured as the
+        client of the other calls but without read timeout."""
+        kwargs = dict(self._client_kwargs, timeout=None)
+        return docker.Client(*self._client_args, **kwargs)
+
     def _submit_to_executor(self, method, *args, **kwargs):
         """Call a synchronous docker client method in a background thread,
-        using the module level executor.
+        using the executor lane appropriate for the method.
 
         Parameters
         ----------
@@ -62,9 +222,17 @@ class AsyncDockerClient:
         Return
         ------
 
-        A future from the ThreadPoolExecutor.
+        A tornado future, resolved on the current IOLoop when the
+        executor completes the call. Resolving through the IOLoop
+        guarantees that the result is never delivered synchronously,
+        even if a fresh worker thread completes the call immediately.
         """
-        return _executor.submit(self._invoke, method, *args, **kwargs)
+        lane = self._lanes[_lane_for(method)]
+        future = Future()
+        IOLoop.current().add_future(
+            lane.submit(self._invoke, method, *args, **kwargs),
+            lambda executor_future: chain_future(executor_future, future))
+        return future
 
     def _invoke(self, method, *args, **kwargs):
         """wrapper for calling docker methods to be passed to
@@ -72,3 +240,11 @@ class AsyncDockerClient:
         """
         m = getattr(self._sync_client, method)
         return m(*args, **kwargs)
+
+
+def _lane_for(method):
+    """Returns the name of the lane that should execute a given
+    docker client method."""
+    if method in TRANSFER_METHODS:
+        return "pull"
+    return "mutating" if method in MUTATING_METHODS else "query"
@@ -0,0 +1,114 @@
+class ContainerIndex:
+    """In-memory index of Container objects.
+
+    Containers can be looked up by the same keys accepted by
+    ContainerManager.find_containers (url_id, mapping_id and user name)
+    without querying docker.
+
+    This class is not thread safe.
+    """
+
+    #: The Container attributes that are indexed.
+    KEYS = ("url_id", "mapping_id", "user")
+
+    def __init__(self):
+        # docker_id -> Container
+        self._containers = {}
+
+        # key -> value of the key -> set of docker ids
+        self._by_key = {key: {} for key in self.KEYS}
+
+    def replace(self, containers):
+        """Replaces the whole content of the index.
+
+        Parameters
+        ----------
+        containers: list
+            The list of Container objects that will populate the index.
+        """
+        self.clear()
+        for container in containers:
+            self.add(container)
+
+    def clear(self):
+        """Removes all the containers from the index."""
+        self._containers = {}
+        self._by_key = {key: {} for key in self.KEYS}
+
+    def add(self, container):
+        """Adds a container to the index. If a container with the same
+        docker id is already present, it is replaced.
+
+        Parameters
+        ----------
+        container: Container
+            The container to add
+        """
+        self.remove(container.docker_id)
+
+        self._containers[container.docker_id] = container
+        for key in self.KEYS:
+            self._by_key[key].setdefault(
+                getattr(container, key), set()).add(container.docker_id)
+
+    def remove(self, docker_id):
+        """Removes a container from the index.
+
+        Parameters
+        ----------
+        docker_id: str
+            The docker id of the container
+
+        Return
+        ------
+        The removed Container, or None if not present.
+        """
+        container = self._containers.pop(docker_id, None)
+        if container is None:
+            return None
+
+        for key in self.KEYS:
+            values = self._by_key[key]
+            value = getattr(container, key)
+            ids = values.get(value)
+            if ids is None:
+                continue
+
+            ids.discard(docker_id)
+            if not ids:
+                del values[value]
+
+        return container
+
+    def find(self, *, url_id=None, mapping_id=None, user_name=None):
+        """Returns the containers matching all the specified arguments.
+        Unspecified arguments are not used for filtering.
+
+        Return
+        ------
+        A list of Container objects, possibly empty.
+        """
+        criteria = {
+            "url_id": url_id,
+            "mapping_id": mapping_id,
+            "user": user_name
+        }
+
+        candidates = None
+        for key, value in criteria.items():
+            if value is None:
+                continue
+
+            ids = self._by_key[key].get(value, set())
+            candidates = ids if candidates is None else candidates & ids
+
+        if candidates is None:
+            return list(self._containers.values())
+
+        return [self._containers[docker_id] for docker_id in candidates]
+
+    def __contains__(self, docker_id):
+        return docker_id in self._containers
+
+    def __len__(self):
+        return len(self._containers)
@@ -2,28 +2,42 @@ import os
 import string
 from urllib.parse import urlparse
 import uuid
+from datetime import timedelta
 import random
 
 from docker.errors import APIError, NotFound
+from docker.utils import parse_repository_tag
 from escapism import escape
+from remoteappmanager.cache import TTLCache
 from remoteappmanager.docker.async_docker_client import AsyncDockerClient
 from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.container_index import ContainerIndex
 from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
+from remoteappmanager.docker.native_docker_client import NativeDockerClient
+from remoteappmanager.docker import warm_pool
+from remoteappmanager.docker.warm_pool import WarmPool
 
 from remoteappmanager.docker.image import Image
 from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.metrics import MetricsRegistry, PhaseTimer
 from remoteappmanager.utils import (
     url_path_join,
     without_end_slash)
 
 
 from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
 from traitlets import (
+    Any,
+    Bool,
+    Enum,
+    Float,
     Int,
     Dict,
     Set,
     Instance,
     Unicode,
+    Union,
     default)
 
 
@@ -32,6 +46,11 @@ from traitlets import (
 _CONTAINER_SAFE_CHARS = set(string.ascii_letters + string.digits + '-.')
 _CONTAINER_ESCAPE_CHAR = '_'
 
+#: Appended to the name of the pooled containers until they are claimed.
+#: The labels of a container can not be changed, but its name can, so the
+#: name tells the pooled containers apart from those of the users.
+_POOLED_NAME_SUFFIX = '-pooled'
+
 
 class OperationInProgress(Exception):
     """Exception raised when the operation for the requested image or
@@ -58,14 +77,132 @@ class ContainerManager(LoggingMixin):
     # different instances of simphony-remote access the same docker.
     realm = Unicode("remoteexec")
 
+    #: The number of threads serving the cheap, read-only docker calls.
+    docker_query_workers = Int(4)
+
+    #: The number of threads serving the docker calls that create, start,
+    #: stop or remove containers.
+    docker_mutating_workers = Int(2)
+
+    #: The number of threads serving the image pulls.
+    docker_pull_workers = Int(2)
+
+    #: If True, talk to the docker daemon directly from the IOLoop with
+    #: the NativeDockerClient, instead of running docker-py in threads.
+    docker_native_client = Bool(False)
+
+    #: How the host ip and port of the containers are resolved.
+    #: "list" uses the port bindings reported by the container list, and
+    #: queries docker only for the containers whose bindings are missing.
+    #: "port" always queries docker with an additional call per container.
+    docker_port_resolution = Enum(("list", "port"), default_value="list")
+
+    #: If True, keep an in-memory index of the running containers, seeded
+    #: with a single list call and kept current by the docker event
+    #: stream, and answer the container lookups from it.
+    docker_event_cache = Bool(False)
+
+    #: The maximum number of images kept in the image cache. Zero disables
+    #: the cache.
+    image_cache_size = Int(64)
+
+    #: The time (in seconds) after which a cached image is retrieved again
+    #: from docker. If docker_event_cache is True, cached images are also
+    #: invalidated by the docker image events.
+    image_cache_ttl = Float(300.0)
+
+    #: The number of containers to create and start in advance for each
+    #: image, as a dictionary image name -> number. A pooled container can
+    #: only be used by a start request with the same user, mapping, volumes
+    #: and environment of the one that caused its creation, because these
+    #: are fixed at container creation. Images not listed are not pooled.
+    warm_pool_policy = Dict()
+
+    #: The maximum number of pooled containers on the docker host,
+    #: counting those of all the processes sharing it.
+    warm_pool_max_containers = Int(10)
+
+    #: Identifies the pooled containers created by this manager, e.g. the
+    #: name of the user served by the process. The processes sharing the
+    #: docker host must use different owners, as each one removes the
+    #: pooled containers of its owner left behind by a previous run.
+    warm_pool_owner = Unicode("")
+
+    #: The time (in seconds) after which an unclaimed pooled container
+    #: is removed.
+    warm_pool_ttl = Float(3600.0)
+
+    #: If True, a request to start the same mapping for the same user, or
+    #: to stop the same container, while the same operation is in progress
+    #: waits for that operation and shares its outcome, instead of failing
+    #: with OperationInProgress.
+    coalesce_operations = Bool(False)
+
     #: Tracks if a given mapping id is starting up.
     _start_pending = Set()
 
     #: Tracks if a given container id is stopping down.
     _stop_pending = Set()
 
+    #: The futures of the start operations in progress, by (user name,
+    #: mapping id). Only used if coalesce_operations is True.
+    _start_inflight = Dict()
+
+    #: The futures of the stop operations in progress, by container id.
+    #: Only used if coalesce_operations is True.
+    _stop_inflight = Dict()
+
+    #: The registry where the duration of the start phases is recorded.
+    metrics = Instance(MetricsRegistry, args=())
+
+    #: The index of the running containers of our realm.
+    #: Only used if docker_event_cache is True.
+    _index = Instance(ContainerIndex, args=())
+
+    #: Future of the index synchronization with docker. None if the index
+    #: is not synchronized, e.g. because the event stream dropped.
+    _index_sync = Any(None)
+
+    #: Incremented at every synchronization, to discard the events
+    #: coming from a stale event stream.
+    _index_generation = Int(0)
+
+    #: The events received while the index is being seeded, or None.
+    _index_backlog = Any(None)
+
+    #: docker id -> token of the containers whose information is being
+    #: retrieved after a start event.
+    _index_pending = Dict()
+
+    #: Cache of the Image objects, by image name and id.
+    _image_cache = Any(None)
+
+    #: Future of the image event stream subscription, or None if not
+    #: subscribed.
+    _image_events = Any(None)
+
+    #: Future of the health event stream subscription, or None if not
+    #: subscribed.
+    _health_events = Any(None)
+
+    #: docker id -> list of futures waiting for the container to become
+    #: healthy.
+    _health_waiters = Dict()
+
+    #: The containers created in advance.
+    _warm_pool = Instance(WarmPool)
+
+    #: True once the pooled containers left behind by a previous run
+    #: have been removed.
+    _warm_pool_reaped = Bool(False)
+
+    #: The periodic removal of the expired pooled containers, while the
+    #: pool is in use.
+    _warm_pool_expiry = Any(None)
+
     #: The asynchronous docker client.
-    _docker_client = Instance(AsyncDockerClient)
+    _docker_client = Union([Instance(AsyncDockerClient),
+                            Instance(NativeDockerClient)])
 
     def __init__(self, docker_config, *args, **kwargs):
         """Initializes the Container manager.
@@ -88,7 +225,8 @@ class ContainerManager(LoggingMixin):
                         mapping_id,
                         base_urlpath,
                         volumes,
-                        environment=None):
+                        environment=None,
+                        phase_timer=None):
         """
         Starts a container using the given image name.
 
@@ -111,6 +249,10 @@ class ContainerManager(LoggingMixin):
         environment: dict or None
             Contains additional keyvalue pairs that will be exported
             as environment variables inside the container.
+        phase_timer: PhaseTimer or None
+            The timer recording the duration of the start phases. If None,
+            a timer observing into our metrics registry is used, and its
+            summary is logged at the end.
 
         Return
         ------
@@ -119,26 +261,55 @@ class ContainerManager(LoggingMixin):
         Raises
         ------
         OperationInProgres:
-            if the requested mapping id is already scheduled for addition
+            if the requested mapping id is already scheduled for addition,
+            and coalesce_operations is False.
 
         """
 
-        if mapping_id in self._start_pending:
-            raise OperationInProgress("start {}".format(mapping_id))
-
         if environment is None:
             environment = {}
 
-        try:
-            self._start_pending.add(mapping_id)
-            result = yield self._start_container(user_name,
-                                                 image_name,
-                                                 mapping_id,
-                                                 base_urlpath,
-                                                 volumes,
-                                                 environment)
-        finally:
-            self._start_pending.remove(mapping_id)
+        log_phases = phase_timer is None
+        if phase_timer is None:
+            phase_timer = PhaseTimer(
+                self.metrics,
+                "container_start_phase_seconds",
+                "Duration of the phases of a container start")
+
+        if self.coalesce_operations:
+            result = yield self._single_flight(
+                self._start_inflight,
+                (user_name, mapping_id),
+                self._start_container,
+                user_name,
+                image_name,
+                mapping_id,
+                base_urlpath,
+                volumes,
+                environment,
+                phase_timer)
+        else:
+            if mapping_id in self._start_pending:
+                raise OperationInProgress("start {}".format(mapping_id))
+
+            try:
+                self._start_pending.add(mapping_id)
+                result = yield self._start_container(user_name,
+                                                     image_name,
+                                                     mapping_id,
+                                                     base_urlpath,
+                                                     volumes,
+                                                     environment,
+                                                     phase_timer)
+            finally:
+                self._start_pending.remove(mapping_id)
+
+        if log_phases:
+            self.log.info("Start phases for container {}: {}".format(
+                result.docker_id, phase_timer.summary()))
+
+        if self.docker_event_cache:
+            self._index.add(result)
 
         return result
 
@@ -156,17 +327,28 @@ class ContainerManager(LoggingMixin):
         Raises
         ------
         OperationInProgres:
-            if the requested container id is already scheduled for removal.
+            if the requested container id is already scheduled for removal,
+            and coalesce_operations is False.
         """
 
-        if container_id in self._stop_pending:
-            raise OperationInProgress("stop {}".format(container_id))
+        if self.coalesce_operations:
+            yield self._single_flight(self._stop_inflight,
+                                      container_id,
+                                      self._stop_and_remove_container,
+                                      container_id)
+        else:
+            if container_id in self._stop_pending:
+                raise OperationInProgress("stop {}".format(container_id))
+
+            try:
+                self._stop_pending.add(container_id)
+                yield self._stop_and_remove_container(container_id)
+            finally:
+                self._stop_pending.remove(container_id)
 
-        try:
-            self._stop_pending.add(container_id)
-            yield self._stop_and_remove_container(container_id)
-        finally:
-            self._stop_pending.remove(container_id)
+        if self.docker_event_cache:
+            self._index_pending.pop(container_id, None)
+            self._index.remove(container_id)
 
     @gen.coroutine
     def containers_with_labels(self, labels):
@@ -198,20 +380,28 @@ class ContainerManager(LoggingMixin):
                 self.log.exception("Unable to parse container info.")
                 continue
 
+            if _is_pooled_name(container.name):
+                # Started in advance, and not claimed by a start yet.
+                continue
+
             # override the ip and port obtained by the docker info with the
             # appropriate ip and port, considering that we might be using a
             # separate docker machine
-            try:
-                ip, port = yield from self._get_ip_and_port(
-                    container.docker_id)
-            except RuntimeError:
-                self.log.exception(
-                    "Unable to retrieve ip/port "
-                    "for container {}".format(container.docker_id))
-                continue
-
-            container.ip = ip
-            container.port = port
+            ip_and_port = None
+            if self.docker_port_resolution == "list":
+                ip_and_port = self._get_ip_and_port_from_list_info(info)
+
+            if ip_and_port is None:
+                try:
+                    ip_and_port = yield from self._get_ip_and_port(
+                        container.docker_id)
+                except RuntimeError:
+                    self.log.exception(
+                        "Unable to retrieve ip/port "
+                        "for container {}".format(container.docker_id))
+                    continue
+
+            container.ip, container.port = ip_and_port
             containers.append(container)
 
         return containers
@@ -224,6 +414,13 @@ class ContainerManager(LoggingMixin):
                         user_name=None):
         """Finds and returns containers matching all the specified arguments.
         """
+        if self.docker_event_cache:
+            synchronized = yield self._sync_index()
+            if synchronized:
+                return self._index.find(url_id=url_id,
+                                        mapping_id=mapping_id,
+                                        user_name=user_name)
+
         labels = {
             SIMPHONY_NS_RUNINFO.realm: self.realm
         }
@@ -273,16 +470,195 @@ class ContainerManager(LoggingMixin):
     def image(self, image_id_or_name):
         """Returns the Image object associated to a given id
         """
+        if self._image_cache is None:
+            try:
+                image_dict = yield self._docker_client.inspect_image(
+                    image_id_or_name)
+            except NotFound:
+                return None
+
+            return Image.from_docker_dict(image_dict)
+
+        if self.docker_event_cache and self._image_events is None:
+            self._subscribe_image_events()
+
+        image = self._image_cache.get(image_id_or_name)
+        if image is not None:
+            return image
+
         try:
             image_dict = yield self._docker_client.inspect_image(
                 image_id_or_name)
         except NotFound:
             return None
 
-        return Image.from_docker_dict(image_dict)
+        image = Image.from_docker_dict(image_dict)
+        for key in {image_id_or_name, image.docker_id, image.name}:
+            if key:
+                self._image_cache.set(key, image)
+
+        return image
+
+    @gen.coroutine
+    def has_image(self, image_name):
+        """Returns True if the image is present on the docker host."""
+        image = yield self.image(image_name)
+        return image is not None
+
+    @gen.coroutine
+    def pull_image(self, image_name, progress_callback=None):
+        """Pulls an image on the docker host.
+
+        Parameters
+        ----------
+        image_name: str
+            The image name, e.g. simphonyproject/simphony-mayavi:0.6.0.
+            If no tag is specified, "latest" is pulled.
+        progress_callback: callable or None
+            Invoked with each progress dictionary reported by docker.
+
+        Raises
+        ------
+        docker.errors.DockerException
+            If the pull fails.
+        """
+        repository, tag = parse_repository_tag(image_name)
+        yield self._docker_client.stream_pull(
+            repository,
+            tag=tag or "latest",
+            progress_callback=progress_callback)
+
+        if self._image_cache is not None:
+            self._image_cache.pop(image_name)
+
+    @gen.coroutine
+    def host_info(self):
+        """Returns the system-wide information of the docker host, as
+        returned by docker info."""
+        info = yield self._docker_client.info()
+        return info
+
+    @gen.coroutine
+    def prefill_warm_pool(self,
+                          user_name,
+                          image_name,
+                          mapping_id,
+                          base_urlpath,
+                          volumes,
+                          environment=None):
+        """Creates and starts containers in advance for a start request
+        with the given arguments, as many as required by the warm pool
+        policy of the image, so that the first start does not wait for
+        them. Does nothing if the image is not in the policy.
+
+        Parameters are as in start_container.
+        """
+        if image_name not in self.warm_pool_policy:
+            return
+
+        try:
+            image_info = yield self._docker_client.inspect_image(image_name)
+        except Exception:
+            self.log.exception("Could not inspect image {}".format(
+                image_name))
+            return
+
+        create_args = (user_name, image_name, mapping_id, base_urlpath,
+                       volumes, environment or {})
+        yield self._refill_warm_pool(warm_pool.signature(*create_args),
+                                     image_info["Id"],
+                                     create_args)
+
+    @gen.coroutine
+    def wait_for_container_healthy(self, container_id, timeout):
+        """Waits until docker reports the container as healthy, using the
+        health_status events. Only the containers whose image defines a
+        HEALTHCHECK have a health status.
+
+        Parameters
+        ----------
+        container_id: str
+            The docker id of the container
+        timeout: float
+            The time (in seconds) after which we give up.
+
+        Return
+        ------
+        True if the container is healthy. False if the container has no
+        health check, or if the health events are not available. In this
+        case the readiness must be verified in some other way.
+
+        Raises
+        ------
+        TimeoutError:
+            If the container did not become healthy within the timeout.
+        """
+        try:
+            yield self._subscribe_health_events()
+        except Exception as e:
+            self.log.warning("Unable to subscribe to the docker health "
+                             "events: {}".format(e))
+            return False
+
+        # Register before inspecting, so that no event is lost.
+        waiter = gen.Future()
+        self._health_waiters.setdefault(container_id, []).append(waiter)
+        try:
+            info = yield self._docker_client.inspect_container(container_id)
+            state = info.get("State")
+            health = state.get("Health") if isinstance(state, dict) else None
+            if not health:
+                return False
+
+            if health.get("Status") == "healthy":
+                return True
+
+            try:
+                healthy = yield gen.with_timeout(
+                    timedelta(seconds=timeout), waiter)
+            except gen.TimeoutError:
+                raise TimeoutError(
+                    "Container {} didn't become healthy in {} "
+                    "seconds".format(container_id, timeout))
+
+            return healthy
+        finally:
+            waiters = self._health_waiters.get(container_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._health_waiters.pop(container_id, None)
 
     # Private
 
+    def _single_flight(self, inflight, key, operation, *args):
+        """Returns the future of the operation in progress for the given
+        key, or starts the operation if none is in progress.
+
+        Parameters
+        ----------
+        inflight: dict
+            The futures of the operations in progress, by key.
+        key: hashable
+            The key identifying the operation.
+        operation: callable
+            A coroutine performing the operation. It is invoked with *args.
+
+        Return
+        ------
+        A future that resolves, or raises, with the outcome of the operation.
+        """
+        future = inflight.get(key)
+        if future is not None:
+            self.log.info("Joining the operation in progress for {}".format(
+                key))
+            return future
+
+        future = operation(*args)
+        inflight[key] = future
+        future.add_done_callback(lambda f: inflight.pop(key, None))
+        return future
+
     @gen.coroutine
     def _start_container(self,
                          user_name,
@@ -290,16 +666,20 @@ class ContainerManager(LoggingMixin):
                          mapping_id,
                          base_urlpath,
                          volumes,
-                         environment):
+                         environment,
+                         phase_timer):
         """Helper method that performs the physical operation of starting
-        the container.
+        the container, recording the duration of each phase in the
+        phase_timer.
 
         If successful, returns a Container object.
         If any exception occurs, it logs it and re-raises an exception.
         """
 
         try:
-            image_info = yield self._docker_client.inspect_image(image_name)
+            with phase_timer.phase("inspect_image"):
+                image_info = yield self._docker_client.inspect_image(
+                    image_name)
             image_id = image_info["Id"]
         except NotFound as e:
             self.log.error('Could not find requested image {}'.format(
@@ -314,16 +694,120 @@ class ContainerManager(LoggingMixin):
         self.log.info('Got container image: {}'.format(image_name))
 
         # Check if the container is present.
-        container = yield self.find_container(
-            user_name=user_name, mapping_id=mapping_id)
+        with phase_timer.phase("find_duplicate"):
+            container = yield self.find_container(
+                user_name=user_name, mapping_id=mapping_id)
+
+            if container is not None:
+                # Make sure we stop and remove it if by any chance is
+                # already there. This will guarantee a fresh start every
+                # time.
+                self.log.info('Container for image {} '
+                              'already present. Stopping.'.format(image_name))
+                yield self.stop_and_remove_container(container.docker_id)
+
+        create_args = (user_name, image_name, mapping_id, base_urlpath,
+                       volumes, environment)
+        pool_signature = None
+        pooled = None
+        if image_name in self.warm_pool_policy:
+            pool_signature = warm_pool.signature(*create_args)
+            with phase_timer.phase("claim_pooled"):
+                pooled = yield self._claim_pooled_container(pool_signature,
+                                                            image_id,
+                                                            user_name,
+                                                            mapping_id)
+
+        if pooled is not None:
+            # Already started.
+            container_id = pooled.docker_id
+            container_name = pooled.name
+            container_url_id = pooled.url_id
+            container_urlpath = pooled.urlpath
+            self.log.info("Claimed pooled container '%s' (id: %s)",
+                          container_name, container_id)
+        else:
+            (container_id,
+             container_name,
+             container_url_id,
+             container_urlpath) = yield self._create_container(
+                *create_args, phase_timer=phase_timer)
 
-        if container is not None:
-            # Make sure we stop and remove it if by any chance is already
-            # there. This will guarantee a fresh start every time.
-            self.log.info('Container for image {} '
-                          'already present. Stopping.'.format(image_name))
-            yield self.stop_and_remove_container(container.docker_id)
+            # start the container
+            try:
+                with phase_timer.phase("start"):
+                    yield self._docker_client.start(container_id)
+            except Exception as e:
+                self.log.exception("Could not start container {}".format(
+                    container_id))
+                yield self.stop_and_remove_container(container_id)
+                raise e
 
+        try:
+            with phase_timer.phase("ip_port"):
+                ip, port = yield from self._get_ip_and_port(container_id)
+        except Exception as e:
+            self.log.exception(
+                "Could not retrieve ip/port information "
+                "for container {}".format(container_id))
+            yield self.stop_and_remove_container(container_id)
+            raise e
+
+        container = Container(
+            docker_id=container_id,
+            name=container_name,
+            image_name=image_name,
+            image_id=image_id,
+            mapping_id=mapping_id,
+            ip=ip,
+            port=port,
+            url_id=container_url_id,
+            user=user_name,
+            urlpath=container_urlpath,
+            realm=self.realm,
+        )
+
+        self.log.info(
+            ("Started container '{}' (id: {}). "
+             "Exported port reachable at {}:{}").format(
+                container_name,
+                container_id,
+                ip,
+                port
+            )
+        )
+
+        if pool_signature is not None:
+            IOLoop.current().spawn_callback(
+                self._refill_warm_pool, pool_signature, image_id, create_args)
+
+        return container
+
+    @gen.coroutine
+    def _create_container(self,
+                          user_name,
+                          image_name,
+                          mapping_id,
+                          base_urlpath,
+                          volumes,
+                          environment,
+                          pooled=False,
+                          phase_timer=None):
+        """Creates, but does not start, a container.
+
+        Parameters
+        ----------
+        pooled: bool
+            If True, the container is labelled as created by the warm pool
+            of warm_pool_owner, and its name marks it as not claimed.
+        phase_timer: PhaseTimer or None
+            The timer recording the duration of the creation phases.
+        All other parameters are as in start_container.
+
+        Return
+        ------
+        A tuple (container_id, container_name, url_id, urlpath)
+        """
         # Data volume binding to be used with Docker Client
         # volumes = {volume_source: {'bind': volume_target,
         #                            'mode': volume_mode}
@@ -357,6 +841,17 @@ class ContainerManager(LoggingMixin):
         container_name = _generate_container_name(self.realm,
                                                   user_name,
                                                   mapping_id)
+        if pooled:
+            container_name += _POOLED_NAME_SUFFIX
+
+        labels = _get_container_labels(user_name,
+                                       mapping_id,
+                                       container_url_id,
+                                       container_urlpath,
+                                       self.realm)
+        if pooled:
+            labels[SIMPHONY_NS_RUNINFO.warm_pool] = self.warm_pool_owner
+
         create_kwargs = dict(
             image=image_name,
             name=container_name,
@@ -365,11 +860,7 @@ class ContainerManager(LoggingMixin):
                                            environment,
                                            base_urlpath),
             volumes=volume_targets,
-            labels=_get_container_labels(user_name,
-                                         mapping_id,
-                                         container_url_id,
-                                         container_urlpath,
-                                         self.realm))
+            labels=labels)
 
         # build the dictionary of keyword arguments for host_config
         host_config = dict(
@@ -379,63 +870,223 @@ class ContainerManager(LoggingMixin):
             binds=filtered_volumes
         )
 
+        if phase_timer is None:
+            phase_timer = PhaseTimer()
+
         self.log.debug("Starting host with config: %s", host_config)
-        host_config = yield self._docker_client.create_host_config(
-            **host_config)
+        with phase_timer.phase("create_host_config"):
+            host_config = yield self._docker_client.create_host_config(
+                **host_config)
 
         # Get the host_config configuration in create_kwargs.
         # If it's not there, create an empty one.
         # Then update it with the current configuration.
         create_kwargs.setdefault('host_config', {}).update(host_config)
 
-        resp = yield self._docker_client.create_container(**create_kwargs)
+        with phase_timer.phase("create"):
+            resp = yield self._docker_client.create_container(
+                **create_kwargs)
 
         container_id = resp['Id']
 
         self.log.info("Created container '%s' (id: %s) from image %s",
                       container_name, container_id, image_name)
 
-        # start the container
-        try:
-            yield self._docker_client.start(container_id)
-        except Exception as e:
-            self.log.exception("Could not start container {}".format(
-                container_id))
-            yield self.stop_and_remove_container(container_id)
-            raise e
+        return container_id, container_name, container_url_id, \
+            container_urlpath
 
-        try:
-            ip, port = yield from self._get_ip_and_port(container_id)
-        except Exception as e:
-            self.log.exception(
-                "Could not retrieve ip/port information "
-                "for container {}".format(container_id))
-            yield self.stop_and_remove_container(container_id)
-            raise e
+    @gen.coroutine
+    def _claim_pooled_container(self, signature, image_id, user_name,
+                                mapping_id):
+        """Takes a container started in advance for the given signature
+        out of the warm pool, and gives it the name of a user container.
 
-        container = Container(
-            docker_id=container_id,
-            name=container_name,
-            image_name=image_name,
-            image_id=image_id,
-            mapping_id=mapping_id,
-            ip=ip,
-            port=port,
-            url_id=container_url_id,
-            urlpath=container_urlpath,
-        )
+        Parameters
+        ----------
+        signature: str
+            The creation signature, as returned by warm_pool.signature
+        image_id: str
+            The current id of the image. Pooled containers created from a
+            different version of the image are discarded.
+        user_name: str
+            The name of the user
+        mapping_id: str
+            The mapping id
 
-        self.log.info(
-            ("Started container '{}' (id: {}). "
-             "Exported port reachable at {}:{}").format(
-                container_name,
-                container_id,
-                ip,
-                port
-            )
-        )
+        Return
+        ------
+        A PooledContainer, or None if none is available.
+        """
+        yield self._remove_pooled_containers(self._warm_pool.expire())
 
-        return container
+        while True:
+            entry = self._warm_pool.claim(signature)
+            if entry is None:
+                return None
+
+            if entry.image_id != image_id:
+                self.log.info("Discarding pooled container {} created from "
+                              "an outdated image".format(entry.docker_id))
+                yield self._remove_pooled_containers([entry])
+                continue
+
+            name = _generate_container_name(self.realm,
+                                            user_name,
+                                            mapping_id)
+            try:
+                info = yield self._docker_client.inspect_container(
+                    entry.docker_id)
+                if not info["State"]["Running"]:
+                    raise RuntimeError("Container is not running")
+
+                yield self._docker_client.rename(entry.docker_id, name)
+            except Exception as e:
+                self.log.warning("Discarding pooled container {}: "
+                                 "{}".format(entry.docker_id, e))
+                yield self._remove_pooled_containers([entry])
+                continue
+
+            return entry._replace(name=name)
+
+    @gen.coroutine
+    def _refill_warm_pool(self, signature, image_id, create_args):
+        """Creates and starts containers in advance for the given
+        signature, until the number required by the warm pool policy of
+        the image is reached.
+
+        Parameters
+        ----------
+        signature: str
+            The creation signature, as returned by warm_pool.signature
+        image_id: str
+            The id of the image
+        create_args: tuple
+            The positional arguments for _create_container.
+        """
+        image_name = create_args[1]
+        target = self.warm_pool_policy.get(image_name, 0)
+
+        if not self._warm_pool_reaped:
+            self._warm_pool_reaped = True
+            yield self._reap_stale_pooled_containers()
+
+        while self._warm_pool.count(signature) < target:
+            # The limit applies to the pooled containers of all the
+            # processes sharing the docker host.
+            try:
+                num_pooled = yield self._count_pooled_containers()
+            except Exception:
+                self.log.exception("Unable to count the pooled containers")
+                return
+
+            if num_pooled >= self.warm_pool_max_containers:
+                self.log.info("Not creating pooled containers for image {}: "
+                              "{} pooled containers on the docker "
+                              "host".format(image_name, num_pooled))
+                return
+
+            self._warm_pool.creation_started(signature)
+            try:
+                result = yield self._create_container(*create_args,
+                                                      pooled=True)
+                entry = self._warm_pool.new_entry(
+                    result[0], result[1], image_id, result[2], result[3])
+                try:
+                    yield self._docker_client.start(entry.docker_id)
+                except Exception:
+                    yield self._remove_pooled_containers([entry])
+                    raise
+            except Exception:
+                self.log.exception("Unable to create pooled container "
+                                   "for image {}".format(image_name))
+                return
+            finally:
+                self._warm_pool.creation_finished(signature)
+
+            evicted = self._warm_pool.add(signature, entry)
+            self._start_warm_pool_expiry()
+            yield self._remove_pooled_containers(evicted)
+
+    @gen.coroutine
+    def drain_warm_pool(self):
+        """Removes all the containers created in advance by the warm
+        pool."""
+        if self._warm_pool_expiry is not None:
+            self._warm_pool_expiry.stop()
+            self._warm_pool_expiry = None
+
+        yield self._remove_pooled_containers(self._warm_pool.drain())
+
+    def _start_warm_pool_expiry(self):
+        """Starts removing the expired pooled containers periodically,
+        so that they do not wait for the next claim."""
+        if self._warm_pool_expiry is None:
+            interval = min(self.warm_pool_ttl / 4, 60.0)
+            self._warm_pool_expiry = PeriodicCallback(
+                self._expire_warm_pool, interval * 1000)
+            self._warm_pool_expiry.start()
+
+    @gen.coroutine
+    def _expire_warm_pool(self):
+        """Removes the expired pooled containers."""
+        yield self._remove_pooled_containers(self._warm_pool.expire())
+
+    @gen.coroutine
+    def _remove_pooled_containers(self, entries):
+        """Removes the docker containers of the given pool entries."""
+        for entry in entries:
+            try:
+                yield self._docker_client.remove_container(entry.docker_id,
+                                                           force=True)
+            except Exception:
+                self.log.exception("Unable to remove pooled container "
+                                   "{}".format(entry.docker_id))
+
+    @gen.coroutine
+    def _count_pooled_containers(self):
+        """Returns the number of unclaimed pooled containers of our realm
+        on the docker host, whatever their owner."""
+        infos = yield self._docker_client.containers(
+            all=True,
+            filters={
+                'label': [
+                    '{}={}'.format(SIMPHONY_NS_RUNINFO.realm, self.realm),
+                    SIMPHONY_NS_RUNINFO.warm_pool]
+            })
+
+        return len([info for info in infos if _is_pooled_info(info)])
+
+    @gen.coroutine
+    def _reap_stale_pooled_containers(self):
+        """Removes the unclaimed pooled containers of our realm and owner
+        that were left behind by a previous run. The pooled containers of
+        the other owners are in use by other processes."""
+        try:
+            infos = yield self._docker_client.containers(
+                all=True,
+                filters={
+                    'label': [
+                        '{}={}'.format(SIMPHONY_NS_RUNINFO.realm,
+                                       self.realm),
+                        '{}={}'.format(SIMPHONY_NS_RUNINFO.warm_pool,
+                                       self.warm_pool_owner)]
+                })
+        except Exception:
+            self.log.exception("Unable to list stale pooled containers")
+            return
+
+        for info in infos:
+            if not _is_pooled_info(info):
+                continue
+
+            self.log.info("Removing stale pooled container {}".format(
+                info["Id"]))
+            try:
+                yield self._docker_client.remove_container(info["Id"],
+                                                           force=True)
+            except Exception:
+                self.log.exception("Unable to remove pooled container "
+                                   "{}".format(info["Id"]))
 
     def _get_ip_and_port(self, container_id):
         """Returns the ip and port where the container service can be
@@ -474,6 +1125,49 @@ class ContainerManager(LoggingMixin):
             raise RuntimeError("Failed to get port info for {}. "
                                "Port response was None.".format(container_id))
 
+        try:
+            port = int(resp[0]['HostPort'])
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            raise RuntimeError("Failed to get port info for {}. "
+                               "Exception: {}.".format(container_id,
+                                                       str(e)))
+
+        return self._get_docker_host_ip(), port
+
+    def _get_ip_and_port_from_list_info(self, info):
+        """Returns the ip and port where the container service can be
+        reached, using the port bindings contained in an item of the
+        container list output. No additional docker call is performed.
+
+        Parameters
+        ----------
+        info: dict
+            One item from the result of docker.Client.containers
+
+        Return
+        ------
+        A tuple (ip, port), or None if the bindings of the container
+        port are missing or ambiguous.
+        """
+        public_ports = set()
+        for binding in info.get("Ports") or []:
+            if (binding.get("PrivatePort") == self.container_port and
+                    binding.get("Type", "tcp") == "tcp"):
+                public_ports.add(binding.get("PublicPort"))
+
+        if len(public_ports) != 1:
+            return None
+
+        try:
+            port = int(public_ports.pop())
+        except (ValueError, TypeError):
+            return None
+
+        return self._get_docker_host_ip(), port
+
+    def _get_docker_host_ip(self):
+        """Returns the ip where the ports exported by the containers
+        can be reached."""
         # We assume we are running on linux without any additional docker
         # machine. The container will therefore be reachable at 127.0.0.1.
         # If we instead have a docker machine configuration, we use the
@@ -486,14 +1180,7 @@ class ContainerManager(LoggingMixin):
             if url.scheme != 'unix':
                 ip = url.hostname
 
-        try:
-            port = int(resp[0]['HostPort'])
-        except (KeyError, IndexError, ValueError, TypeError) as e:
-            raise RuntimeError("Failed to get port info for {}. "
-                               "Exception: {}.".format(container_id,
-                                                       str(e)))
-
-        return ip, port
+        return ip
 
     @gen.coroutine
     def _get_container_info(self, container_id):
@@ -587,9 +1274,260 @@ class ContainerManager(LoggingMixin):
         else:
             self.log.info("Container '{}' is removed.".format(container_id))
 
+    def _subscribe_image_events(self):
+        """Subscribes to the docker image events, to invalidate the
+        cached images when they change."""
+        def subscribed(future):
+            if future.exception() is not None:
+                self.log.warning(
+                    "Unable to subscribe to the docker image events: "
+                    "{}".format(future.exception()))
+                self._image_events = None
+                return
+
+            IOLoop.current().add_future(future.result(),
+                                        image_events_closed)
+
+        def image_events_closed(future):
+            # Changes may be lost until we subscribe again.
+            self._image_cache.clear()
+            self._image_events = None
+
+        self._image_events = self._docker_client.stream_events(
+            self._image_event_received,
+            filters={
+                'event': ['delete', 'import', 'load', 'pull', 'tag', 'untag']
+            })
+        IOLoop.current().add_future(self._image_events, subscribed)
+
+    def _image_event_received(self, event):
+        """Invalidates the cached images affected by a docker event."""
+        if event.get("Type", "image") != "image":
+            return
+
+        actor = event.get("Actor", {})
+        refs = {event.get("id"), actor.get("ID"),
+                actor.get("Attributes", {}).get("name")}
+        refs.discard(None)
+
+        for key, image in self._image_cache.items():
+            if refs & {key, image.docker_id, image.name}:
+                self._image_cache.pop(key)
+
+    def _subscribe_health_events(self):
+        """Subscribes to the docker health_status events, if not already
+        subscribed.
+
+        Return
+        ------
+        A future that resolves when the subscription is established.
+        """
+        if self._health_events is not None:
+            return self._health_events
+
+        def subscribed(future):
+            if future.exception() is not None:
+                self._health_events = None
+                return
+
+            IOLoop.current().add_future(future.result(),
+                                        health_events_closed)
+
+        def health_events_closed(future):
+            # Let the waiters fall back to other readiness checks.
+            self._health_events = None
+            for waiters in self._health_waiters.values():
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(False)
+
+        self._health_events = self._docker_client.stream_events(
+            self._health_event_received,
+            filters={
+                'type': ['container'],
+                'event': ['health_status'],
+                'label': ['{}={}'.format(SIMPHONY_NS_RUNINFO.realm,
+                                         self.realm)]
+            })
+        IOLoop.current().add_future(self._health_events, subscribed)
+        return self._health_events
+
+    def _health_event_received(self, event):
+        """Wakes up the waiters of a container that became healthy."""
+        action = event.get("Action") or event.get("status") or ""
+        if action.partition(":")[2].strip() != "healthy":
+            return
+
+        docker_id = event.get("id") or event.get("Actor", {}).get("ID")
+        for waiter in self._health_waiters.get(docker_id, []):
+            if not waiter.done():
+                waiter.set_result(True)
+
+    def _sync_index(self):
+        """Makes sure that the container index is synchronized with
+        docker, subscribing to the event stream and seeding the index
+        if needed.
+
+        Return
+        ------
+        A future that resolves to True when the index is ready to answer
+        queries, or to False if the event stream ended during the
+        synchronization.
+        """
+        if self._index_sync is None:
+            self._index_generation += 1
+            sync = self._seed_index(self._index_generation)
+            self._index_sync = sync
+
+            def sync_done(future):
+                # Retry at the next lookup if seeding failed.
+                if future.exception() is not None and self._index_sync is sync:
+                    self._index_sync = None
+
+            IOLoop.current().add_future(sync, sync_done)
+
+        return self._index_sync
+
+    @gen.coroutine
+    def _seed_index(self, generation):
+        """Subscribes to the docker events and fills the index with
+        the running containers of our realm.
+
+        The subscription happens before the listing, so that no change is
+        lost. The events received in the meantime are applied after the
+        index has been filled.
+
+        Return
+        ------
+        True if the index has been filled, False if the synchronization
+        has been superseded, e.g. because the event stream ended.
+        """
+        self._index_backlog = []
+        realm_label = '{}={}'.format(SIMPHONY_NS_RUNINFO.realm, self.realm)
+
+        stream_closed = yield self._docker_client.stream_events(
+            lambda event: self._index_event_received(generation, event),
+            filters={
+                'event': ['start', 'rename', 'die', 'destroy'],
+                'label': [realm_label]
+            })
+        IOLoop.current().add_future(
+            stream_closed,
+            lambda future: self._index_stream_closed(generation, future))
+
+        containers = yield self.containers_from_filters(
+            {'label': [realm_label]})
+
+        if generation != self._index_generation:
+            return False
+
+        self._index.replace(containers)
+        backlog, self._index_backlog = self._index_backlog, None
+        for event in backlog:
+            self._apply_index_event(event)
+
+        self.log.info("Container index synchronized: {} containers".format(
+            len(containers)))
+        return True
+
+    def _index_event_received(self, generation, event):
+        """Called on the IOLoop for each event of the docker event
+        stream started by the given synchronization generation."""
+        if generation != self._index_generation:
+            return
+
+        if self._index_backlog is not None:
+            self._index_backlog.append(event)
+        else:
+            self._apply_index_event(event)
+
+    def _index_stream_closed(self, generation, future):
+        """Called when the event stream ends. The index can no longer
+        be trusted, and will be resynchronized at the next lookup."""
+        if generation != self._index_generation:
+            return
+
+        exc = future.exception()
+        if exc is not None:
+            self.log.warning("Docker event stream interrupted: {}. "
+                             "Container index will be resynchronized.".format(
+                                 exc))
+        else:
+            self.log.info("Docker event stream ended. "
+                          "Container index will be resynchronized.")
+
+        # Supersede a synchronization still in progress.
+        self._index_generation += 1
+        self._index_sync = None
+        self._index_backlog = None
+        self._index_pending = {}
+
+    def _apply_index_event(self, event):
+        """Updates the index according to a docker container event."""
+        if event.get("Type", "container") != "container":
+            return
+
+        action = event.get("Action") or event.get("status")
+        docker_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not docker_id:
+            return
+
+        if action in ("start", "rename"):
+            # A pooled container becomes visible when renamed at its
+            # claim.
+            token = object()
+            self._index_pending[docker_id] = token
+            IOLoop.current().spawn_callback(
+                self._index_container, docker_id, token)
+        elif action in ("die", "destroy"):
+            self._index_pending.pop(docker_id, None)
+            self._index.remove(docker_id)
+
+    @gen.coroutine
+    def _index_container(self, docker_id, token):
+        """Retrieves the information of a started container and adds
+        it to the index, unless the container has been stopped in the
+        meantime."""
+        try:
+            containers = yield self.containers_from_filters({
+                'id': [docker_id],
+                'label': ['{}={}'.format(SIMPHONY_NS_RUNINFO.realm,
+                                         self.realm)]
+            })
+        except Exception:
+            self.log.exception(
+                "Unable to retrieve information for container {}".format(
+                    docker_id))
+            containers = []
+
+        if self._index_pending.get(docker_id) is not token:
+            return
+
+        del self._index_pending[docker_id]
+        for container in containers:
+            self._index.add(container)
+
+    @default("_warm_pool")
+    def _warm_pool_default(self):
+        return WarmPool(self.warm_pool_max_containers, self.warm_pool_ttl)
+
+    @default("_image_cache")
+    def _image_cache_default(self):
+        if self.image_cache_size <= 0:
+            return None
+
+        return TTLCache(self.image_cache_size, self.image_cache_ttl)
+
     @default("_docker_client")
     def _docker_client_default(self):
-        return AsyncDockerClient(**self.docker_config)
+        if self.docker_native_client:
+            return NativeDockerClient(**self.docker_config)
+
+        return AsyncDockerClient(
+            query_workers=self.docker_query_workers,
+            mutating_workers=self.docker_mutating_workers,
+            pull_workers=self.docker_pull_workers,
+            **self.docker_config)
 
 
 def _get_container_env(user_name, url_id, environment, base_urlpath):
@@ -691,6 +1629,18 @@ def _generate_container_name(realm, user_name, mapping_id):
                                 )
 
 
+def _is_pooled_name(name):
+    """Returns True if the container name is the one of a pooled
+    container not yet claimed."""
+    return name.endswith(_POOLED_NAME_SUFFIX)
+
+
+def _is_pooled_info(info):
+    """Returns True if the docker container list entry is a pooled
+    container not yet claimed."""
+    return any(_is_pooled_name(name) for name in info.get("Names") or ())
+
+
 def _generate_container_url_id():
     """Generates a unique string to identify the container through a url"""
     return uuid.uuid4().hex
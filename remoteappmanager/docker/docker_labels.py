@@ -73,6 +73,10 @@ SIMPHONY_NS_RUNINFO = DockerLabelNamespace(
         # Useful to differentiate docker containers that belong to other
         # instances of simphony-remote, or simply containers that do not
         # belong to an instance at all
-        "realm"
+        "realm",
+        # Present on the containers that have been created in advance
+        # by the warm pool of the container manager. The value is the
+        # owner of the warm pool, e.g. the user of the process.
+        "warm_pool",
     ],
 )
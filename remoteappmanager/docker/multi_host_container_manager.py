@@ -0,0 +1,305 @@
+import collections
+
+from docker.errors import NotFound
+from tornado import gen
+from traitlets import Any, List, Instance, default
+
+from remoteappmanager.cache import TTLCache
+from remoteappmanager.docker import warm_pool
+from remoteappmanager.docker.container_manager import ContainerManager
+
+
+class MultiHostContainerManager(ContainerManager):
+    """A ContainerManager that spreads the containers over several docker
+    hosts, each handled by its own ContainerManager.
+
+    New containers are placed on the least loaded host, while the
+    lookups aggregate the containers of all the hosts. The ip of each
+    container is the one of the host running it.
+    """
+
+    #: The managers of the individual docker hosts.
+    host_managers = List(Instance(ContainerManager))
+
+    #: docker id -> manager of the host running the container. Bounded,
+    #: as the containers removed by others are never reported. A missing
+    #: entry is found again by asking all the hosts.
+    _container_hosts = Instance(TTLCache, args=(1024, 3600.0))
+
+    #: manager -> number of containers being placed on its host.
+    _placements = Instance(collections.Counter, args=())
+
+    #: The docker calls go through the host managers. There is no docker
+    #: client of our own.
+    _docker_client = Any(None)
+
+    def __init__(self, docker_configs=(), *args, **kwargs):
+        """Initializes the manager.
+
+        Parameters
+        ----------
+        docker_configs: list
+            The docker client configurations, one per docker host, as
+            accepted by ContainerManager. Not needed if host_managers
+            is specified.
+        **kwargs:
+            The traits of the host managers, e.g. realm. They are also
+            set on this manager.
+        """
+        super().__init__({}, *args, **kwargs)
+
+        if not self.host_managers:
+            self.host_managers = [
+                ContainerManager(docker_config, *args, **kwargs)
+                for docker_config in docker_configs]
+
+        if not self.host_managers:
+            raise ValueError("At least one docker host is required")
+
+        # The lookups are served by the host managers, which keep their own
+        # index if docker_event_cache is set.
+        self.docker_event_cache = False
+
+    @gen.coroutine
+    def containers_from_filters(self, filters):
+        results = yield self._on_all_hosts(
+            lambda manager: manager.containers_from_filters(filters))
+        return self._collect(results)
+
+    @gen.coroutine
+    def find_containers(self,
+                        *,
+                        url_id=None,
+                        mapping_id=None,
+                        user_name=None):
+        """Finds and returns the containers matching all the specified
+        arguments, on all the hosts. The hosts that cannot be reached
+        are skipped.
+        """
+        results = yield self._on_all_hosts(
+            lambda manager: manager.find_containers(url_id=url_id,
+                                                    mapping_id=mapping_id,
+                                                    user_name=user_name))
+        return self._collect(results)
+
+    @gen.coroutine
+    def image(self, image_id_or_name):
+        """Returns the Image object associated to a given id, from the
+        first host that has the image."""
+        for manager in self.host_managers:
+            try:
+                image = yield manager.image(image_id_or_name)
+            except Exception as e:
+                self.log.warning("Unable to retrieve image {}: {}".format(
+                    image_id_or_name, e))
+                continue
+
+            if image is not None:
+                return image
+
+        return None
+
+    @gen.coroutine
+    def has_image(self, image_name):
+        """Returns True if the image is present on all the hosts."""
+        present = yield [manager.has_image(image_name)
+                         for manager in self.host_managers]
+        return all(present)
+
+    @gen.coroutine
+    def pull_image(self, image_name, progress_callback=None):
+        """Pulls an image on the hosts that don't have it."""
+        present = yield [manager.has_image(image_name)
+                         for manager in self.host_managers]
+        yield [manager.pull_image(image_name, progress_callback)
+               for manager, has_image in zip(self.host_managers, present)
+               if not has_image]
+
+    @gen.coroutine
+    def host_info(self):
+        """Returns the docker info of each host, in the order of
+        host_managers. None for the hosts that cannot be reached."""
+        results = yield self._on_all_hosts(
+            lambda manager: manager.host_info())
+        infos = dict(results)
+        return [infos.get(manager) for manager in self.host_managers]
+
+    @gen.coroutine
+    def wait_for_container_healthy(self, container_id, timeout):
+        manager = yield self._host_of(container_id)
+        if manager is None:
+            return False
+
+        healthy = yield manager.wait_for_container_healthy(container_id,
+                                                           timeout)
+        return healthy
+
+    @gen.coroutine
+    def prefill_warm_pool(self,
+                          user_name,
+                          image_name,
+                          mapping_id,
+                          base_urlpath,
+                          volumes,
+                          environment=None):
+        """Creates the pooled containers on the host where the start
+        would be placed."""
+        manager = yield self._place(user_name, mapping_id)
+        yield manager.prefill_warm_pool(user_name,
+                                        image_name,
+                                        mapping_id,
+                                        base_urlpath,
+                                        volumes,
+                                        environment)
+
+    @gen.coroutine
+    def drain_warm_pool(self):
+        yield [manager.drain_warm_pool() for manager in self.host_managers]
+
+    # Private
+
+    @gen.coroutine
+    def _start_container(self,
+                         user_name,
+                         image_name,
+                         mapping_id,
+                         base_urlpath,
+                         volumes,
+                         environment,
+                         phase_timer):
+        """Places the container on a host, and starts it there."""
+        signature = warm_pool.signature(user_name,
+                                        image_name,
+                                        mapping_id,
+                                        base_urlpath,
+                                        volumes,
+                                        environment)
+        with phase_timer.phase("placement"):
+            manager = yield self._place(user_name, mapping_id, signature)
+
+        self._placements[manager] += 1
+        try:
+            container = yield manager.start_container(
+                user_name,
+                image_name,
+                mapping_id,
+                base_urlpath,
+                volumes,
+                environment,
+                phase_timer=phase_timer)
+        finally:
+            self._placements[manager] -= 1
+            if self._placements[manager] <= 0:
+                del self._placements[manager]
+
+        self._container_hosts.set(container.docker_id, manager)
+        return container
+
+    @gen.coroutine
+    def _stop_and_remove_container(self, container_id):
+        manager = yield self._host_of(container_id)
+        if manager is None:
+            self.log.warning("Container '{}' not found on any docker "
+                             "host".format(container_id))
+            return
+
+        yield manager.stop_and_remove_container(container_id)
+        self._container_hosts.pop(container_id, None)
+
+    @gen.coroutine
+    def _place(self, user_name, mapping_id, signature=None):
+        """Returns the manager of the host where a container for the
+        given user and mapping must be started.
+
+        A host already running a container for the same user and mapping
+        is preferred, so that it deals with the duplicate, then a host
+        with a pooled container for the creation signature, if given.
+        Otherwise, the host with the most memory per container, counting
+        the one we are about to start, is chosen. Hosts reporting no
+        memory are ranked by number of running containers.
+        """
+        results = yield self._on_all_hosts(
+            lambda manager: manager.find_containers(user_name=user_name,
+                                                    mapping_id=mapping_id))
+        for manager, containers in results:
+            if containers:
+                return manager
+
+        if signature is not None:
+            for manager in self.host_managers:
+                if manager._warm_pool.count(signature):
+                    return manager
+
+        infos = yield self._on_all_hosts(
+            lambda manager: manager.host_info())
+        if not infos:
+            raise RuntimeError("No docker host available")
+
+        def score(manager_info):
+            manager, info = manager_info
+            running = (info.get("ContainersRunning", 0) +
+                       self._placements[manager])
+            memory = info.get("MemTotal", 0)
+            return memory / (running + 1), -running
+
+        manager, _ = max(infos, key=score)
+        return manager
+
+    @gen.coroutine
+    def _host_of(self, container_id):
+        """Returns the manager of the host running the container,
+        or None if no host has it."""
+        manager = self._container_hosts.get(container_id)
+        if manager is not None:
+            return manager
+
+        @gen.coroutine
+        def inspect(manager):
+            try:
+                yield manager._docker_client.inspect_container(container_id)
+            except NotFound:
+                return False
+            return True
+
+        results = yield self._on_all_hosts(inspect)
+        for manager, found in results:
+            if found:
+                return manager
+
+        return None
+
+    @default("_docker_client")
+    def _docker_client_default(self):
+        return None
+
+    @gen.coroutine
+    def _on_all_hosts(self, call):
+        """Invokes call(manager) concurrently for each host manager.
+
+        Return
+        ------
+        A list of (manager, result) for the hosts where the call
+        succeeded. The failures are logged.
+        """
+        @gen.coroutine
+        def invoke(manager):
+            try:
+                result = yield call(manager)
+            except Exception as e:
+                self.log.warning("Docker host {} failed: {}".format(
+                    manager.docker_config.get("base_url", "default"), e))
+                return None
+            return (manager, result)
+
+        results = yield [invoke(manager) for manager in self.host_managers]
+        return [result for result in results if result is not None]
+
+    def _collect(self, results):
+        """Concatenates the containers found on the hosts, remembering
+        on which host each one is running."""
+        containers = []
+        for manager, host_containers in results:
+            for container in host_containers:
+                self._container_hosts.set(container.docker_id, manager)
+            containers.extend(host_containers)
+        return containers
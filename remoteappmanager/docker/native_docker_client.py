@@ -0,0 +1,594 @@
+import codecs
+import collections
+import json
+import socket
+import ssl
+import sys
+from urllib.parse import quote_plus, urlencode, urlparse
+
+import requests
+from docker import constants, errors, tls as docker_tls
+from docker.utils import utils as docker_utils
+from tornado import gen, httputil, iostream, locks
+from tornado.concurrent import Future, chain_future
+from tornado.http1connection import (
+    HTTP1Connection,
+    HTTP1ConnectionParameters)
+from tornado.ioloop import IOLoop
+from tornado.tcpclient import TCPClient
+
+
+class NativeDockerClient:
+    """Asynchronous client for the Docker Engine HTTP API.
+
+    Unlike AsyncDockerClient, which runs the synchronous docker-py client
+    in a thread pool, this client talks HTTP to the docker daemon
+    directly from the tornado IOLoop, either over the unix socket or over
+    TCP (optionally with TLS). Connections are kept alive and reused.
+
+    The methods that the application needs are exported with the same
+    name, arguments and result format of the docker-py client, but they
+    return futures that must be yielded. Errors are reported with the
+    docker-py exceptions (docker.errors.APIError and NotFound).
+
+    This class is not thread safe: it must be used from the IOLoop
+    thread only.
+    """
+
+    def __init__(self,
+                 base_url=None,
+                 version=None,
+                 timeout=constants.DEFAULT_TIMEOUT_SECONDS,
+                 tls=False,
+                 max_connections=10):
+        """Initialises the client.
+
+        Parameters
+        ----------
+        base_url: str
+            The docker url, as in docker-py (e.g. unix://var/run/docker.sock
+            or tcp://192.168.99.100:2376).
+        version: str
+            The API version to use. "auto" retrieves the version from the
+            server at the first request. None uses the docker-py default.
+        timeout: int
+            The timeout, in seconds, for connections and requests.
+        tls: bool or docker.tls.TLSConfig
+            The TLS configuration, as in docker-py.
+        max_connections: int
+            The maximum number of concurrent connections to the daemon.
+            Idle connections are kept open for reuse.
+        """
+        if tls and not base_url:
+            raise errors.TLSParameterError(
+                'If using TLS, the base_url argument must be provided.')
+
+        self.timeout = timeout
+
+        url = docker_utils.parse_host(base_url, sys.platform, tls=bool(tls))
+        if url.startswith('http+unix://'):
+            path = url[len('http+unix://'):]
+            self._unix_socket_path = path if path.startswith("/") else "/"+path
+            self._host = "localunixsocket"
+            self._port = None
+            self._ssl_options = None
+        else:
+            parsed = urlparse(url)
+            self._unix_socket_path = None
+            self._host = parsed.hostname
+            self._port = parsed.port or (
+                443 if parsed.scheme == "https" else 80)
+            self._ssl_options = (_ssl_context(tls)
+                                 if parsed.scheme == "https" else None)
+
+        if version is None:
+            self._version = constants.DEFAULT_DOCKER_API_VERSION
+        elif isinstance(version, str):
+            self._version = None if version.lower() == "auto" else version
+        else:
+            raise errors.DockerException(
+                'Version parameter must be a string or None. Found {0}'.format(
+                    type(version).__name__))
+
+        self._tcp_client = TCPClient()
+        self._connection_slots = locks.Semaphore(max_connections)
+        self._idle_streams = collections.deque()
+
+    # Docker API
+
+    @gen.coroutine
+    def version(self, api_version=True):
+        result = yield self._request_json(
+            "GET", "/version", versioned_api=api_version)
+        return result
+
+    @gen.coroutine
+    def info(self):
+        result = yield self._request_json("GET", "/info")
+        return result
+
+    @gen.coroutine
+    def ping(self):
+        result = yield self._request("GET", "/_ping")
+        return result.decode("utf-8")
+
+    @gen.coroutine
+    def containers(self, quiet=False, all=False, trunc=False, latest=False,
+                   since=None, before=None, limit=-1, size=False,
+                   filters=None):
+        params = {
+            'limit': 1 if latest else limit,
+            'all': 1 if all else 0,
+            'size': 1 if size else 0,
+            'trunc_cmd': 1 if trunc else 0,
+            'since': since,
+            'before': before
+        }
+        if filters:
+            params['filters'] = docker_utils.convert_filters(filters)
+
+        result = yield self._request_json(
+            "GET", "/containers/json", params=params)
+
+        if quiet:
+            return [{'Id': x['Id']} for x in result]
+        if trunc:
+            for x in result:
+                x['Id'] = x['Id'][:12]
+        return result
+
+    @gen.coroutine
+    def inspect_container(self, container):
+        result = yield self._request_json(
+            "GET", "/containers/{0}/json", container)
+        return result
+
+    @gen.coroutine
+    def port(self, container, private_port):
+        info = yield self.inspect_container(container)
+        private_port = str(private_port)
+
+        # Port settings is None when the container is running with
+        # network_mode=host.
+        port_settings = info.get('NetworkSettings', {}).get('Ports')
+        if port_settings is None:
+            return None
+
+        if '/' in private_port:
+            return port_settings.get(private_port)
+
+        h_ports = port_settings.get(private_port + '/tcp')
+        if h_ports is None:
+            h_ports = port_settings.get(private_port + '/udp')
+
+        return h_ports
+
+    @gen.coroutine
+    def create_host_config(self, *args, **kwargs):
+        if 'version' in kwargs:
+            raise TypeError(
+                "create_host_config() got an unexpected "
+                "keyword argument 'version'")
+
+        version = yield self._api_version()
+        return docker_utils.create_host_config(
+            *args, version=version, **kwargs)
+
+    @gen.coroutine
+    def create_container(self, image, command=None, name=None, **kwargs):
+        version = yield self._api_version()
+        volumes = kwargs.get("volumes")
+        if isinstance(volumes, str):
+            kwargs["volumes"] = [volumes]
+
+        config = docker_utils.create_container_config(
+            version, image, command, **kwargs)
+
+        result = yield self._request_json(
+            "POST", "/containers/create",
+            params={'name': name},
+            body=config)
+        return result
+
+    @gen.coroutine
+    def start(self, container):
+        yield self._request("POST", "/containers/{0}/start", container)
+
+    @gen.coroutine
+    def stop(self, container, timeout=10):
+        yield self._request("POST", "/containers/{0}/stop", container,
+                            params={'t': timeout},
+                            request_timeout=timeout + (self.timeout or 0))
+
+    @gen.coroutine
+    def remove_container(self, container, v=False, link=False, force=False):
+        yield self._request("DELETE", "/containers/{0}", container,
+                            params={'v': v, 'link': link, 'force': force})
+
+    @gen.coroutine
+    def rename(self, container, name):
+        yield self._request("POST", "/containers/{0}/rename", container,
+                            params={'name': name})
+
+    @gen.coroutine
+    def images(self, name=None, quiet=False, all=False, filters=None):
+        params = {
+            'filter': name,
+            'only_ids': 1 if quiet else 0,
+            'all': 1 if all else 0,
+        }
+        if filters:
+            params['filters'] = docker_utils.convert_filters(filters)
+
+        result = yield self._request_json("GET", "/images/json",
+                                          params=params)
+        if quiet:
+            return [x['Id'] for x in result]
+        return result
+
+    @gen.coroutine
+    def inspect_image(self, image):
+        result = yield self._request_json("GET", "/images/{0}/json", image)
+        return result
+
+    def stream_events(self, callback, filters=None):
+        """Subscribes to the docker event stream.
+
+        Parameters
+        ----------
+        callback: callable
+            Invoked with each decoded event dictionary, in the order they
+            are received.
+        filters: dict or None
+            The event filters, as in dockerpy.
+
+        Return
+        ------
+        A future that resolves once the subscription is established.
+        Its result is another future, that resolves when the stream ends,
+        or raises if the stream is interrupted by an error.
+        """
+        params = {}
+        if filters:
+            params['filters'] = docker_utils.convert_filters(filters)
+
+        subscribed = Future()
+
+        def headers_received():
+            if not subscribed.done():
+                subscribed.set_result(closed)
+
+        def request_done(future):
+            if not subscribed.done():
+                chain_future(future, subscribed)
+
+        closed = self._request("GET", "/events",
+                               params=params,
+                               request_timeout=0,
+                               streaming_callback=_json_stream(callback),
+                               headers_callback=headers_received)
+        closed.add_done_callback(request_done)
+
+        return subscribed
+
+    @gen.coroutine
+    def stream_pull(self, repository, tag=None, progress_callback=None):
+        """Pulls an image, reporting the progress.
+
+        Parameters
+        ----------
+        repository: str
+            The image repository, e.g. simphonyproject/simphony-mayavi
+        tag: str or None
+            The tag to pull. If None, all the tags are pulled.
+        progress_callback: callable or None
+            Invoked with each decoded progress dictionary, in the order
+            they are received.
+
+        Raises
+        ------
+        docker.errors.DockerException
+            If the daemon reports an error during the pull.
+        """
+        pull_errors = []
+
+        def progress(item):
+            if "error" in item:
+                pull_errors.append(item["error"])
+            if progress_callback is not None:
+                progress_callback(item)
+
+        yield self._request("POST", "/images/create",
+                            params={'fromImage': repository, 'tag': tag},
+                            request_timeout=0,
+                            streaming_callback=_json_stream(progress))
+
+        if pull_errors:
+            raise errors.DockerException(
+                "Failed to pull {}: {}".format(repository, pull_errors[-1]))
+
+    def close(self):
+        """Closes all the idle connections."""
+        while self._idle_streams:
+            self._idle_streams.popleft().close()
+
+    # Private
+
+    @gen.coroutine
+    def _api_version(self):
+        """Returns the API version, retrieving it from the server if
+        the client was created with version="auto"."""
+        if self._version is None:
+            result = yield self.version(api_version=False)
+            try:
+                self._version = result["ApiVersion"]
+            except KeyError:
+                raise errors.DockerException(
+                    'Invalid response from docker daemon: key "ApiVersion"'
+                    ' is missing.')
+
+        return self._version
+
+    @gen.coroutine
+    def _request_json(self, method, pathfmt, *args, **kwargs):
+        """Performs a request and decodes the JSON response."""
+        body = yield self._request(method, pathfmt, *args, **kwargs)
+        return json.loads(body.decode("utf-8"))
+
+    @gen.coroutine
+    def _request(self, method, pathfmt, *args,
+                 params=None,
+                 body=None,
+                 versioned_api=True,
+                 request_timeout=None,
+                 streaming_callback=None,
+                 headers_callback=None):
+        """Performs an HTTP request against the docker daemon.
+
+        Parameters
+        ----------
+        method: str
+            The HTTP method
+        pathfmt: str
+            The API path, with {0}... placeholders for the *args,
+            which will be quoted.
+        params: dict or None
+            The query arguments. None values are skipped.
+        body: dict or None
+            A dictionary that will be sent JSON encoded. None values are
+            skipped.
+        versioned_api: bool
+            If True, the path is prefixed with the API version.
+        request_timeout: float or None
+            The timeout for the whole request. None uses the client timeout.
+        streaming_callback: callable or None
+            If given, it is called with each chunk of the response body
+            as it arrives, and the body is not accumulated.
+        headers_callback: callable or None
+            If given, it is called without arguments when the response
+            headers are received.
+
+        Return
+        ------
+        The response body as bytes (empty if streamed).
+
+        Raises
+        ------
+        docker.errors.NotFound
+            If the daemon replies with 404
+        docker.errors.APIError
+            For any other reply with code >= 400
+        """
+        path = pathfmt.format(*[quote_plus(arg) for arg in args])
+        if versioned_api:
+            version = yield self._api_version()
+            path = "/v{}{}".format(version, path)
+
+        query = _encode_params(params)
+        if query:
+            path = "{}?{}".format(path, query)
+
+        headers = httputil.HTTPHeaders({"Host": self._host})
+        payload = b''
+        if method in ("POST", "PUT"):
+            if body is not None:
+                payload = json.dumps({k: v for k, v in body.items()
+                                      if v is not None}).encode("utf-8")
+                headers["Content-Type"] = "application/json"
+            headers["Content-Length"] = str(len(payload))
+
+        if request_timeout is None:
+            request_timeout = self.timeout
+
+        yield self._connection_slots.acquire()
+        try:
+            stream = yield self._acquire_stream()
+            delegate = _ResponseDelegate(streaming_callback,
+                                         headers_callback)
+            connection = HTTP1Connection(
+                stream, True,
+                HTTP1ConnectionParameters(no_keep_alive=False,
+                                          decompress=False))
+            try:
+                response_future = self._exchange(
+                    connection,
+                    httputil.RequestStartLine(method, path, "HTTP/1.1"),
+                    headers,
+                    payload,
+                    delegate)
+                if request_timeout:
+                    yield gen.with_timeout(
+                        IOLoop.current().time() + request_timeout,
+                        response_future,
+                        quiet_exceptions=iostream.StreamClosedError)
+                else:
+                    yield response_future
+            except Exception:
+                stream.close()
+                raise
+            finally:
+                self._release_stream(stream)
+        finally:
+            self._connection_slots.release()
+
+        if delegate.code is None:
+            raise errors.DockerException(
+                "Connection closed by docker daemon during {} {}".format(
+                    method, path))
+
+        if delegate.code >= 400:
+            _raise_for_status(method, path, delegate)
+
+        return delegate.body
+
+    @gen.coroutine
+    def _exchange(self, connection, start_line, headers, payload, delegate):
+        """Writes the request and reads the response on a connection."""
+        yield connection.write_headers(start_line, headers, payload)
+        connection.finish()
+        yield connection.read_response(delegate)
+
+    @gen.coroutine
+    def _acquire_stream(self):
+        """Returns an open stream to the daemon, reusing an idle
+        one if available."""
+        while self._idle_streams:
+            stream = self._idle_streams.pop()
+            if not stream.closed():
+                return stream
+
+        if self._unix_socket_path is not None:
+            stream = iostream.IOStream(
+                socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+            connect_future = stream.connect(self._unix_socket_path)
+        else:
+            connect_future = self._tcp_client.connect(
+                self._host, self._port, ssl_options=self._ssl_options)
+
+        if self.timeout:
+            stream = yield gen.with_timeout(
+                IOLoop.current().time() + self.timeout,
+                connect_future)
+        else:
+            stream = yield connect_future
+
+        return stream
+
+    def _release_stream(self, stream):
+        """Returns a stream to the idle pool, if it can be reused."""
+        if not stream.closed():
+            self._idle_streams.append(stream)
+
+
+class _ResponseDelegate(httputil.HTTPMessageDelegate):
+    """Collects the response of a request."""
+
+    def __init__(self, streaming_callback=None, headers_callback=None):
+        self.code = None
+        self.reason = None
+        self.headers = None
+        self._chunks = []
+        self._streaming_callback = streaming_callback
+        self._headers_callback = headers_callback
+
+    def headers_received(self, start_line, headers):
+        self.code = start_line.code
+        self.reason = start_line.reason
+        self.headers = headers
+        if self._headers_callback is not None:
+            self._headers_callback()
+
+    def data_received(self, chunk):
+        if self._streaming_callback is not None and self.code < 400:
+            self._streaming_callback(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    @property
+    def body(self):
+        return b''.join(self._chunks)
+
+
+def _json_stream(callback):
+    """Returns a streaming callback that decodes a stream of
+    concatenated JSON documents, possibly split across chunks, and invokes
+    callback with each of them."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = [""]
+
+    def chunk_received(chunk):
+        data = buffer[0] + text_decoder.decode(chunk)
+        position = 0
+        while True:
+            # Skip the separators between the documents
+            while position < len(data) and data[position].isspace():
+                position += 1
+            try:
+                document, position = decoder.raw_decode(data, position)
+            except ValueError:
+                break
+            callback(document)
+        buffer[0] = data[position:]
+
+    return chunk_received
+
+
+def _encode_params(params):
+    """Encodes the query arguments, skipping the None values and
+    converting booleans to integers"""
+    if not params:
+        return ""
+
+    encoded = []
+    for key in sorted(params.keys()):
+        value = params[key]
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = int(value)
+        encoded.append((key, value))
+
+    return urlencode(encoded)
+
+
+def _raise_for_status(method, path, delegate):
+    """Raises the docker-py exception appropriate for a failed request."""
+    response = requests.Response()
+    response.status_code = delegate.code
+    response.reason = delegate.reason
+    response.url = path
+    response._content = delegate.body
+
+    message = "{} {} {}".format(delegate.code, method, path)
+    if delegate.code == 404:
+        raise errors.NotFound(message, response)
+    raise errors.APIError(message, response)
+
+
+def _ssl_context(tls):
+    """Builds an SSLContext from the docker-py tls argument.
+
+    Parameters
+    ----------
+    tls: bool or docker.tls.TLSConfig
+        The docker-py tls configuration.
+    """
+    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+
+    if not isinstance(tls, docker_tls.TLSConfig):
+        return context
+
+    if tls.verify:
+        if tls.ca_cert:
+            context.load_verify_locations(tls.ca_cert)
+        if tls.assert_hostname is False:
+            context.check_hostname = False
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+    if tls.cert:
+        context.load_cert_chain(*tls.cert)
+
+    return context
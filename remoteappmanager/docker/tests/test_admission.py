@@ -0,0 +1,279 @@
+import os
+import time
+from datetime import timedelta
+
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.db import orm
+from remoteappmanager.docker.admission import (
+    AdmissionController, SharedAdmissionController, QuotaExceeded,
+    QueueFull, AdmissionTimeout)
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class TestAdmissionController(AsyncTestCase):
+    @gen_test
+    def test_unlimited(self):
+        controller = AdmissionController()
+        admissions = yield [controller.admit("user") for _ in range(5)]
+        self.assertEqual(controller.num_active(), 5)
+
+        for admission in admissions:
+            admission.release()
+        self.assertEqual(controller.num_active(), 0)
+
+    @gen_test
+    def test_concurrency_limit(self):
+        controller = AdmissionController(max_concurrent=1)
+
+        first = yield controller.admit("user")
+        second = controller.admit("user")
+        yield gen.moment
+        self.assertFalse(second.done())
+        self.assertEqual(controller.num_queued(), 1)
+        self.assertEqual(controller.queue_position("user"), 1)
+
+        first.release()
+        # Multiple releases are harmless.
+        first.release()
+
+        with (yield second):
+            self.assertEqual(controller.num_active(), 1)
+            self.assertEqual(controller.num_queued(), 0)
+
+        self.assertEqual(controller.num_active(), 0)
+
+    @gen_test
+    def test_users_served_in_turn(self):
+        controller = AdmissionController(max_concurrent=1)
+        order = []
+
+        @gen.coroutine
+        def start(user_name):
+            with (yield controller.admit(user_name)):
+                order.append(user_name)
+                yield gen.moment
+
+        first = yield controller.admit("greedy")
+        futures = [start("greedy"), start("greedy"), start("greedy"),
+                   start("other")]
+        yield gen.moment
+        self.assertEqual(controller.queue_position("greedy"), 1)
+        self.assertEqual(controller.queue_position("other"), 2)
+        self.assertEqual(controller.queue_position("nobody"), 0)
+
+        first.release()
+        yield futures
+
+        self.assertEqual(order, ["greedy", "other", "greedy", "greedy"])
+
+    @gen_test
+    def test_queue_full(self):
+        controller = AdmissionController(max_concurrent=1, max_queued=1)
+
+        first = yield controller.admit("user")
+        second = controller.admit("user")
+
+        with self.assertRaises(QueueFull):
+            yield controller.admit("other")
+
+        first.release()
+        (yield second).release()
+
+    @gen_test
+    def test_timeout(self):
+        controller = AdmissionController(max_concurrent=1)
+
+        first = yield controller.admit("user")
+        with self.assertRaises(AdmissionTimeout):
+            yield controller.admit("other", timeout=0.01)
+
+        self.assertEqual(controller.num_queued(), 0)
+        first.release()
+        self.assertEqual(controller.num_active(), 0)
+
+    @gen_test
+    def test_user_quota(self):
+        controller = AdmissionController(max_concurrent=1, user_quota=2)
+
+        with self.assertRaises(QuotaExceeded):
+            yield controller.admit("user", running=2)
+
+        first = yield controller.admit("user", running=1)
+        with self.assertRaises(QuotaExceeded):
+            yield controller.admit("user", running=1)
+
+        # Other users are not affected.
+        second = controller.admit("other", running=1)
+        first.release()
+        (yield second).release()
+
+
+class TestSharedAdmissionController(TempMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        url = "sqlite:///" + os.path.join(self.tempdir, "sqlite.db")
+        orm.Database(url=url).reset()
+        self.database = orm.Database(url=url)
+
+    def create_controller(self, **kwargs):
+        kwargs.setdefault("poll_interval", 0.01)
+        return SharedAdmissionController(database=self.database, **kwargs)
+
+    def tickets(self):
+        with orm.detached_session(self.database) as session:
+            return session.query(orm.AdmissionTicket).all()
+
+    @gen.coroutine
+    def wait_for_no_tickets(self):
+        for _ in range(100):
+            if not self.tickets():
+                return
+            yield gen.sleep(0.01)
+        self.fail("Tickets not released")
+
+    @gen_test
+    def test_concurrency_limit_across_processes(self):
+        # Two controllers, as in the processes of two users.
+        first_process = self.create_controller(max_concurrent=1)
+        second_process = self.create_controller(max_concurrent=1)
+
+        first = yield first_process.admit("alice")
+        second = second_process.admit("bob")
+        yield gen.sleep(0.05)
+        self.assertFalse(second.done())
+        self.assertEqual(second_process.queue_position("bob"), 1)
+        self.assertEqual(second_process.queue_position("alice"), 0)
+
+        first.release()
+        with (yield second):
+            self.assertEqual(first_process.queue_position("alice"), 0)
+            self.assertEqual([t.user_name for t in self.tickets()],
+                             ["bob"])
+
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_users_served_in_turn(self):
+        controller = self.create_controller(max_concurrent=1)
+        other_process = self.create_controller(max_concurrent=1)
+        order = []
+
+        @gen.coroutine
+        def start(controller, user_name):
+            with (yield controller.admit(user_name)):
+                order.append(user_name)
+                yield gen.sleep(0.02)
+
+        first = yield controller.admit("greedy")
+        futures = [start(controller, "greedy")]
+        yield gen.sleep(0.02)
+        futures.append(start(controller, "greedy"))
+        yield gen.sleep(0.02)
+        futures.append(start(other_process, "other"))
+        yield gen.sleep(0.05)
+
+        first.release()
+        yield futures
+
+        self.assertEqual(order, ["greedy", "other", "greedy"])
+
+    @gen_test
+    def test_queue_full(self):
+        controller = self.create_controller(max_concurrent=1, max_queued=1)
+
+        first = yield controller.admit("user")
+        second = controller.admit("user")
+        yield gen.sleep(0.05)
+
+        with self.assertRaises(QueueFull):
+            yield controller.admit("other")
+
+        first.release()
+        (yield second).release()
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_timeout(self):
+        controller = self.create_controller(max_concurrent=1)
+
+        first = yield controller.admit("user")
+        with self.assertRaises(AdmissionTimeout):
+            yield controller.admit("other", timeout=0.05)
+
+        self.assertEqual(controller.queue_position("other"), 0)
+        first.release()
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_user_quota(self):
+        controller = self.create_controller(max_concurrent=1, user_quota=2)
+
+        with self.assertRaises(QuotaExceeded):
+            yield controller.admit("user", running=2)
+
+        first = yield controller.admit("user", running=1)
+        with self.assertRaises(QuotaExceeded):
+            yield controller.admit("user", running=1)
+
+        first.release()
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_expired_tickets_are_discarded(self):
+        controller = self.create_controller(max_concurrent=1)
+
+        # A slot held by a process that died.
+        with orm.detached_session(self.database) as session, \
+                orm.transaction(session):
+            session.add(orm.AdmissionTicket(
+                id="dead", user_name="user", active=True,
+                created_at=time.time() - 60, turn=time.time() - 60,
+                expires_at=time.time() - 1))
+
+        admission = yield controller.admit("other", timeout=1)
+        self.assertEqual([t.id for t in self.tickets()],
+                         [admission.ticket_id])
+        admission.release()
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_release_wakes_local_waiters(self):
+        controller = self.create_controller(max_concurrent=1,
+                                            poll_interval=10)
+
+        first = yield controller.admit("user")
+        second = controller.admit("other")
+        yield gen.sleep(0.05)
+        self.assertFalse(second.done())
+
+        first.release()
+        admission = yield gen.with_timeout(timedelta(seconds=1), second)
+        admission.release()
+        yield self.wait_for_no_tickets()
+
+    @gen_test
+    def test_poll_interval_backs_off(self):
+        controller = self.create_controller(max_concurrent=1,
+                                            max_poll_interval=0.04)
+        other_process = self.create_controller(max_concurrent=1)
+        checks = []
+        activate = controller._activate
+
+        def counting_activate(ticket_id):
+            checks.append(ticket_id)
+            return activate(ticket_id)
+
+        controller._activate = counting_activate
+
+        first = yield other_process.admit("user")
+        second = controller.admit("other")
+        yield gen.sleep(0.3)
+
+        # Without the back off, about 30 checks.
+        self.assertLess(len(checks), 15)
+
+        first.release()
+        (yield second).release()
+        yield self.wait_for_no_tickets()
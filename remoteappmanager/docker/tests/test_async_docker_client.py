@@ -1,3 +1,4 @@
+import threading
 import warnings
 from tornado.testing import AsyncTestCase, gen_test
 from docker.utils import kwargs_from_env
@@ -40,3 +41,76 @@ class TestAsyncDockerClient(AsyncTestCase):
         # Test contents of response
         self.assertIsInstance(response, dict)
         self.assertIn("ID", response)
+
+    @gen_test
+    def test_lanes(self):
+        client = AsyncDockerClient(query_workers=1, mutating_workers=1)
+        client._sync_client = VirtualDockerClient.with_containers()
+
+        # A slow stop must not delay the read calls queued behind it.
+        stop_started = threading.Event()
+        release_stop = threading.Event()
+
+        def slow_stop(*args, **kwargs):
+            stop_started.set()
+            release_stop.wait(5)
+
+        client._sync_client.stop = slow_stop
+
+        stop_future = client.stop("whatever")
+        stop_started.wait(5)
+
+        response = yield client.info()
+        self.assertIn("ID", response)
+        self.assertFalse(stop_future.done())
+
+        release_stop.set()
+        yield stop_future
+
+        stats = client.lane_stats()
+        self.assertEqual(set(stats.keys()), {"query", "mutating", "pull"})
+        self.assertEqual(stats["query"]["num_started"], 1)
+        self.assertEqual(stats["mutating"]["num_started"], 1)
+        self.assertEqual(stats["mutating"]["queue_depth"], 0)
+        self.assertEqual(stats["query"]["workers"], 1)
+
+    @gen_test
+    def test_pull_lane(self):
+        client = AsyncDockerClient(mutating_workers=1, pull_workers=1)
+        client._sync_client = VirtualDockerClient.with_containers()
+
+        # A slow pull must not delay the container operations.
+        pull_started = threading.Event()
+        release_pull = threading.Event()
+
+        def slow_pull(*args, **kwargs):
+            pull_started.set()
+            release_pull.wait(5)
+            return iter([])
+
+        client._sync_client.pull = slow_pull
+        client._sync_client.stop = lambda *args, **kwargs: None
+
+        pull_future = client.stream_pull("whatever", tag="latest")
+        pull_started.wait(5)
+
+        yield client.stop("whatever")
+        self.assertFalse(pull_future.done())
+
+        release_pull.set()
+        yield pull_future
+
+        stats = client.lane_stats()
+        self.assertEqual(stats["pull"]["num_started"], 1)
+        self.assertEqual(stats["mutating"]["num_started"], 1)
+
+    def test_stream_client_without_timeout(self):
+        client = AsyncDockerClient(base_url="unix://var/run/docker.sock",
+                                   timeout=5)
+        self.assertEqual(client._sync_client.timeout, 5)
+
+        # The event streams can stay quiet for longer than the timeout.
+        stream_client = client._create_stream_client()
+        self.assertIsNone(stream_client.timeout)
+        self.assertEqual(stream_client.base_url, client._sync_client.base_url)
+        stream_client.close()
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.container_index import ContainerIndex
+
+
+class TestContainerIndex(TestCase):
+    def setUp(self):
+        self.index = ContainerIndex()
+        self.index.replace([
+            Container(docker_id="1", url_id="u1", mapping_id="m1",
+                      user="johndoe"),
+            Container(docker_id="2", url_id="u2", mapping_id="m2",
+                      user="johndoe"),
+            Container(docker_id="3", url_id="u3", mapping_id="m1",
+                      user="alice"),
+        ])
+
+    def _ids(self, containers):
+        return sorted(c.docker_id for c in containers)
+
+    def test_find(self):
+        self.assertEqual(self._ids(self.index.find()), ["1", "2", "3"])
+        self.assertEqual(self._ids(self.index.find(user_name="johndoe")),
+                         ["1", "2"])
+        self.assertEqual(self._ids(self.index.find(mapping_id="m1")),
+                         ["1", "3"])
+        self.assertEqual(self._ids(self.index.find(user_name="johndoe",
+                                                   mapping_id="m1")),
+                         ["1"])
+        self.assertEqual(self._ids(self.index.find(url_id="u3")), ["3"])
+        self.assertEqual(self.index.find(url_id="u3", user_name="johndoe"),
+                         [])
+        self.assertEqual(self.index.find(user_name="bob"), [])
+
+    def test_add_and_remove(self):
+        self.index.add(Container(docker_id="2", url_id="u4",
+                                 mapping_id="m2", user="alice"))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.find(url_id="u2"), [])
+        self.assertEqual(self._ids(self.index.find(user_name="alice")),
+                         ["2", "3"])
+
+        removed = self.index.remove("3")
+        self.assertEqual(removed.docker_id, "3")
+        self.assertNotIn("3", self.index)
+        self.assertEqual(self._ids(self.index.find(mapping_id="m1")), ["1"])
+        self.assertIsNone(self.index.remove("3"))
+
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.find(), [])
@@ -1,6 +1,7 @@
 import os
 from unittest import mock
 
+from tornado import gen
 from tornado.testing import AsyncTestCase, gen_test, LogTrapTestCase
 
 from remoteappmanager.docker.container import Container
@@ -8,6 +9,8 @@ from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
 from remoteappmanager.docker.container_manager import ContainerManager, \
     OperationInProgress
 from remoteappmanager.docker.image import Image
+from remoteappmanager.docker.native_docker_client import NativeDockerClient
+from remoteappmanager.metrics import PhaseTimer
 from remoteappmanager.tests import utils
 from remoteappmanager.tests.mocking.virtual.docker_client import (
     VirtualDockerClient)
@@ -23,6 +26,23 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
     def test_instantiation(self):
         self.assertIsNotNone(self.manager._docker_client)
 
+    def test_native_client_selection(self):
+        manager = ContainerManager(docker_config={},
+                                   docker_native_client=True)
+        self.assertIsInstance(manager._docker_client, NativeDockerClient)
+
+    @gen_test
+    def test_stop_without_event_cache(self):
+        result = yield self.manager.start_container(
+            "johndoe", "simphonyproject/simphony-mayavi:0.6.0", "mapping",
+            "/user/johndoe", None)
+
+        # The index is only used with docker_event_cache.
+        with mock.patch.object(self.manager._index, "remove") as remove:
+            yield self.manager.stop_and_remove_container(result.docker_id)
+
+        self.assertFalse(remove.called)
+
     @gen_test
     def test_start_stop(self):
         mock_client = self.mock_docker_client
@@ -66,6 +86,36 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
             self.assertTrue(mock_client.stop.called)
             self.assertTrue(mock_client.remove_container.called)
 
+    @gen_test
+    def test_start_phases(self):
+        phase_timer = PhaseTimer()
+        yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "63dce9335bca49798bbb93146ad07c66",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4868",
+            None,
+            None,
+            phase_timer=phase_timer)
+
+        self.assertEqual([name for name, _ in phase_timer.phases],
+                         ["inspect_image", "find_duplicate",
+                          "create_host_config", "create", "start",
+                          "ip_port"])
+
+        # Without an explicit timer, the phases go to the manager metrics
+        yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "2ae13cf5e3ae47c38c3c1a5cc5b4d3e7",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4869",
+            None,
+            None)
+
+        text = self.manager.metrics.as_text()
+        self.assertIn('container_start_phase_seconds_count{phase="create"} 1',
+                      text)
+
     @gen_test
     def test_find_from_mapping_id(self):
         """ Test containers_for_mapping_id returns a list of Container """
@@ -132,6 +182,242 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
         result = yield self.manager.find_containers()
         self.assertEqual(len(result), 1)
 
+    @gen_test
+    def test_ip_and_port_from_list(self):
+        docker_client = self.mock_docker_client
+        with mock.patch.object(docker_client, "port",
+                               wraps=docker_client.port):
+            result = yield self.manager.find_containers()
+            self.assertEqual(len(result), 1)
+            self.assertEqual(result[0].ip, "127.0.0.1")
+            self.assertEqual(result[0].port, 666)
+            self.assertFalse(docker_client.port.called)
+
+            # Bindings missing from the list output require a port call.
+            docker_client.add_container_from_raw_info(
+                "abcdef", "foo", docker_client._images[0],
+                {SIMPHONY_NS_RUNINFO.realm: "myrealm"},
+                [{"PrivatePort": 8888, "Type": "tcp"}],
+                "running")
+            result = yield self.manager.find_containers()
+            self.assertEqual(len(result), 1)
+            self.assertEqual(docker_client.port.call_count, 1)
+
+            # Port mode always performs the port call.
+            self.manager.docker_port_resolution = "port"
+            result = yield self.manager.find_containers()
+            self.assertEqual(len(result), 1)
+            self.assertEqual(result[0].port, 666)
+            self.assertEqual(docker_client.port.call_count, 3)
+
+    @gen_test
+    def test_warm_pool(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1})
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+
+        with mock.patch.object(mock_client, "create_container",
+                               wraps=mock_client.create_container), \
+                mock.patch.object(mock_client, "start",
+                                  wraps=mock_client.start):
+            first = yield manager.start_container(
+                "alice", image_name, "mapping", "/user/alice", None)
+
+            # The pool is refilled in background.
+            for _ in range(100):
+                if len(manager._warm_pool):
+                    break
+                yield gen.sleep(0.01)
+            self.assertEqual(len(manager._warm_pool), 1)
+            self.assertEqual(mock_client.create_container.call_count, 2)
+            labels = mock_client.create_container.call_args[1]["labels"]
+            self.assertIn(SIMPHONY_NS_RUNINFO.warm_pool, labels)
+            pooled_id = [c.id for c in mock_client._containers
+                         if SIMPHONY_NS_RUNINFO.warm_pool in c.labels][0]
+
+            # The pooled container is not visible
+            found = yield manager.find_containers(user_name="alice")
+            self.assertEqual([c.docker_id for c in found], [first.docker_id])
+
+            yield manager.stop_and_remove_container(first.docker_id)
+            second = yield manager.start_container(
+                "alice", image_name, "mapping", "/user/alice", None)
+            self.assertEqual(second.docker_id, pooled_id)
+            self.assertEqual(second.user, "alice")
+            self.assertFalse(second.name.endswith("-pooled"))
+            self.assertEqual(mock_client.create_container.call_count, 2)
+
+            # The pooled container was started in advance.
+            self.assertEqual(mock_client.start.call_count, 2)
+            found = yield manager.find_containers(user_name="alice")
+            self.assertEqual([c.docker_id for c in found], [pooled_id])
+
+            # A different environment can't use the pooled containers
+            third = yield manager.start_container(
+                "alice", image_name, "mapping", "/user/alice", None,
+                environment={"X": "1"})
+            self.assertNotEqual(third.docker_id, pooled_id)
+
+            for _ in range(100):
+                if len(manager._warm_pool) == 2:
+                    break
+                yield gen.sleep(0.01)
+
+            yield manager.drain_warm_pool()
+            self.assertEqual(len(manager._warm_pool), 0)
+            self.assertFalse(any(c.name.endswith("-pooled")
+                                 for c in mock_client._containers))
+
+    def _add_pooled_container(self, docker_client, id, owner):
+        docker_client.add_container_from_raw_info(
+            id, id + "-pooled", docker_client._images[0],
+            {SIMPHONY_NS_RUNINFO.user: owner,
+             SIMPHONY_NS_RUNINFO.mapping_id: "mapping",
+             SIMPHONY_NS_RUNINFO.url_id: id,
+             SIMPHONY_NS_RUNINFO.realm: "myrealm",
+             SIMPHONY_NS_RUNINFO.urlpath: "/user/{}/containers/{}".format(
+                 owner, id),
+             SIMPHONY_NS_RUNINFO.warm_pool: owner},
+            [], "running")
+
+    @gen_test
+    def test_warm_pool_reaps_own_containers(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1},
+                                   warm_pool_owner="alice")
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+        self._add_pooled_container(mock_client, "stale", "alice")
+        self._add_pooled_container(mock_client, "other", "bob")
+
+        yield manager.start_container(
+            "alice", image_name, "mapping", "/user/alice", None)
+        for _ in range(100):
+            if len(manager._warm_pool):
+                break
+            yield gen.sleep(0.01)
+
+        # Only the containers left behind by the same owner are removed.
+        ids = [c.id for c in mock_client._containers]
+        self.assertNotIn("stale", ids)
+        self.assertIn("other", ids)
+
+        labels = mock_client.inspect_container(
+            manager._warm_pool.drain()[0].docker_id)["Config"]["Labels"]
+        self.assertEqual(labels[SIMPHONY_NS_RUNINFO.warm_pool], "alice")
+
+    @gen_test
+    def test_warm_pool_host_limit(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1},
+                                   warm_pool_max_containers=2,
+                                   warm_pool_owner="alice")
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+
+        # The pooled containers of other processes count for the limit.
+        self._add_pooled_container(mock_client, "bob1", "bob")
+        self._add_pooled_container(mock_client, "bob2", "bob")
+
+        with mock.patch.object(manager, "_count_pooled_containers",
+                               wraps=manager._count_pooled_containers):
+            yield manager.start_container(
+                "alice", image_name, "mapping", "/user/alice", None)
+            for _ in range(100):
+                if manager._count_pooled_containers.called:
+                    break
+                yield gen.sleep(0.01)
+            yield gen.sleep(0.01)
+
+        self.assertEqual(len(manager._warm_pool), 0)
+
+    @gen_test
+    def test_warm_pool_pooled_container_died(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1})
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+
+        yield manager.prefill_warm_pool(
+            "alice", image_name, "mapping", "/user/alice", None)
+        pooled_id = [c.id for c in mock_client._containers
+                     if c.name.endswith("-pooled")][0]
+        mock_client.stop(pooled_id)
+
+        # A new container is created when the pooled one is not running.
+        second = yield manager.start_container(
+            "alice", image_name, "mapping", "/user/alice", None)
+
+        self.assertNotEqual(second.docker_id, pooled_id)
+        self.assertNotIn(pooled_id, [c.id for c in mock_client._containers])
+
+    @gen_test
+    def test_warm_pool_prefill(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1})
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+
+        # Images not in the policy are not pooled.
+        yield manager.prefill_warm_pool(
+            "alice", "simphonyproject/ubuntu-image:latest", "other",
+            "/user/alice", None)
+        self.assertEqual(len(manager._warm_pool), 0)
+
+        yield manager.prefill_warm_pool(
+            "alice", image_name, "mapping", "/user/alice", None)
+        self.assertEqual(len(manager._warm_pool), 1)
+        pooled_id = [c.id for c in mock_client._containers
+                     if c.name.endswith("-pooled")][0]
+
+        # The first start uses the pooled container.
+        with mock.patch.object(mock_client, "start",
+                               wraps=mock_client.start):
+            first = yield manager.start_container(
+                "alice", image_name, "mapping", "/user/alice", None)
+            self.assertFalse(mock_client.start.called)
+
+        self.assertEqual(first.docker_id, pooled_id)
+        yield manager.drain_warm_pool()
+
+    @gen_test
+    def test_warm_pool_expiry(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   warm_pool_policy={image_name: 1},
+                                   warm_pool_ttl=0.04)
+        mock_client = VirtualDockerClient.with_containers()
+        manager._docker_client._sync_client = mock_client
+
+        yield manager.prefill_warm_pool(
+            "alice", image_name, "mapping", "/user/alice", None)
+        self.assertEqual(len(manager._warm_pool), 1)
+
+        # Removed without waiting for a claim.
+        for _ in range(100):
+            if not any(c.name.endswith("-pooled")
+                       for c in mock_client._containers):
+                break
+            yield gen.sleep(0.01)
+        self.assertEqual(len(manager._warm_pool), 0)
+        self.assertFalse(any(c.name.endswith("-pooled")
+                             for c in mock_client._containers))
+
+        yield manager.drain_warm_pool()
+        self.assertIsNone(manager._warm_pool_expiry)
+
     @gen_test
     def test_race_condition_spawning(self):
         # Start the operations, and retrieve the future.
@@ -180,6 +466,72 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
 
             self.assertEqual(self.mock_docker_client.stop.call_count, 1)
 
+    @gen_test
+    def test_coalesced_spawning(self):
+        self.manager.coalesce_operations = True
+        with mock.patch.object(self.mock_docker_client, "start",
+                               wraps=self.mock_docker_client.start):
+            f1 = self.manager.start_container("johndoe",
+                                              "simphonyproject/simphony-mayavi:0.6.0",  # noqa
+                                              "76cd29a4d61f4ddc95fa633347934807",  # noqa
+                                              "/user/johndoe",
+                                              None,
+                                              )
+            f2 = self.manager.start_container("johndoe",
+                                              "simphonyproject/simphony-mayavi:0.6.0",  # noqa
+                                              "76cd29a4d61f4ddc95fa633347934807",  # noqa
+                                              "/user/johndoe",
+                                              None,
+                                              )
+            # A different user is not coalesced.
+            f3 = self.manager.start_container("alice",
+                                              "simphonyproject/simphony-mayavi:0.6.0",  # noqa
+                                              "76cd29a4d61f4ddc95fa633347934807",  # noqa
+                                              "/user/alice",
+                                              None,
+                                              )
+
+            result1, result2, result3 = yield [f1, f2, f3]
+            self.assertIs(result1, result2)
+            self.assertEqual(result3.user, "alice")
+            self.assertEqual(self.mock_docker_client.start.call_count, 2)
+            self.assertEqual(self.manager._start_inflight, {})
+
+    @gen_test
+    def test_coalesced_spawning_failure(self):
+        self.manager.coalesce_operations = True
+        with mock.patch.object(self.mock_docker_client, "create_container",
+                               side_effect=Exception("Boom!")) as create:
+            futures = [
+                self.manager.start_container("johndoe",
+                                             "simphonyproject/simphony-mayavi:0.6.0",  # noqa
+                                             "76cd29a4d61f4ddc95fa633347934807",  # noqa
+                                             "/user/johndoe",
+                                             None)
+                for _ in range(2)]
+
+            for future in futures:
+                with self.assertRaisesRegex(Exception, "Boom!"):
+                    yield future
+
+            self.assertEqual(create.call_count, 1)
+
+    @gen_test
+    def test_coalesced_stopping(self):
+        self.manager.coalesce_operations = True
+        docker_client = self.mock_docker_client
+
+        with mock.patch.object(docker_client, "stop",
+                               wraps=docker_client.stop):
+
+            f1 = self.manager.stop_and_remove_container("d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+            f2 = self.manager.stop_and_remove_container("d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+
+            yield [f1, f2]
+
+            self.assertEqual(self.mock_docker_client.stop.call_count, 1)
+            self.assertEqual(self.manager._stop_inflight, {})
+
     @gen_test
     def test_start_already_present_container(self):
         mock_client = self.mock_docker_client
@@ -218,6 +570,42 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
         image = yield self.manager.image("whatev")
         self.assertIsNone(image)
 
+    @gen_test
+    def test_image_cache(self):
+        mock_client = self.mock_docker_client
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        image_id = "sha256:2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824"  # noqa
+        with mock.patch.object(mock_client, "inspect_image",
+                               wraps=mock_client.inspect_image):
+            image = yield self.manager.image(image_name)
+            cached = yield self.manager.image(image_name)
+            self.assertIs(image, cached)
+            cached = yield self.manager.image(image_id)
+            self.assertIs(image, cached)
+            self.assertEqual(mock_client.inspect_image.call_count, 1)
+
+            # Missing images are not cached
+            yield self.manager.image("whatev")
+            yield self.manager.image("whatev")
+            self.assertEqual(mock_client.inspect_image.call_count, 3)
+
+            self.manager._image_cache.clear()
+            yield self.manager.image(image_name)
+            self.assertEqual(mock_client.inspect_image.call_count, 4)
+
+    @gen_test
+    def test_image_cache_disabled(self):
+        manager = ContainerManager(docker_config={},
+                                   realm="myrealm",
+                                   image_cache_size=0)
+        manager._docker_client._sync_client = self.mock_docker_client
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "inspect_image",
+                               wraps=mock_client.inspect_image):
+            yield manager.image('simphonyproject/simphony-mayavi:0.6.0')
+            yield manager.image('simphonyproject/simphony-mayavi:0.6.0')
+            self.assertEqual(mock_client.inspect_image.call_count, 2)
+
     @gen_test
     def test_start_container_with_nonexisting_volume_source(self):
         # These volume sources are invalid
@@ -355,3 +743,187 @@ class TestContainerManager(AsyncTestCase, LogTrapTestCase):
 
         self.assertFalse(self.mock_docker_client.stop.called)
         self.assertFalse(self.mock_docker_client.remove_container.called)
+
+
+class TestContainerManagerEventCache(AsyncTestCase, LogTrapTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = ContainerManager(docker_config={},
+                                        realm="myrealm",
+                                        docker_event_cache=True)
+        self.mock_docker_client = VirtualDockerClient.with_containers()
+        docker_client = self.manager._docker_client
+        docker_client._sync_client = self.mock_docker_client
+        docker_client._create_stream_client = lambda: self.mock_docker_client
+
+    def tearDown(self):
+        self.mock_docker_client.close_events()
+        super().tearDown()
+
+    @gen.coroutine
+    def _wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            yield gen.sleep(0.01)
+        self.fail("Condition not met")
+
+    @gen_test
+    def test_lookups_served_from_index(self):
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "containers",
+                               wraps=mock_client.containers):
+            result = yield self.manager.find_containers(user_name="johndoe")
+            self.assertEqual(len(result), 1)
+
+            result = yield self.manager.find_container(
+                url_id="20dcb84cdbea4b1899447246789093d0")
+            self.assertEqual(result.mapping_id,
+                             "5b34ce60d95742fa828cdced12b4c342")
+            self.assertEqual(result.ip, "127.0.0.1")
+            self.assertEqual(result.port, 666)
+
+            result = yield self.manager.find_containers(user_name="alice")
+            self.assertEqual(result, [])
+
+            self.assertEqual(mock_client.containers.call_count, 1)
+
+    @gen_test
+    def test_index_follows_events(self):
+        yield self.manager.find_containers()
+
+        # A container started by another process
+        image = self.mock_docker_client._images[0]
+        self.mock_docker_client.add_container_from_raw_info(
+            "abcdef", "foo", image,
+            {SIMPHONY_NS_RUNINFO.user: "alice",
+             SIMPHONY_NS_RUNINFO.mapping_id: "mapping",
+             SIMPHONY_NS_RUNINFO.url_id: "urlid",
+             SIMPHONY_NS_RUNINFO.realm: "myrealm",
+             SIMPHONY_NS_RUNINFO.urlpath: "/user/alice/containers/urlid"},
+            [{"IP": "0.0.0.0", "PublicPort": 777, "PrivatePort": 8888,
+              "Type": "tcp"}],
+            "running")
+        self.mock_docker_client.emit_event("start", "abcdef")
+
+        yield self._wait_for(lambda: "abcdef" in self.manager._index)
+        result = yield self.manager.find_container(user_name="alice")
+        self.assertEqual(result.port, 777)
+
+        self.mock_docker_client.emit_event("die", "abcdef")
+        yield self._wait_for(lambda: "abcdef" not in self.manager._index)
+
+    @gen_test
+    def test_write_through(self):
+        result = yield self.manager.start_container(
+            "alice",
+            "simphonyproject/simphony-mayavi:0.6.0",
+            "mapping",
+            "/user/alice",
+            None)
+        self.assertIn(result.docker_id, self.manager._index)
+
+        found = yield self.manager.find_container(user_name="alice")
+        self.assertEqual(found.docker_id, result.docker_id)
+
+        yield self.manager.stop_and_remove_container(result.docker_id)
+        found = yield self.manager.find_container(user_name="alice")
+        self.assertIsNone(found)
+
+    @gen_test
+    def test_resync_when_stream_drops(self):
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "containers",
+                               wraps=mock_client.containers):
+            yield self.manager.find_containers()
+            self.assertEqual(mock_client.containers.call_count, 1)
+
+            mock_client.close_events()
+            yield self._wait_for(lambda: self.manager._index_sync is None)
+
+            # The next lookup resubscribes and lists again
+            result = yield self.manager.find_containers(user_name="johndoe")
+            self.assertEqual(len(result), 1)
+            self.assertEqual(mock_client.containers.call_count, 2)
+
+    @gen_test
+    def test_stream_closed_while_seeding(self):
+        mock_client = self.mock_docker_client
+        containers_from_filters = self.manager.containers_from_filters
+
+        @gen.coroutine
+        def closing_containers_from_filters(filters):
+            mock_client.close_events()
+            result = yield containers_from_filters(filters)
+            yield self._wait_for(lambda: self.manager._index_sync is None)
+            return result
+
+        with mock.patch.object(self.manager, "containers_from_filters",
+                               closing_containers_from_filters):
+            # The lookup is answered by docker, as the index can't be used
+            result = yield self.manager.find_containers(user_name="johndoe")
+            self.assertEqual(len(result), 1)
+
+        self.assertIsNone(self.manager._index_sync)
+        self.assertIsNone(self.manager._index_backlog)
+
+        # The next lookup synchronizes the index again
+        result = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual(len(result), 1)
+        self.assertIsNotNone(self.manager._index_sync)
+        self.assertTrue(self.manager._index_sync.result())
+
+    @gen_test
+    def test_image_cache_invalidation(self):
+        mock_client = self.mock_docker_client
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        with mock.patch.object(mock_client, "inspect_image",
+                               wraps=mock_client.inspect_image):
+            yield self.manager.image(image_name)
+            yield self._wait_for(
+                lambda: self.manager._image_events is not None and
+                self.manager._image_events.done())
+
+            mock_client.emit_event("tag", image_name, type="image")
+            yield self._wait_for(
+                lambda: image_name not in self.manager._image_cache)
+
+            yield self.manager.image(image_name)
+            self.assertEqual(mock_client.inspect_image.call_count, 2)
+
+            # When the stream drops, the cache is cleared.
+            mock_client.close_events()
+            yield self._wait_for(lambda: self.manager._image_events is None)
+            self.assertEqual(len(self.manager._image_cache), 0)
+
+    @gen_test
+    def test_wait_for_container_healthy(self):
+        container_id = "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30"  # noqa
+
+        # No health check
+        healthy = yield self.manager.wait_for_container_healthy(
+            container_id, 1)
+        self.assertFalse(healthy)
+
+        # Already healthy
+        self.mock_docker_client.set_container_health(container_id, "healthy")
+        healthy = yield self.manager.wait_for_container_healthy(
+            container_id, 1)
+        self.assertTrue(healthy)
+
+        # Becomes healthy while waiting
+        self.mock_docker_client.set_container_health(container_id,
+                                                     "starting")
+        waiting = self.manager.wait_for_container_healthy(container_id, 5)
+        yield self._wait_for(
+            lambda: container_id in self.manager._health_waiters)
+        self.mock_docker_client.set_container_health(container_id, "healthy")
+        healthy = yield waiting
+        self.assertTrue(healthy)
+        self.assertEqual(self.manager._health_waiters, {})
+
+        # Never healthy
+        self.mock_docker_client.set_container_health(container_id,
+                                                     "unhealthy")
+        with self.assertRaises(TimeoutError):
+            yield self.manager.wait_for_container_healthy(container_id, 0.1)
@@ -0,0 +1,179 @@
+from tornado.testing import AsyncTestCase, gen_test, LogTrapTestCase
+
+from remoteappmanager.cache import TTLCache
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.docker.multi_host_container_manager import (
+    MultiHostContainerManager)
+from remoteappmanager.metrics import PhaseTimer
+from remoteappmanager.tests.utils import mock_coro_factory
+from remoteappmanager.tests.mocking.virtual.docker_client import (
+    VirtualDockerClient)
+
+
+def host_manager(ip, docker_client):
+    manager = ContainerManager(
+        docker_config={"base_url": "tcp://{}:2375".format(ip)},
+        realm="myrealm")
+    manager._docker_client._sync_client = docker_client
+    return manager
+
+
+class TestMultiHostContainerManager(AsyncTestCase, LogTrapTestCase):
+    def setUp(self):
+        super().setUp()
+        # The first host runs a container of johndoe, the second nothing.
+        self.busy_client = VirtualDockerClient.with_containers()
+        self.idle_client = VirtualDockerClient.with_containers()
+        self.idle_client._containers = []
+
+        self.busy_host = host_manager("10.0.0.1", self.busy_client)
+        self.idle_host = host_manager("10.0.0.2", self.idle_client)
+        self.manager = MultiHostContainerManager(
+            host_managers=[self.busy_host, self.idle_host],
+            realm="myrealm")
+
+    def test_instantiation(self):
+        manager = MultiHostContainerManager(
+            [{"base_url": "tcp://10.0.0.1:2375"},
+             {"base_url": "tcp://10.0.0.2:2375"}],
+            realm="foo",
+            docker_event_cache=True)
+        self.assertEqual(len(manager.host_managers), 2)
+        self.assertEqual(manager.host_managers[1].realm, "foo")
+        self.assertTrue(manager.host_managers[1].docker_event_cache)
+        self.assertFalse(manager.docker_event_cache)
+
+        # Only the host managers talk to docker.
+        self.assertIsNone(manager._docker_client)
+
+        with self.assertRaises(ValueError):
+            MultiHostContainerManager([])
+
+    @gen_test
+    def test_find_containers(self):
+        self.idle_client._containers = \
+            VirtualDockerClient.with_containers()._containers
+
+        containers = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual(len(containers), 2)
+        self.assertEqual({c.ip for c in containers},
+                         {"10.0.0.1", "10.0.0.2"})
+
+    @gen_test
+    def test_placement(self):
+        phase_timer = PhaseTimer()
+        container = yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "63dce9335bca49798bbb93146ad07c66",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4868",
+            None,
+            None,
+            phase_timer=phase_timer)
+
+        # Placed on the host without containers, reachable at its ip.
+        self.assertEqual(container.ip, "10.0.0.2")
+        self.assertEqual(len(self.idle_client._containers), 1)
+        self.assertEqual(phase_timer.phases[0][0], "placement")
+
+        # Now both hosts run one container. The one with more memory wins.
+        self.busy_client.mem_total *= 4
+        container = yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "2ae13cf5e3ae47c38c3c1a5cc5b4d3e7",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4869",
+            None,
+            None)
+        self.assertEqual(container.ip, "10.0.0.1")
+
+        yield self.manager.stop_and_remove_container(container.docker_id)
+        containers = yield self.busy_host.find_containers(
+            mapping_id="2ae13cf5e3ae47c38c3c1a5cc5b4d3e7")
+        self.assertEqual(containers, [])
+
+    @gen_test
+    def test_placement_on_pooled_host(self):
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        for manager in self.manager.host_managers:
+            manager.warm_pool_policy = {image_name: 1}
+
+        # Without a pooled container, the idle host would be chosen.
+        yield self.busy_host.prefill_warm_pool(
+            "johndoe", image_name, "mapping", "/user/johndoe", None)
+
+        container = yield self.manager.start_container(
+            "johndoe", image_name, "mapping", "/user/johndoe", None)
+        self.assertEqual(container.ip, "10.0.0.1")
+        self.assertEqual(self.idle_client._containers, [])
+
+        yield self.manager.drain_warm_pool()
+
+    @gen_test
+    def test_container_hosts_bounded(self):
+        self.manager._container_hosts = TTLCache(1, 3600.0)
+        yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "2ae13cf5e3ae47c38c3c1a5cc5b4d3e7",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4869",
+            None)
+
+        containers = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual({c.ip for c in containers},
+                         {"10.0.0.1", "10.0.0.2"})
+        self.assertEqual(len(self.manager._container_hosts), 1)
+
+        # The hosts that are no longer remembered are found again.
+        for container in containers:
+            yield self.manager.stop_and_remove_container(container.docker_id)
+
+        containers = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual(containers, [])
+
+    @gen_test
+    def test_unreachable_host(self):
+        self.idle_host.host_info = mock_coro_factory(
+            side_effect=Exception("unreachable"))
+        self.idle_host.find_containers = mock_coro_factory(
+            side_effect=Exception("unreachable"))
+
+        containers = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual(len(containers), 1)
+
+        container = yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "63dce9335bca49798bbb93146ad07c66",
+            "/user/johndoe/containers/cbeb652678244ed1aa5f68735abb4868",
+            None,
+            None)
+        self.assertEqual(container.ip, "10.0.0.1")
+
+    @gen_test
+    def test_stop_unknown_host(self):
+        # Not seen before: the host is found by inspecting the container.
+        manager = MultiHostContainerManager(
+            host_managers=[self.idle_host, self.busy_host],
+            realm="myrealm")
+        yield manager.stop_and_remove_container(
+            "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")
+        self.assertEqual(len(self.busy_client._containers), 2)
+
+        # Missing everywhere
+        yield manager.stop_and_remove_container("foo")
+
+    @gen_test
+    def test_image(self):
+        image = yield self.manager.image(
+            'simphonyproject/simphony-mayavi:0.6.0')
+        self.assertIsNotNone(image)
+
+        image = yield self.manager.image('whatever')
+        self.assertIsNone(image)
+
+    @gen_test
+    def test_host_info(self):
+        infos = yield self.manager.host_info()
+        self.assertEqual([info["ContainersRunning"] for info in infos],
+                         [1, 0])
@@ -0,0 +1,245 @@
+import json
+import os
+import shutil
+import tempfile
+
+from docker.errors import APIError, DockerException, NotFound
+from tornado import gen, web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.docker.native_docker_client import NativeDockerClient
+
+
+class _CountingHTTPServer(HTTPServer):
+    """An HTTPServer that counts the connections it receives."""
+    num_connections = 0
+
+    def handle_stream(self, stream, address):
+        self.num_connections += 1
+        super().handle_stream(stream, address)
+
+
+class _InfoHandler(web.RequestHandler):
+    def get(self):
+        self.write({"ID": "FAKE:DAEMON", "Containers": 1})
+
+
+class _VersionHandler(web.RequestHandler):
+    def get(self):
+        self.write({"ApiVersion": "1.21", "Version": "1.9.1"})
+
+
+class _ContainersHandler(web.RequestHandler):
+    def get(self):
+        self.application.settings["requests"].append(
+            self.request.arguments)
+        self.finish(json.dumps([{"Id": "a"*64, "Names": ["/foo"]}]))
+
+
+class _ContainerHandler(web.RequestHandler):
+    def get(self, container_id):
+        if container_id != "a"*64:
+            raise web.HTTPError(404)
+
+        self.write({
+            "Id": container_id,
+            "NetworkSettings": {
+                "Ports": {"8888/tcp": [{"HostIp": "0.0.0.0",
+                                        "HostPort": "32768"}]}
+            }
+        })
+
+    def delete(self, container_id):
+        self.set_status(204)
+
+
+class _CreateHandler(web.RequestHandler):
+    def post(self):
+        self.application.settings["requests"].append(
+            (self.get_argument("name"),
+             json.loads(self.request.body.decode("utf-8"))))
+        self.set_status(201)
+        self.write({"Id": "b"*64, "Warnings": None})
+
+
+class _ActionHandler(web.RequestHandler):
+    def post(self, container_id, action):
+        if action == "start":
+            raise web.HTTPError(500)
+        self.set_status(204)
+
+
+class _EventsHandler(web.RequestHandler):
+    @gen.coroutine
+    def get(self):
+        # An event split across two chunks, then two events in one chunk.
+        self.write('{"status": "start", "id": "a", "Actor": {"Attributes": ')
+        yield self.flush()
+        self.write('{"name": "\u00e8"}}}\n')
+        yield self.flush()
+        self.write('{"status": "die", "id": "a"}\n'
+                   '{"status": "destroy", "id": "a"}\n')
+        self.finish()
+
+
+class _PullHandler(web.RequestHandler):
+    @gen.coroutine
+    def post(self):
+        image = self.get_argument("fromImage")
+        self.write('{"status": "Pulling from %s", "id": "%s"}\r\n' % (
+            image, self.get_argument("tag")))
+        yield self.flush()
+        if image == "missing":
+            self.write('{"error": "not found"}\r\n')
+        else:
+            self.write('{"status": "Downloaded"}\r\n')
+        self.finish()
+
+
+class TestNativeDockerClient(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tempdir, "docker.sock")
+
+        self.requests = []
+        app = web.Application([
+            (r"/v[\d.]+/info", _InfoHandler),
+            (r"/version", _VersionHandler),
+            (r"/v[\d.]+/events", _EventsHandler),
+            (r"/v[\d.]+/images/create", _PullHandler),
+            (r"/v[\d.]+/containers/json", _ContainersHandler),
+            (r"/v[\d.]+/containers/create", _CreateHandler),
+            (r"/v[\d.]+/containers/(\w+)/json", _ContainerHandler),
+            (r"/v[\d.]+/containers/(\w+)", _ContainerHandler),
+            (r"/v[\d.]+/containers/(\w+)/(start|stop|rename)", _ActionHandler),
+        ], requests=self.requests)
+
+        self.server = _CountingHTTPServer(app, io_loop=self.io_loop)
+        self.server.add_socket(bind_unix_socket(self.socket_path))
+
+        self.client = NativeDockerClient(
+            base_url="unix://"+self.socket_path,
+            version="auto")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        shutil.rmtree(self.tempdir)
+        super().tearDown()
+
+    @gen_test
+    def test_info_and_keep_alive(self):
+        for _ in range(3):
+            info = yield self.client.info()
+            self.assertEqual(info["ID"], "FAKE:DAEMON")
+
+        # The version request and the three info requests all went
+        # through the same connection.
+        self.assertEqual(self.server.num_connections, 1)
+        self.assertEqual(self.client._version, "1.21")
+
+    @gen_test
+    def test_containers(self):
+        containers = yield self.client.containers(
+            filters={"label": "foo=bar"}, all=True)
+        self.assertEqual(containers[0]["Names"], ["/foo"])
+
+        arguments = self.requests[0]
+        self.assertEqual(arguments["all"], [b"1"])
+        self.assertEqual(json.loads(arguments["filters"][0].decode("utf-8")),
+                         {"label": ["foo=bar"]})
+
+        containers = yield self.client.containers(quiet=True)
+        self.assertEqual(containers, [{"Id": "a"*64}])
+
+    @gen_test
+    def test_inspect_and_port(self):
+        info = yield self.client.inspect_container("a"*64)
+        self.assertEqual(info["Id"], "a"*64)
+
+        port = yield self.client.port("a"*64, 8888)
+        self.assertEqual(port[0]["HostPort"], "32768")
+
+        with self.assertRaises(NotFound) as cm:
+            yield self.client.inspect_container("c"*64)
+        self.assertEqual(cm.exception.response.status_code, 404)
+
+    @gen_test
+    def test_create_start_stop_remove(self):
+        host_config = yield self.client.create_host_config(
+            port_bindings={8888: None})
+        result = yield self.client.create_container(
+            "simphony/app",
+            name="foo",
+            environment={"X": "1"},
+            labels={"a": "b"},
+            host_config=host_config)
+        self.assertEqual(result["Id"], "b"*64)
+
+        name, body = self.requests[0]
+        self.assertEqual(name, "foo")
+        self.assertEqual(body["Image"], "simphony/app")
+        self.assertEqual(body["Env"], ["X=1"])
+        self.assertEqual(body["Labels"], {"a": "b"})
+        self.assertEqual(body["HostConfig"]["PortBindings"],
+                         {"8888/tcp": [{"HostIp": "", "HostPort": ""}]})
+
+        with self.assertRaises(APIError) as cm:
+            yield self.client.start("b"*64)
+        self.assertEqual(cm.exception.response.status_code, 500)
+
+        yield self.client.stop("b"*64, timeout=1)
+        yield self.client.rename("b"*64, "bar")
+        yield self.client.remove_container("a"*64, v=True)
+
+        # Errors don't prevent reusing the connection.
+        self.assertEqual(self.server.num_connections, 1)
+
+    @gen_test
+    def test_concurrent_requests(self):
+        results = yield [self.client.info() for _ in range(4)]
+        self.assertEqual(len(results), 4)
+        self.assertLessEqual(self.server.num_connections, 4)
+
+        # The connections are pooled and reused afterwards.
+        num_connections = self.server.num_connections
+        yield [self.client.info() for _ in range(4)]
+        self.assertEqual(self.server.num_connections, num_connections)
+
+    @gen_test
+    def test_stream_events(self):
+        events = []
+        closed = yield self.client.stream_events(
+            events.append, filters={"event": ["start"]})
+        yield closed
+
+        self.assertEqual([e["status"] for e in events],
+                         ["start", "die", "destroy"])
+        self.assertEqual(events[0]["Actor"]["Attributes"]["name"], "\u00e8")
+
+    @gen_test
+    def test_stream_pull(self):
+        progress = []
+        yield self.client.stream_pull("simphony/app", tag="1.0",
+                                      progress_callback=progress.append)
+        self.assertEqual(progress, [
+            {"status": "Pulling from simphony/app", "id": "1.0"},
+            {"status": "Downloaded"}])
+
+        with self.assertRaises(DockerException):
+            yield self.client.stream_pull("missing", tag="latest")
+
+    @gen_test
+    def test_connection_failure(self):
+        client = NativeDockerClient(
+            base_url="unix://"+os.path.join(self.tempdir, "missing.sock"),
+            version="1.21")
+        with self.assertRaises(Exception):
+            yield client.info()
+
+    def test_invalid_version(self):
+        with self.assertRaises(Exception):
+            NativeDockerClient(version=1.21)
@@ -0,0 +1,85 @@
+import unittest
+
+from remoteappmanager.docker import warm_pool
+from remoteappmanager.docker.warm_pool import WarmPool
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWarmPool(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.pool = WarmPool(3, 100, timer=self.timer)
+
+    def _entry(self, docker_id):
+        return self.pool.new_entry(docker_id, "name", "imageid",
+                                   "urlid", "/urlpath")
+
+    def test_add_and_claim(self):
+        self.assertIsNone(self.pool.claim("sig"))
+
+        self.pool.add("sig", self._entry("1"))
+        self.pool.add("sig", self._entry("2"))
+        self.assertEqual(self.pool.count("sig"), 2)
+        self.assertEqual(self.pool.count("other"), 0)
+
+        self.assertEqual(self.pool.claim("sig").docker_id, "1")
+        self.assertEqual(self.pool.claim("sig").docker_id, "2")
+        self.assertIsNone(self.pool.claim("sig"))
+        self.assertEqual(len(self.pool), 0)
+
+    def test_pending(self):
+        self.pool.creation_started("sig")
+        self.assertEqual(self.pool.count("sig"), 1)
+        self.pool.creation_finished("sig")
+        self.assertEqual(self.pool.count("sig"), 0)
+
+    def test_eviction(self):
+        self.pool.add("a", self._entry("1"))
+        self.pool.add("b", self._entry("2"))
+        self.pool.add("c", self._entry("3"))
+        evicted = self.pool.add("b", self._entry("4"))
+
+        self.assertEqual([e.docker_id for e in evicted], ["1"])
+        self.assertEqual(len(self.pool), 3)
+        self.assertIsNone(self.pool.claim("a"))
+
+    def test_expire_and_drain(self):
+        self.pool.add("a", self._entry("1"))
+        self.timer.now = 50
+        self.pool.add("a", self._entry("2"))
+        self.pool.add("b", self._entry("3"))
+
+        self.timer.now = 100
+        expired = self.pool.expire()
+        self.assertEqual([e.docker_id for e in expired], ["1"])
+        self.assertEqual(self.pool.count("a"), 1)
+
+        drained = self.pool.drain()
+        self.assertEqual(sorted(e.docker_id for e in drained), ["2", "3"])
+        self.assertEqual(len(self.pool), 0)
+
+    def test_signature(self):
+        sig = warm_pool.signature("user", "image", "mapping", "/user/foo",
+                                  {"/a": {"bind": "/b", "mode": "rw"}},
+                                  {"X": "1", "Y": "2"})
+        self.assertEqual(
+            sig,
+            warm_pool.signature("user", "image", "mapping", "/user/foo",
+                                {"/a": {"mode": "rw", "bind": "/b"}},
+                                {"Y": "2", "X": "1"}))
+        self.assertNotEqual(
+            sig,
+            warm_pool.signature("user", "image", "mapping", "/user/foo",
+                                None, {"X": "1", "Y": "2"}))
+        self.assertNotEqual(
+            sig,
+            warm_pool.signature("image", "user", "mapping", "/user/foo",
+                                {"/a": {"bind": "/b", "mode": "rw"}},
+                                {"X": "1", "Y": "2"}))
@@ -0,0 +1,165 @@
+import collections
+import json
+import time
+
+
+#: A container that has been created and started in advance, and is
+#: waiting to be claimed.
+PooledContainer = collections.namedtuple(
+    "PooledContainer",
+    ["docker_id", "name", "image_id", "url_id", "urlpath", "created_at"])
+
+
+class WarmPool:
+    """Keeps track of the containers created in advance, grouped by
+    creation signature.
+
+    The environment, labels and mounts of a docker container cannot be
+    changed after creation, and they depend on the user, the mapping and
+    the configuration. A pooled container can therefore only be claimed by
+    a start request with exactly the same creation arguments, identified
+    by its signature (see the signature function).
+
+    The pool only does the bookkeeping. Creating and removing the actual
+    docker containers is responsibility of the ContainerManager.
+
+    This class is not thread safe.
+    """
+
+    def __init__(self, max_containers, ttl, timer=time.monotonic):
+        """Initialises the pool.
+
+        Parameters
+        ----------
+        max_containers: int
+            The maximum number of containers in the pool, across all the
+            signatures.
+        ttl: float
+            The time (in seconds) after which a pooled container that has
+            not been claimed is considered expired.
+        timer: callable
+            A function returning the current time in seconds.
+        """
+        self.max_containers = max_containers
+        self.ttl = ttl
+        self._timer = timer
+
+        # signature -> deque of PooledContainer, oldest first.
+        self._entries = collections.OrderedDict()
+
+        # signature -> number of containers being created for it.
+        self._pending = collections.Counter()
+
+    def new_entry(self, docker_id, name, image_id, url_id, urlpath):
+        """Returns a PooledContainer created now."""
+        return PooledContainer(docker_id, name, image_id, url_id, urlpath,
+                               self._timer())
+
+    def add(self, signature, entry):
+        """Adds a created container to the pool.
+
+        Return
+        ------
+        The list of PooledContainer evicted to stay within
+        max_containers. Their docker containers must be removed.
+        """
+        self._entries.setdefault(signature, collections.deque()).append(
+            entry)
+        self._entries.move_to_end(signature)
+
+        evicted = []
+        while len(self) > self.max_containers:
+            evicted.append(self._pop_oldest())
+
+        return evicted
+
+    def claim(self, signature):
+        """Takes the oldest container out of the pool for the given
+        signature. Call expire() first to avoid claiming expired
+        containers.
+
+        Return
+        ------
+        A PooledContainer, or None if none is available.
+        """
+        entries = self._entries.get(signature)
+        if not entries:
+            return None
+
+        entry = entries.popleft()
+        if not entries:
+            del self._entries[signature]
+
+        return entry
+
+    def expire(self):
+        """Removes the expired containers from the pool.
+
+        Return
+        ------
+        The list of the removed PooledContainer.
+        """
+        expired = []
+        for signature in list(self._entries.keys()):
+            entries = self._entries[signature]
+            while entries and self._expired(entries[0]):
+                expired.append(entries.popleft())
+            if not entries:
+                del self._entries[signature]
+
+        return expired
+
+    def drain(self):
+        """Removes all the containers from the pool.
+
+        Return
+        ------
+        The list of the removed PooledContainer.
+        """
+        drained = [entry
+                   for entries in self._entries.values()
+                   for entry in entries]
+        self._entries.clear()
+        return drained
+
+    def count(self, signature):
+        """Returns the number of containers available or being created
+        for a signature."""
+        return len(self._entries.get(signature, ())) + self._pending[signature]
+
+    def creation_started(self, signature):
+        """Records that a container is being created for the signature."""
+        self._pending[signature] += 1
+
+    def creation_finished(self, signature):
+        """Records that a container creation has finished, successfully
+        or not."""
+        self._pending[signature] -= 1
+        if self._pending[signature] <= 0:
+            del self._pending[signature]
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _pop_oldest(self):
+        """Removes and returns the oldest entry of the signature that
+        was least recently refilled."""
+        signature, entries = next(iter(self._entries.items()))
+        entry = entries.popleft()
+        if not entries:
+            del self._entries[signature]
+        return entry
+
+    def _expired(self, entry):
+        return self._timer() - entry.created_at >= self.ttl
+
+
+def signature(user_name, image_name, mapping_id, base_urlpath,
+              volumes, environment):
+    """Returns a string identifying the arguments used to create
+    a container, in the order of ContainerManager.start_container.
+    Two start requests with the same signature can use the same pooled
+    container."""
+    return json.dumps([user_name, image_name, mapping_id, base_urlpath,
+                       volumes or {}, environment or {}],
+                      sort_keys=True)
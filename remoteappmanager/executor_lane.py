@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+
+class ExecutorLane:
+    """A thread pool executor that keeps track of how many jobs are
+    waiting for a free thread, and for how long they waited.
+
+    This class is thread safe.
+    """
+
+    def __init__(self, name, max_workers):
+        """Initialises the lane.
+
+        Parameters
+        ----------
+        name: str
+            The name of the lane, for reporting purposes.
+        max_workers: int
+            The number of threads serving the lane.
+        """
+        if max_workers < 1:
+            raise ValueError("Lane {} needs at least one worker".format(name))
+
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._lock = threading.Lock()
+
+        # Jobs submitted, but not yet picked up by a thread.
+        self._queue_depth = 0
+        # Number of jobs that have been picked up by a thread.
+        self._num_started = 0
+        # Total and maximum time (seconds) that jobs spent in the queue.
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits a callable to the lane executor.
+
+        Return
+        ------
+        A future from the ThreadPoolExecutor.
+        """
+        submitted_at = time.monotonic()
+
+        def job():
+            wait = time.monotonic() - submitted_at
+            with self._lock:
+                self._queue_depth -= 1
+                self._num_started += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            self._queue_depth += 1
+
+        return self._executor.submit(job)
+
+    def stats(self):
+        """Returns a dictionary with the current lane statistics.
+
+        Return
+        ------
+        A dictionary with the following keys
+            - workers: number of threads serving the lane
+            - queue_depth: number of jobs waiting for a thread
+            - num_started: number of jobs that left the queue
+            - total_wait: total time (s) spent in the queue by started jobs
+            - mean_wait: average time (s) spent in the queue
+            - max_wait: maximum time (s) spent in the queue by a job
+        """
+        with self._lock:
+            mean_wait = (self._total_wait / self._num_started
+                         if self._num_started else 0.0)
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._queue_depth,
+                "num_started": self._num_started,
+                "total_wait": self._total_wait,
+                "mean_wait": mean_wait,
+                "max_wait": self._max_wait,
+            }
@@ -2,7 +2,7 @@ import os
 
 import tornado.options
 from docker import tls
-from traitlets import HasTraits, Int, Unicode, Bool, Dict
+from traitlets import HasTraits, Int, Unicode, Bool, Dict, Float, List
 
 from remoteappmanager import paths
 from remoteappmanager.traitlets import set_traits_from_dict
@@ -30,6 +30,14 @@ class FileConfig(HasTraits):
 
     docker_host = Unicode("", help="The docker host to connect to")
 
+    docker_hosts = List(
+        default_value=[],
+        help="The docker hosts where the containers are spread, as a list "
+             "of dictionaries with the keys docker_host, tls, tls_verify, "
+             "tls_ca, tls_cert and tls_key. The missing keys take the value "
+             "of the corresponding option. If empty, only docker_host "
+             "is used.")
+
     #: Docker realm is a label added to containers started by this deployment
     #: of simphony-remote. You should change this to something unique only if
     #: your machine is already running other simphony-remote instances, all
@@ -41,6 +49,158 @@ class FileConfig(HasTraits):
         help="The docker realm. Identifies which containers belong to a "
              "specific instance of simphony-remote.")
 
+    docker_query_workers = Int(
+        default_value=4,
+        help="The number of threads performing read-only docker operations "
+             "(e.g. listing containers, inspecting images)")
+
+    docker_mutating_workers = Int(
+        default_value=2,
+        help="The number of threads performing docker operations that "
+             "create, start, stop or remove containers")
+
+    docker_pull_workers = Int(
+        default_value=2,
+        help="The number of threads pulling docker images. The pulls do "
+             "not use the threads of the other docker operations, so a "
+             "slow pull does not delay the container starts.")
+
+    docker_native_client = Bool(
+        default_value=False,
+        help="If True, communicate with the docker daemon through a "
+             "non-blocking HTTP client running in the event loop, with "
+             "persistent connections, instead of the docker-py client "
+             "running in threads. The docker_*_workers options are "
+             "ignored in this case.")
+
+    docker_port_resolution = Unicode(
+        default_value="list",
+        help="How to find the host port of the containers. 'list' uses "
+             "the port bindings reported by the container list, and queries "
+             "docker only when they are missing. 'port' performs an "
+             "additional docker query for each container.")
+
+    docker_event_cache = Bool(
+        default_value=False,
+        help="If True, keep an in-memory index of the running containers, "
+             "kept up to date by the docker event stream, instead of "
+             "listing the containers at every request.")
+
+    coalesce_operations = Bool(
+        default_value=False,
+        help="If True, a request to start an application that is already "
+             "starting, or to stop a container that is already stopping, "
+             "waits for the operation in progress and returns its outcome, "
+             "instead of failing.")
+
+    image_cache_size = Int(
+        default_value=64,
+        help="The maximum number of docker images whose information is "
+             "cached. 0 disables the cache.")
+
+    image_cache_ttl = Float(
+        default_value=300.0,
+        help="The time, in seconds, after which the cached information "
+             "of a docker image is retrieved again.")
+
+    image_lookup_concurrency = Int(
+        default_value=8,
+        help="The maximum number of docker images looked up at the same "
+             "time when listing the applications of a user.")
+
+    warm_pool_policy = Dict(
+        default_value={},
+        help="A dictionary image name -> number of containers to create "
+             "and start in advance for each user and configuration of the "
+             "image, when the user process starts and after each start, so "
+             "that a start of the same application finds the container "
+             "running. The pooled containers use the resources of the "
+             "docker host until claimed. Empty disables the pool.")
+
+    warm_pool_max_containers = Int(
+        default_value=10,
+        help="The maximum number of containers started in advance on the "
+             "docker host, by all the user processes together.")
+
+    warm_pool_ttl = Float(
+        default_value=3600.0,
+        help="The time, in seconds, after which a container started in "
+             "advance and not used is removed.")
+
+    idle_timeout = Float(
+        default_value=0.0,
+        help="The time (seconds) without activity through the reverse proxy "
+             "after which a container is stopped. 0 means never. The "
+             "containers of all the users are checked by the admin "
+             "application.")
+
+    idle_timeouts = Dict(
+        default_value={},
+        help="Image name -> the idle time (seconds) after which the "
+             "containers of that image are stopped. Overrides idle_timeout.")
+
+    idle_check_interval = Float(
+        default_value=60.0,
+        help="The interval (seconds) between two checks for idle "
+             "containers.")
+
+    route_reconcile_interval = Float(
+        default_value=0.0,
+        help="The interval (seconds) between two reconciliations of the "
+             "reverse proxy routes with the running containers, restoring "
+             "the missing routes and removing the stale ones. 0 disables "
+             "the reconciliation. The routes of all the users are "
+             "reconciled by the admin application.")
+
+    image_sync = Bool(
+        default_value=False,
+        help="If True, the admin application pulls in background the "
+             "images of the registered applications missing from the "
+             "docker host.")
+
+    image_sync_interval = Float(
+        default_value=600.0,
+        help="The interval (seconds) between two checks for missing "
+             "application images.")
+
+    image_sync_concurrency = Int(
+        default_value=2,
+        help="The maximum number of images pulled at the same time.")
+
+    image_sync_attempts = Int(
+        default_value=3,
+        help="The number of attempts to pull a missing image before giving "
+             "up until the next check.")
+
+    admission_max_concurrent = Int(
+        default_value=0,
+        help="The maximum number of containers started at the same time "
+             "by all the users. The other starts wait for their turn, the "
+             "users being served in rotation. 0 means unlimited. The "
+             "processes of the users coordinate through the database, "
+             "which must be an ORMDatabase stored in a file or a server.")
+
+    admission_max_queued = Int(
+        default_value=0,
+        help="The maximum number of container starts of all the users "
+             "waiting for their turn. The starts exceeding it are refused. "
+             "0 means unlimited.")
+
+    admission_queue_timeout = Float(
+        default_value=300.0,
+        help="The maximum time (seconds) a container start waits for its "
+             "turn before being refused.")
+
+    admission_user_quota = Int(
+        default_value=0,
+        help="The maximum number of containers a user can run. 0 means "
+             "unlimited.")
+
+    operation_ttl = Float(
+        default_value=300.0,
+        help="The time (seconds) the outcome of a container start "
+             "performed in background can still be retrieved.")
+
     database_class = Unicode(
         default_value="remoteappmanager.db.orm.ORMDatabase",
         help="The import path to a subclass of ABCDatabase")
@@ -49,16 +209,93 @@ class FileConfig(HasTraits):
         default_value={'url': 'sqlite:///remoteappmanager.db'},
         help="The keyword arguments for initialising the Database instance")
 
+    database_workers = Int(
+        default_value=4,
+        help="The number of threads executing the database queries on "
+             "behalf of the web API.")
+
     login_url = Unicode(default_value="/hub",
                         help=("The url to be redirected to if the user is not "
                               "authenticated for pages that require "
                               "authentication"))
 
+    http_max_clients = Int(
+        default_value=32,
+        help="The maximum number of HTTP requests to the hub, the proxy and "
+             "the containers in progress at the same time. The others wait "
+             "for their turn.")
+
+    http_use_curl = Bool(
+        default_value=True,
+        help="If True, and pycurl is installed, use the curl based HTTP "
+             "client, which keeps the connections alive and reuses them.")
+
+    http_connect_timeout = Float(
+        default_value=5.0,
+        help="The maximum time (seconds) to establish an HTTP connection "
+             "to the hub or the proxy.")
+
+    http_request_timeout = Float(
+        default_value=20.0,
+        help="The maximum time (seconds) of an HTTP request to the hub or "
+             "the proxy.")
+
+    hub_auth_cache_size = Int(
+        default_value=256,
+        help="The maximum number of user cookies whose verification by "
+             "the hub is remembered. 0 disables the cache.")
+
+    hub_auth_cache_ttl = Float(
+        default_value=30.0,
+        help="The time (seconds) a successful cookie verification by the "
+             "hub is remembered.")
+
+    hub_auth_negative_cache_ttl = Float(
+        default_value=5.0,
+        help="The time (seconds) a cookie rejected by the hub is "
+             "remembered.")
+
     # The network timeout for any async operation we have to perform,
     # in seconds. 30 seconds is plenty enough.
     network_timeout = Int(default_value=30,
                           help="The timeout (seconds) for network operations")
 
+    readiness_connect_timeout = Float(
+        default_value=2.0,
+        help="The maximum time (seconds) allowed to connect to a starting "
+             "container at each readiness probe.")
+
+    readiness_initial_delay = Float(
+        default_value=0.1,
+        help="The delay (seconds) after the first failed readiness probe "
+             "of a starting container.")
+
+    readiness_max_delay = Float(
+        default_value=2.0,
+        help="The maximum delay (seconds) between two readiness probes.")
+
+    readiness_backoff = Float(
+        default_value=2.0,
+        help="The factor applied to the delay between readiness probes "
+             "after each failed probe.")
+
+    readiness_jitter = Float(
+        default_value=0.2,
+        help="The fraction (between 0 and 1) of each delay between "
+             "readiness probes that is randomly removed, to spread the "
+             "probes of containers started together.")
+
+    readiness_tcp_check = Bool(
+        default_value=False,
+        help="If True, a plain TCP connection is attempted before each "
+             "HTTP readiness probe.")
+
+    readiness_health_events = Bool(
+        default_value=False,
+        help="If True, wait for the docker health_status event of the "
+             "containers whose image defines a HEALTHCHECK before probing "
+             "them over HTTP.")
+
     template_path = Unicode(
         default_value=paths.template_dir,
         help="The path where to search for jinja templates")
@@ -142,25 +379,62 @@ class FileConfig(HasTraits):
         """Extracts the docker configuration as a dictionary suitable
         to be passed as keywords to the docker client.
         """
-        params = {}
-        params["base_url"] = self.docker_host
-
-        # Note that this will throw if the certificates are not
-        # present at the specified paths.
-        # Note that the tls flag takes precedence against tls verify.
-        # This is docker behavior.
-        params["version"] = "auto"
-
-        if not self.tls:
-            return params
+        return _docker_config(self.docker_host,
+                              self.tls,
+                              self.tls_verify,
+                              self.tls_ca,
+                              self.tls_cert,
+                              self.tls_key)
+
+    def docker_configs(self):
+        """Extracts the docker configuration of each docker host, as a
+        list of dictionaries suitable to be passed as keywords to the
+        docker client.
+        """
+        if not self.docker_hosts:
+            return [self.docker_config()]
+
+        configs = []
+        for endpoint in self.docker_hosts:
+            tls = endpoint.get("tls", self.tls)
+            tls_verify = endpoint.get("tls_verify", self.tls_verify)
+            docker_host = endpoint.get("docker_host", self.docker_host)
+            if tls or tls_verify:
+                docker_host = docker_host.replace('tcp://', 'https://')
+
+            configs.append(_docker_config(
+                docker_host,
+                tls,
+                tls_verify,
+                endpoint.get("tls_ca", self.tls_ca),
+                endpoint.get("tls_cert", self.tls_cert),
+                endpoint.get("tls_key", self.tls_key)))
+
+        return configs
+
+
+def _docker_config(docker_host, tls_enabled, tls_verify,
+                   tls_ca, tls_cert, tls_key):
+    """Returns the docker client configuration for a docker host."""
+    params = {}
+    params["base_url"] = docker_host
+
+    # Note that this will throw if the certificates are not
+    # present at the specified paths.
+    # Note that the tls flag takes precedence against tls verify.
+    # This is docker behavior.
+    params["version"] = "auto"
+
+    if not tls_enabled:
+        return params
 
-        tls_kwargs = {}
-        tls_kwargs["client_cert"] = (self.tls_cert, self.tls_key)
-        tls_kwargs["verify"] = self.tls_verify
+    tls_kwargs = {}
+    tls_kwargs["client_cert"] = (tls_cert, tls_key)
+    tls_kwargs["verify"] = tls_verify
 
-        if self.tls_verify and self.tls_ca:
-            tls_kwargs["ca_cert"] = self.tls_ca
+    if tls_verify and tls_ca:
+        tls_kwargs["ca_cert"] = tls_ca
 
-        params["tls"] = tls.TLSConfig(**tls_kwargs)
+    params["tls"] = tls.TLSConfig(**tls_kwargs)
 
-        return params
+    return params
@@ -1,4 +1,6 @@
 from .user_home_handler import UserHomeHandler  # noqa
 from .base_handler import BaseHandler  # noqa
 from .register_container_handler import RegisterContainerHandler  # noqa
+from .metrics_handler import MetricsHandler  # noqa
+from .logout_handler import LogoutHandler  # noqa
 from .admin.admin_home_handler import AdminHomeHandler  # noqa
@@ -1,11 +1,11 @@
 from http.client import responses
-from urllib.parse import urljoin
 import hashlib
 
 from tornado import web, gen
 
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.handlers.handler_authenticator import HubAuthenticator
+from remoteappmanager.utils import url_path_join
 
 
 class BaseHandler(web.RequestHandler, LoggingMixin):
@@ -32,7 +32,8 @@ class BaseHandler(web.RequestHandler, LoggingMixin):
         args = dict(
             user=self.current_user,
             base_url=command_line_config.base_urlpath,
-            logout_url=urljoin(command_line_config.hub_prefix, "logout")
+            logout_url=url_path_join(command_line_config.base_urlpath,
+                                     "logout")
         )
 
         args.update(kwargs)
@@ -0,0 +1,17 @@
+from urllib.parse import urljoin
+
+from remoteappmanager.handlers.base_handler import BaseHandler
+
+
+class LogoutHandler(BaseHandler):
+    """Forgets the verification of the user cookie, so that the logout
+    takes effect immediately, then redirects to the hub logout."""
+
+    def get(self):
+        cookie_name = self.settings["cookie_name"]
+        user_cookie = self.get_cookie(cookie_name)
+        if user_cookie:
+            self.application.hub.invalidate_token(cookie_name, user_cookie)
+
+        self.redirect(urljoin(
+            self.application.command_line_config.hub_prefix, "logout"))
@@ -0,0 +1,13 @@
+from tornado import web
+
+from remoteappmanager.handlers.base_handler import BaseHandler
+
+
+class MetricsHandler(BaseHandler):
+    """Exposes the performance metrics of the application in the
+    prometheus text format."""
+
+    @web.authenticated
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(self.application.metrics.as_text())
@@ -0,0 +1,21 @@
+from tornado.testing import LogTrapTestCase
+
+from remoteappmanager.tests import utils
+from remoteappmanager.tests.mocking import dummy
+
+
+class TestLogoutHandler(utils.AsyncHTTPTestCase, LogTrapTestCase):
+    def get_app(self):
+        return dummy.create_application()
+
+    def test_logout(self):
+        res = self.fetch("/user/johndoe/logout",
+                         headers={
+                             "Cookie": "jupyter-hub-token-johndoe=foo"
+                         },
+                         follow_redirects=False)
+
+        self.assertEqual(res.code, 302)
+        self.assertTrue(res.headers["Location"].endswith("/hub/logout"))
+        self._app.hub.invalidate_token.assert_called_with(
+            "jupyter-hub-token-johndoe", "foo")
@@ -0,0 +1,101 @@
+import time
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient
+from traitlets import HasTraits, Instance, Float
+
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.metrics import MetricsRegistry
+
+#: The implementation of the curl based client.
+CURL_CLIENT = "tornado.curl_httpclient.CurlAsyncHTTPClient"
+
+
+def configure_http_client(max_clients=10, use_curl=True):
+    """Configures the tornado AsyncHTTPClient used by the application.
+    Must be invoked before the first client is created.
+
+    Parameters
+    ----------
+    max_clients: int
+        The maximum number of requests in progress at the same time.
+        The others are queued.
+    use_curl: bool
+        If True, and pycurl is available, use the curl based client, which
+        keeps the connections alive and reuses them for the following
+        requests to the same destination.
+
+    Return
+    ------
+    The name of the configured client, "curl" or "simple".
+    """
+    impl = None
+    if use_curl:
+        try:
+            import pycurl  # noqa
+        except ImportError:
+            pass
+        else:
+            impl = CURL_CLIENT
+
+    AsyncHTTPClient.configure(impl, max_clients=max_clients)
+    return "simple" if impl is None else "curl"
+
+
+class HTTPClient(LoggingMixin, HasTraits):
+    """Performs the HTTP requests of the application to other services,
+    with default timeouts, and records the requests in progress and their
+    duration.
+    """
+
+    #: The default maximum time (seconds) to establish a connection.
+    connect_timeout = Float(5.0)
+
+    #: The default maximum time (seconds) of a whole request.
+    request_timeout = Float(20.0)
+
+    #: The registry where the requests are recorded.
+    metrics = Instance(MetricsRegistry, args=())
+
+    @gen.coroutine
+    def fetch(self, url, service="other", raise_error=True, **kwargs):
+        """Performs a request.
+
+        Parameters
+        ----------
+        url: str
+            The url to fetch.
+        service: str
+            The name of the service being contacted, e.g. "hub", used to
+            label the metrics.
+        raise_error: bool
+            If True, responses with an error code raise HTTPError.
+        **kwargs:
+            The arguments of tornado.httpclient.HTTPRequest. The timeouts,
+            if not specified, are the defaults of this client.
+
+        Return
+        ------
+        The tornado.httpclient.HTTPResponse
+        """
+        kwargs.setdefault("connect_timeout", self.connect_timeout)
+        kwargs.setdefault("request_timeout", self.request_timeout)
+
+        in_flight = self.metrics.gauge(
+            "http_client_requests_in_flight",
+            "Number of HTTP requests in progress",
+            service=service)
+
+        start = time.monotonic()
+        in_flight.inc()
+        try:
+            response = yield AsyncHTTPClient().fetch(
+                url, raise_error=raise_error, **kwargs)
+        finally:
+            in_flight.dec()
+            self.metrics.histogram(
+                "http_client_request_seconds",
+                "Duration of the HTTP requests",
+                service=service).observe(time.monotonic() - start)
+
+        return response
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+from tornado import gen
+from tornado.ioloop import PeriodicCallback
+from traitlets import HasTraits, Instance, Float, Dict, Unicode, Any
+
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+
+
+class IdleCuller(LoggingMixin, HasTraits):
+    """Periodically stops the containers that have not been accessed
+    for a while.
+
+    The activity of a container is obtained from the last_activity
+    timestamp of its route in the reverse proxy. A container with no
+    route is considered idle since the first time the culler noticed it.
+    """
+    #: The container manager used to find and stop the containers.
+    container_manager = Instance(ContainerManager)
+
+    #: The reverse proxy providing the activity and routing the containers.
+    reverse_proxy = Instance(ReverseProxy)
+
+    #: The idle time (in seconds) after which a container is stopped.
+    #: Zero or negative means never.
+    default_timeout = Float(0.0)
+
+    #: image name -> idle time (in seconds) after which the containers of
+    #: that image are stopped. Overrides default_timeout.
+    timeouts = Dict()
+
+    #: The interval (in seconds) between two checks.
+    interval = Float(60.0)
+
+    #: If specified, only the containers of this user are considered.
+    user_name = Unicode(None, allow_none=True)
+
+    #: urlpath -> time when the container was first seen without a route.
+    _unrouted_since = Dict()
+
+    #: The periodic callback, when started.
+    _periodic_callback = Any(None)
+
+    def start(self):
+        """Starts the periodic checks."""
+        if self._periodic_callback is not None:
+            return
+
+        self.log.info("Culling idle containers every {} seconds".format(
+            self.interval))
+        self._periodic_callback = PeriodicCallback(
+            self.cull, self.interval * 1000)
+        self._periodic_callback.start()
+
+    def stop(self):
+        """Stops the periodic checks."""
+        if self._periodic_callback is not None:
+            self._periodic_callback.stop()
+            self._periodic_callback = None
+
+    def timeout_for(self, image_name):
+        """Returns the idle timeout (in seconds) for the containers
+        of the given image."""
+        return self.timeouts.get(image_name, self.default_timeout)
+
+    @gen.coroutine
+    def cull(self):
+        """Stops and unregisters the idle containers.
+
+        Return
+        ------
+        The list of the stopped containers.
+        """
+        try:
+            last_activity = yield self.reverse_proxy.last_activity()
+            containers = yield self.container_manager.find_containers(
+                user_name=self.user_name)
+        except Exception as e:
+            self.log.warning("Unable to check for idle containers: "
+                             "{}".format(e))
+            return []
+
+        now = self._now()
+        culled = []
+        urlpaths = set()
+        for container in containers:
+            urlpaths.add(container.urlpath)
+            timeout = self.timeout_for(container.image_name)
+            if timeout <= 0:
+                continue
+
+            activity = last_activity.get(container.urlpath)
+            if activity is None:
+                activity = self._unrouted_since.setdefault(
+                    container.urlpath, now)
+            else:
+                self._unrouted_since.pop(container.urlpath, None)
+
+            idle = (now - activity).total_seconds()
+            if idle < timeout:
+                continue
+
+            self.log.info("Container {} of user {} idle for {:.0f} "
+                          "seconds. Stopping.".format(
+                              container.urlpath, container.user, idle))
+            try:
+                yield self.reverse_proxy.unregister(container.urlpath)
+                yield self.container_manager.stop_and_remove_container(
+                    container.docker_id)
+            except Exception:
+                self.log.exception("Unable to stop idle container "
+                                   "{}".format(container.urlpath))
+            else:
+                culled.append(container)
+
+        # Forget the containers that are gone.
+        for urlpath in set(self._unrouted_since) - urlpaths:
+            del self._unrouted_since[urlpath]
+
+        return culled
+
+    def _now(self):
+        """Returns the current UTC time, as reported by the proxy."""
+        return datetime.utcnow()
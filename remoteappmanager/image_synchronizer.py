@@ -0,0 +1,198 @@
+import time
+
+from tornado import gen, locks
+from tornado.ioloop import IOLoop, PeriodicCallback
+from traitlets import HasTraits, Instance, Int, Float, Dict, Any, default
+
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.metrics import MetricsRegistry
+
+#: The image is present on the docker host.
+PRESENT = "present"
+
+#: The image is being pulled.
+PULLING = "pulling"
+
+#: The image could not be pulled.
+FAILED = "failed"
+
+#: The histogram buckets of the pull durations, in seconds.
+PULL_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class ImageSynchronizer(LoggingMixin, HasTraits):
+    """Makes sure that the images of all the registered applications are
+    present on the docker host, pulling the missing ones in background.
+    """
+    #: The container manager used to check and pull the images.
+    container_manager = Instance(ContainerManager)
+
+    #: The database listing the applications.
+    async_db = Instance(AsyncDatabase)
+
+    #: The registry where the pull durations are observed.
+    metrics = Instance(MetricsRegistry, args=())
+
+    #: The maximum number of images pulled at the same time.
+    concurrency = Int(2)
+
+    #: The number of attempts to pull an image before giving up, until
+    #: the next synchronization.
+    attempts = Int(3)
+
+    #: The delay (in seconds) before the second attempt. It doubles at
+    #: each following attempt.
+    retry_delay = Float(10.0)
+
+    #: The interval (in seconds) between two synchronizations.
+    interval = Float(600.0)
+
+    #: image name -> PRESENT, PULLING or FAILED.
+    status = Dict()
+
+    #: image name -> future of the synchronization in progress.
+    _inflight = Dict()
+
+    #: Limits the number of concurrent pulls.
+    _slots = Instance(locks.Semaphore)
+
+    #: The periodic callback, when started.
+    _periodic_callback = Any(None)
+
+    def start(self):
+        """Synchronizes the images now and then periodically."""
+        if self._periodic_callback is not None:
+            return
+
+        self.log.info("Synchronizing application images every {} "
+                      "seconds".format(self.interval))
+        IOLoop.current().spawn_callback(self.synchronize)
+        self._periodic_callback = PeriodicCallback(
+            self.synchronize, self.interval * 1000)
+        self._periodic_callback.start()
+
+    def stop(self):
+        """Stops the periodic synchronization."""
+        if self._periodic_callback is not None:
+            self._periodic_callback.stop()
+            self._periodic_callback = None
+
+    @gen.coroutine
+    def synchronize(self):
+        """Makes sure that the images of all the applications in the
+        database are present."""
+        try:
+            applications = yield self.async_db.list_applications()
+            image_names = sorted({app.image for app in applications})
+        except Exception as e:
+            self.log.warning("Unable to list the applications: {}".format(e))
+            return
+
+        # Forget the images of the removed applications.
+        for image_name in set(self.status) - set(image_names):
+            if image_name not in self._inflight:
+                del self.status[image_name]
+
+        yield [self.synchronize_image(image_name)
+               for image_name in image_names]
+
+    def synchronize_image(self, image_name):
+        """Makes sure that an image is present, pulling it if missing.
+        Concurrent requests for the same image share the same operation.
+
+        Return
+        ------
+        A future resolving to True if the image is present.
+        """
+        future = self._inflight.get(image_name)
+        if future is None:
+            future = self._synchronize_image(image_name)
+            self._inflight[image_name] = future
+            future.add_done_callback(
+                lambda f: self._inflight.pop(image_name, None))
+
+        return future
+
+    @gen.coroutine
+    def _synchronize_image(self, image_name):
+        try:
+            present = yield self.container_manager.has_image(image_name)
+        except Exception as e:
+            self.log.warning("Unable to check image {}: {}".format(
+                image_name, e))
+            return False
+
+        if present:
+            self.status[image_name] = PRESENT
+            return True
+
+        self.status[image_name] = PULLING
+        delay = self.retry_delay
+        for attempt in range(1, self.attempts + 1):
+            with (yield self._slots.acquire()):
+                pulled = yield self._pull(image_name, attempt)
+
+            if pulled:
+                self.status[image_name] = PRESENT
+                return True
+
+            if attempt < self.attempts:
+                yield gen.sleep(delay)
+                delay *= 2
+
+        self.status[image_name] = FAILED
+        return False
+
+    @gen.coroutine
+    def _pull(self, image_name, attempt):
+        """Performs a pull attempt, logging its progress.
+
+        Return
+        ------
+        True if the image has been pulled.
+        """
+        self.log.info("Pulling image {} (attempt {} of {})".format(
+            image_name, attempt, self.attempts))
+
+        def progress(item):
+            # Skip the progress bar updates, which are many and verbose.
+            if "progress" in item:
+                return
+            if "error" in item:
+                self.log.warning("Pull of {}: {}".format(
+                    image_name, item["error"]))
+                return
+
+            layer = item.get("id")
+            if layer:
+                self.log.debug("Pull of {}: {}: {}".format(
+                    image_name, layer, item.get("status", "")))
+            else:
+                self.log.info("Pull of {}: {}".format(
+                    image_name, item.get("status", "")))
+
+        start = time.monotonic()
+        try:
+            yield self.container_manager.pull_image(image_name, progress)
+        except Exception as e:
+            outcome = "failure"
+            self.log.warning("Unable to pull image {}: {}".format(
+                image_name, e))
+        else:
+            outcome = "success"
+            self.log.info("Image {} pulled".format(image_name))
+
+        self.metrics.histogram(
+            "image_pull_seconds",
+            "Duration of the image pulls",
+            buckets=PULL_BUCKETS,
+            image=image_name,
+            outcome=outcome).observe(time.monotonic() - start)
+
+        return outcome == "success"
+
+    @default("_slots")
+    def _slots_default(self):
+        return locks.Semaphore(self.concurrency)
@@ -0,0 +1,321 @@
+import bisect
+import contextlib
+import threading
+import time
+
+#: The default histogram buckets, in seconds. They cover the range of the
+#: container operations, from a few milliseconds to a minute.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Counts the observed values in cumulative buckets, in the style of
+    prometheus histograms.
+
+    This class is thread safe.
+    """
+
+    def __init__(self, name, labels=None, buckets=DEFAULT_BUCKETS):
+        """Initialises the histogram.
+
+        Parameters
+        ----------
+        name: str
+            The name of the metric
+        labels: dict or None
+            The labels distinguishing this histogram from the others
+            with the same name.
+        buckets: tuple
+            The upper bounds of the buckets, in increasing order. An
+            additional bucket for infinity is always present.
+        """
+        self.name = name
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        """Records an observed value."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Returns the current state of the histogram.
+
+        Return
+        ------
+        A dictionary with the following keys
+            - count: the number of observations
+            - sum: the sum of the observed values
+            - buckets: a list of (upper bound, cumulative count) pairs,
+              the last having float("inf") as upper bound.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),),
+                                       counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+
+        return {
+            "count": count,
+            "sum": total,
+            "buckets": cumulative,
+        }
+
+
+class Gauge:
+    """A value that can go up and down, such as the number of requests
+    in progress.
+
+    This class is thread safe.
+    """
+
+    def __init__(self, name, labels=None):
+        """Initialises the gauge to zero.
+
+        Parameters
+        ----------
+        name: str
+            The name of the metric
+        labels: dict or None
+            The labels distinguishing this gauge from the others
+            with the same name.
+        """
+        self.name = name
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount=1):
+        """Increments the value."""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        """Decrements the value."""
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        """Sets the value."""
+        with self._lock:
+            self._value = value
+
+    def value(self):
+        """Returns the current value."""
+        with self._lock:
+            return self._value
+
+
+class MetricsRegistry:
+    """Holds the metrics of the application, and renders them
+    in the prometheus text format.
+
+    This class is thread safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (name, sorted labels) -> Histogram
+        self._histograms = {}
+        # (name, sorted labels) -> Gauge
+        self._gauges = {}
+        # name -> help string
+        self._help = {}
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels):
+        """Returns the histogram with the given name and labels, creating
+        it if needed.
+
+        Parameters
+        ----------
+        name: str
+            The name of the metric
+        help: str
+            A description of the metric
+        buckets: tuple
+            The bucket upper bounds, used if the histogram is created.
+        **labels:
+            The labels of the histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(name, labels, buckets)
+                self._histograms[key] = histogram
+            if help:
+                self._help.setdefault(name, help)
+
+        return histogram
+
+    def gauge(self, name, help="", **labels):
+        """Returns the gauge with the given name and labels, creating
+        it if needed.
+
+        Parameters
+        ----------
+        name: str
+            The name of the metric
+        help: str
+            A description of the metric
+        **labels:
+            The labels of the gauge.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            gauge = self._gauges.get(key)
+            if gauge is None:
+                gauge = Gauge(name, labels)
+                self._gauges[key] = gauge
+            if help:
+                self._help.setdefault(name, help)
+
+        return gauge
+
+    def gauges(self):
+        """Returns the list of the registered gauges, sorted by
+        name and labels."""
+        with self._lock:
+            return [self._gauges[key] for key in sorted(self._gauges.keys())]
+
+    def histograms(self):
+        """Returns the list of the registered histograms, sorted by
+        name and labels."""
+        with self._lock:
+            return [self._histograms[key]
+                    for key in sorted(self._histograms.keys())]
+
+    def as_text(self):
+        """Returns the metrics in the prometheus text exposition format."""
+        lines = []
+        declared = set()
+        for histogram in self.histograms():
+            name = histogram.name
+            if name not in declared:
+                declared.add(name)
+                help_text = self._help.get(name)
+                if help_text:
+                    lines.append("# HELP {} {}".format(name, help_text))
+                lines.append("# TYPE {} histogram".format(name))
+
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"]:
+                labels = dict(histogram.labels)
+                labels["le"] = "+Inf" if bound == float("inf") else repr(
+                    bound)
+                lines.append("{}_bucket{} {}".format(
+                    name, _format_labels(labels), count))
+
+            labels = _format_labels(histogram.labels)
+            lines.append("{}_sum{} {!r}".format(name, labels, snapshot["sum"]))
+            lines.append("{}_count{} {}".format(
+                name, labels, snapshot["count"]))
+
+        for gauge in self.gauges():
+            name = gauge.name
+            if name not in declared:
+                declared.add(name)
+                help_text = self._help.get(name)
+                if help_text:
+                    lines.append("# HELP {} {}".format(name, help_text))
+                lines.append("# TYPE {} gauge".format(name))
+
+            lines.append("{}{} {!r}".format(
+                name, _format_labels(gauge.labels), gauge.value()))
+
+        return "\n".join(lines) + "\n"
+
+
+class PhaseTimer:
+    """Measures the duration of the sequential phases of an operation,
+    such as a container start.
+
+    Each completed phase is recorded in the timer, and observed in the
+    histogram named metric_name with a "phase" label, if a registry is
+    given.
+    """
+
+    def __init__(self, registry=None, metric_name="phase_seconds",
+                 help="", timer=time.monotonic, on_phase=None):
+        """Initialises the timer.
+
+        Parameters
+        ----------
+        registry: MetricsRegistry or None
+            The registry where the phase durations are observed.
+        metric_name: str
+            The name of the histogram metric.
+        help: str
+            The description of the histogram metric.
+        timer: callable
+            A function returning the current time in seconds.
+        on_phase: callable or None
+            A function invoked with the name of each phase when it begins.
+        """
+        self.registry = registry
+        self.metric_name = metric_name
+        self.help = help
+        self._timer = timer
+        self._on_phase = on_phase
+
+        #: List of (phase name, duration in seconds), in order of
+        #: completion.
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager measuring the duration of a phase. The
+        phase is recorded even if it raises."""
+        if self._on_phase is not None:
+            self._on_phase(name)
+
+        start = self._timer()
+        try:
+            yield
+        finally:
+            self.record(name, self._timer() - start)
+
+    def record(self, name, duration):
+        """Records the duration of a phase."""
+        self.phases.append((name, duration))
+        if self.registry is not None:
+            self.registry.histogram(
+                self.metric_name, self.help, phase=name).observe(duration)
+
+    def total(self):
+        """Returns the sum of the durations of the recorded phases."""
+        return sum(duration for _, duration in self.phases)
+
+    def summary(self):
+        """Returns a one line summary of the phases, for logging."""
+        return " ".join(
+            ["{}={:.3f}s".format(name, duration)
+             for name, duration in self.phases] +
+            ["total={:.3f}s".format(self.total())])
+
+
+def _format_labels(labels):
+    """Formats a labels dictionary in the prometheus text format."""
+    if not labels:
+        return ""
+
+    return "{" + ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace(
+                "\n", "\\n"))
+        for key, value in sorted(labels.items())) + "}"
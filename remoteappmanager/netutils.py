@@ -1,42 +1,143 @@
 import socket
 import errno
+import random
+from datetime import timedelta
+from urllib.parse import urlsplit
 
 from tornado import gen, ioloop
-from tornado.httpclient import AsyncHTTPClient, HTTPError
+from tornado.httpclient import HTTPError
 from tornado.log import app_log
+from tornado.tcpclient import TCPClient
+
+from remoteappmanager.http_client import HTTPClient
 
 
 @gen.coroutine
-def wait_for_http_server_2xx(url, timeout=10):
+def wait_for_http_server_2xx(url, timeout=10, connect_timeout=None,
+                             initial_delay=0.1, max_delay=0.1,
+                             backoff=1.0, jitter=0.0, tcp_check=False,
+                             http_client=None):
     """Wait for an HTTP Server to respond at url and respond with a 2xx code.
+
+    The server is probed repeatedly. The delay between two probes starts at
+    initial_delay and is multiplied by backoff at every failed probe, up to
+    max_delay. The default values probe every 0.1 seconds.
+
+    Parameters
+    ----------
+    url: str
+        The url to probe
+    timeout: float
+        The time (in seconds) after which we give up.
+    connect_timeout: float or None
+        The maximum time (in seconds) allowed to establish the connection
+        of a single probe. If None, only the overall timeout applies.
+    initial_delay: float
+        The delay (in seconds) after the first failed probe.
+    max_delay: float
+        The maximum delay (in seconds) between two probes.
+    backoff: float
+        The factor applied to the delay after each failed probe.
+    jitter: float
+        The fraction (between 0 and 1) of each delay that is randomly
+        removed, so that the probes of servers started together are
+        spread over time.
+    tcp_check: bool
+        If True, a plain TCP connection is attempted before each HTTP
+        request, which is only performed once the port accepts connections.
+        This is cheaper than a full request while the server is starting.
+    http_client: HTTPClient or None
+        The client performing the probes. If None, a new one is used.
+
+    Raises
+    ------
+    TimeoutError:
+        If the server did not respond with a 2xx code within the timeout.
     """
     loop = ioloop.IOLoop.current()
     tic = loop.time()
-    client = AsyncHTTPClient()
+    client = http_client if http_client is not None else HTTPClient()
+    delays = probe_delays(initial_delay, max_delay, backoff, jitter)
 
     while loop.time() - tic < timeout:
-        try:
-            response = yield client.fetch(url, follow_redirects=True)
-        except HTTPError as e:
-            # Skip code 599 because it's expected and we don't want to
-            # pollute the logs.
-            if e.code != 599:
-                app_log.warning("Server at %s responded with: %s", url, e.code)
-        except (OSError, socket.error) as e:
-            if e.errno not in {errno.ECONNABORTED,
-                               errno.ECONNREFUSED,
-                               errno.ECONNRESET}:
-                app_log.warning("Failed to connect to %s (%s)", url, e)
-        except Exception as e:
-            # In case of any unexpected exception, we just log it and keep
-            # trying until eventually we timeout.
-            app_log.warning("Unknown exception occurred connecting to "
-                            "%s (%s)", url, e)
+        remaining = timeout - (loop.time() - tic)
+        attempt_connect_timeout = (
+            remaining if connect_timeout is None
+            else min(connect_timeout, remaining))
+
+        if tcp_check:
+            port_open = yield _tcp_connect(url, attempt_connect_timeout)
         else:
-            app_log.info("Server at %s responded with: %s", url, response.code)
-            return
+            port_open = True
+
+        if port_open:
+            try:
+                response = yield client.fetch(
+                    url,
+                    service="readiness",
+                    follow_redirects=True,
+                    connect_timeout=attempt_connect_timeout,
+                    request_timeout=remaining)
+            except HTTPError as e:
+                # Skip code 599 because it's expected and we don't want to
+                # pollute the logs.
+                if e.code != 599:
+                    app_log.warning("Server at %s responded with: %s",
+                                    url, e.code)
+            except (OSError, socket.error) as e:
+                if e.errno not in {errno.ECONNABORTED,
+                                   errno.ECONNREFUSED,
+                                   errno.ECONNRESET}:
+                    app_log.warning("Failed to connect to %s (%s)", url, e)
+            except Exception as e:
+                # In case of any unexpected exception, we just log it and
+                # keep trying until eventually we timeout.
+                app_log.warning("Unknown exception occurred connecting to "
+                                "%s (%s)", url, e)
+            else:
+                app_log.info("Server at %s responded with: %s",
+                             url, response.code)
+                return
 
-        yield gen.sleep(0.1)
+        remaining = timeout - (loop.time() - tic)
+        yield gen.sleep(min(next(delays), max(remaining, 0)))
 
     raise TimeoutError("Server at {} didn't respond in {} seconds".format(
         url, timeout))
+
+
+def probe_delays(initial_delay, max_delay, backoff, jitter):
+    """Generates the delays between successive probes, growing
+    exponentially from initial_delay to max_delay, with a random fraction
+    (up to jitter) removed from each."""
+    delay = min(initial_delay, max_delay)
+    while True:
+        yield delay * (1.0 - jitter * random.random())
+        delay = min(delay * backoff, max_delay)
+
+
+@gen.coroutine
+def _tcp_connect(url, timeout):
+    """Returns True if a TCP connection can be established within
+    the timeout to the host and port of the given url."""
+    parts = urlsplit(url)
+    port = parts.port
+    if port is None:
+        port = 443 if parts.scheme == "https" else 80
+
+    connect = TCPClient().connect(parts.hostname, port)
+    try:
+        stream = yield gen.with_timeout(
+            timedelta(seconds=timeout),
+            connect,
+            quiet_exceptions=(OSError, socket.error))
+    except gen.TimeoutError:
+        # Close the stream if the connection succeeds afterwards.
+        connect.add_done_callback(
+            lambda f: f.exception() is None and f.result().close())
+        return False
+    except (OSError, socket.error):
+        return False
+
+    stream.close()
+    return True
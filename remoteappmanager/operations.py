@@ -0,0 +1,136 @@
+import time
+import uuid
+
+from traitlets import HasTraits, Unicode, Float, Dict, Enum
+
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+
+#: The start is waiting for its turn.
+QUEUED = "queued"
+
+#: The container is being created.
+CREATING = "creating"
+
+#: The container is being started.
+STARTING = "starting"
+
+#: The application in the container is not answering yet.
+WAITING_READY = "waiting_ready"
+
+#: The container is being registered in the reverse proxy.
+REGISTERING = "registering"
+
+#: The container is ready to be used.
+READY = "ready"
+
+#: The start failed.
+FAILED = "failed"
+
+#: The phases of a container start, in order.
+PHASES = (QUEUED, CREATING, STARTING, WAITING_READY, REGISTERING, READY,
+          FAILED)
+
+#: Start phase, as recorded by the PhaseTimer -> operation phase.
+_PHASE_TIMER_PHASES = {
+    "admission": QUEUED,
+    "placement": CREATING,
+    "inspect_image": CREATING,
+    "find_duplicate": CREATING,
+    "claim_pooled": CREATING,
+    "create_host_config": CREATING,
+    "create": CREATING,
+    "start": STARTING,
+    "ip_port": STARTING,
+    "readiness": WAITING_READY,
+    "proxy_register": REGISTERING,
+}
+
+
+class ContainerStartOperation(HasTraits):
+    """The state of a container start running in background."""
+
+    #: The identifier of the operation.
+    identifier = Unicode()
+
+    #: The user starting the container.
+    user_name = Unicode()
+
+    #: The mapping id of the application being started.
+    mapping_id = Unicode()
+
+    #: The current phase.
+    phase = Enum(PHASES, default_value=QUEUED)
+
+    #: The url id of the container, once started.
+    url_id = Unicode()
+
+    #: The reason of the failure, if failed.
+    error = Unicode()
+
+    #: The time the operation completed (successfully or not), or 0.
+    completed_at = Float(0.0)
+
+    def is_completed(self):
+        return self.phase in (READY, FAILED)
+
+    def on_phase(self, name):
+        """Advances the operation to the phase corresponding to a
+        PhaseTimer phase name. Unknown names are ignored."""
+        phase = _PHASE_TIMER_PHASES.get(name)
+        if phase is not None:
+            self.phase = phase
+
+    def succeeded(self, url_id):
+        self.url_id = url_id
+        self.phase = READY
+        self.completed_at = time.monotonic()
+
+    def failed(self, error):
+        self.error = error
+        self.phase = FAILED
+        self.completed_at = time.monotonic()
+
+
+class OperationTracker(LoggingMixin, HasTraits):
+    """Keeps the container start operations running in background, so that
+    their progress can be queried. Completed operations are forgotten
+    after ttl seconds."""
+
+    #: The time (seconds) a completed operation can still be queried.
+    ttl = Float(300.0)
+
+    #: identifier -> ContainerStartOperation
+    _operations = Dict()
+
+    def new(self, user_name, mapping_id):
+        """Creates and returns a new operation."""
+        self._prune()
+        operation = ContainerStartOperation(
+            identifier=uuid.uuid4().hex,
+            user_name=user_name,
+            mapping_id=mapping_id)
+        self._operations[operation.identifier] = operation
+        return operation
+
+    def get(self, identifier, user_name):
+        """Returns the operation with the given identifier started by
+        user_name, or None if not found."""
+        self._prune()
+        operation = self._operations.get(identifier)
+        if operation is None or operation.user_name != user_name:
+            return None
+        return operation
+
+    def list(self, user_name):
+        """Returns the operations started by user_name."""
+        self._prune()
+        return [operation for operation in self._operations.values()
+                if operation.user_name == user_name]
+
+    def _prune(self):
+        """Forgets the operations completed more than ttl seconds ago."""
+        expired_before = time.monotonic() - self.ttl
+        for identifier, operation in list(self._operations.items()):
+            if (operation.is_completed() and
+                    operation.completed_at < expired_before):
+                del self._operations[identifier]
@@ -0,0 +1,79 @@
+from tornado import gen
+from tornado.ioloop import PeriodicCallback
+from traitlets import HasTraits, Instance, Float, Unicode, Any
+
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+
+
+class RouteReconciler(LoggingMixin, HasTraits):
+    """Periodically makes the routes of the reverse proxy match the
+    running containers, so that the routes lost by a proxy restart are
+    restored, and the routes of the containers that are gone are removed.
+    """
+    #: The container manager used to find the running containers.
+    container_manager = Instance(ContainerManager)
+
+    #: The reverse proxy routing the containers.
+    reverse_proxy = Instance(ReverseProxy)
+
+    #: The interval (in seconds) between two reconciliations.
+    interval = Float(60.0)
+
+    #: If specified, only the containers of this user are considered.
+    user_name = Unicode(None, allow_none=True)
+
+    #: A regular expression matching the urlpaths of the container
+    #: routes, as in ReverseProxy.sync. Only these routes are removed.
+    managed_urlpaths = Unicode()
+
+    #: The periodic callback, when started.
+    _periodic_callback = Any(None)
+
+    def start(self):
+        """Starts the periodic reconciliations."""
+        if self._periodic_callback is not None:
+            return
+
+        self.log.info("Reconciling the proxy routes every {} "
+                      "seconds".format(self.interval))
+        self._periodic_callback = PeriodicCallback(
+            self.reconcile, self.interval * 1000)
+        self._periodic_callback.start()
+
+    def stop(self):
+        """Stops the periodic reconciliations."""
+        if self._periodic_callback is not None:
+            self._periodic_callback.stop()
+            self._periodic_callback = None
+
+    @gen.coroutine
+    def reconcile(self):
+        """Registers the routes of the running containers that are missing
+        and unregisters the routes without container.
+
+        Return
+        ------
+        A tuple (registered, unregistered) with the lists of urlpaths
+        that have been registered and unregistered.
+        """
+        try:
+            containers = yield self.container_manager.find_containers(
+                user_name=self.user_name)
+            registered, unregistered = yield self.reverse_proxy.sync(
+                {container.urlpath: container.host_url
+                 for container in containers},
+                self.managed_urlpaths)
+        except Exception as e:
+            self.log.warning("Unable to reconcile the proxy routes: "
+                             "{}".format(e))
+            return [], []
+
+        for urlpath in registered:
+            self.log.info("Restored the route of container {}".format(
+                urlpath))
+        for urlpath in unregistered:
+            self.log.info("Removed the stale route {}".format(urlpath))
+
+        return registered, unregistered
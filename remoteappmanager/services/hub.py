@@ -1,9 +1,12 @@
+import hashlib
 from urllib.parse import quote
 
 from tornado import gen, escape
-from tornado.httpclient import AsyncHTTPClient
-from traitlets import HasTraits, Unicode
+from traitlets import (
+    HasTraits, Unicode, Int, Float, Dict, Any, Instance, default)
 
+from remoteappmanager.cache import TTLCache
+from remoteappmanager.http_client import HTTPClient
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.utils import url_path_join
 
@@ -17,6 +20,26 @@ class Hub(LoggingMixin, HasTraits):
     #: The api token to authenticate the request
     api_token = Unicode()
 
+    #: The client performing the requests to the hub.
+    http_client = Instance(HTTPClient, args=())
+
+    #: The maximum number of verified cookies remembered. 0 disables
+    #: the cache, and every verification queries the hub.
+    cache_size = Int(0)
+
+    #: The time (seconds) a successful verification is remembered.
+    cache_ttl = Float(30.0)
+
+    #: The time (seconds) a rejected cookie is remembered.
+    negative_cache_ttl = Float(5.0)
+
+    #: Cache of the verifications, keyed by a hash of the cookie.
+    #: None if disabled.
+    _cache = Any(None)
+
+    #: cache key -> future of the verification in progress.
+    _inflight = Dict()
+
     def __init__(self, *args, **kwargs):
         """Initializes the hub connection object."""
         super().__init__(*args, **kwargs)
@@ -36,7 +59,8 @@ class Hub(LoggingMixin, HasTraits):
     @gen.coroutine
     def verify_token(self, cookie_name, encrypted_cookie):
         """Verify the authentication token and grants access to the user
-        if verified.
+        if verified. If cache_size is positive, the outcome is remembered
+        for cache_ttl seconds, or negative_cache_ttl if rejected.
 
         Parameters
         ----------
@@ -53,19 +77,67 @@ class Hub(LoggingMixin, HasTraits):
             cookie.  Otherwise the dictionary is empty.
         """
 
+        key = self._cache_key(cookie_name, encrypted_cookie)
+        if self._cache is not None:
+            user_data = self._cache.get(key)
+            if user_data is not None:
+                return dict(user_data)
+
+        # Concurrent requests with the same cookie share the same query.
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._verify_token(cookie_name, encrypted_cookie, key)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None))
+
+        user_data = yield future
+        return dict(user_data)
+
+    def invalidate_token(self, cookie_name, encrypted_cookie):
+        """Forgets the verification of a cookie, e.g. at logout, so that
+        the next verification queries the hub."""
+        if self._cache is not None:
+            self._cache.pop(self._cache_key(cookie_name, encrypted_cookie))
+
+    # Private
+
+    @gen.coroutine
+    def _verify_token(self, cookie_name, encrypted_cookie, key):
+        """Queries the hub, and caches the outcome."""
         # URL for the authorization request
         request_url = url_path_join(self.endpoint_url,
                                     "authorizations/cookie",
                                     cookie_name,
                                     quote(encrypted_cookie, safe=''))
 
-        client = AsyncHTTPClient()
-        r = yield client.fetch(
+        r = yield self.http_client.fetch(
                 request_url,
+                service="hub",
                 headers={'Authorization': 'token %s' % self.api_token},
                 raise_error=False)
 
         if r.code < 400:
-            return escape.json_decode(r.body)
-        else:
-            return {}
+            user_data = escape.json_decode(r.body)
+            if self._cache is not None:
+                self._cache.set(key, user_data)
+            return user_data
+
+        if r.code < 500 and self._cache is not None:
+            # The hub rejected the cookie. Server errors are not cached,
+            # as they are likely transient.
+            self._cache.set(key, {}, ttl=self.negative_cache_ttl)
+
+        return {}
+
+    def _cache_key(self, cookie_name, encrypted_cookie):
+        """Returns the cache key of a cookie. The cookie is hashed so that
+        it is not kept in memory."""
+        return hashlib.sha256(
+            "{}\0{}".format(cookie_name, encrypted_cookie).encode("utf-8")
+        ).hexdigest()
+
+    @default("_cache")
+    def _cache_default(self):
+        if self.cache_size <= 0:
+            return None
+        return TTLCache(self.cache_size, self.cache_ttl)
@@ -1,10 +1,13 @@
-from urllib import parse
+import json
+import re
+from datetime import datetime
 
-from tornado import gen, httpclient
-from jupyterhub import orm as jupyterhub_orm
-from traitlets import HasTraits, Unicode, Instance
+from tornado import gen, httpclient, escape
+from traitlets import HasTraits, Unicode, Instance, Int, Float
 
+from remoteappmanager.http_client import HTTPClient
 from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.utils import url_path_join
 
 
 class ReverseProxy(LoggingMixin, HasTraits):
@@ -16,8 +19,16 @@ class ReverseProxy(LoggingMixin, HasTraits):
     #: The authorization API token to authenticate the request
     api_token = Unicode()
 
-    #: Internal instance of the reverse proxy API
-    _reverse_proxy = Instance(jupyterhub_orm.Proxy)
+    #: The client performing the requests to the proxy API.
+    http_client = Instance(HTTPClient, args=())
+
+    #: The number of times a request is retried after a connection
+    #: failure or a server error.
+    retries = Int(2)
+
+    #: The delay (seconds) before the first retry. It doubles at each
+    #: following retry.
+    retry_delay = Float(0.5)
 
     def __init__(self, *args, **kwargs):
         """Initializes the reverse proxy connection object."""
@@ -35,13 +46,6 @@ class ReverseProxy(LoggingMixin, HasTraits):
             self.log.error(message)
             raise ValueError(message)
 
-        # Note, we use jupyterhub orm Proxy, but not for database access,
-        # just for interface convenience.
-        self._reverse_proxy = jupyterhub_orm.Proxy(
-            auth_token=self.api_token,
-            api_server=_server_from_url(self.endpoint_url)
-        )
-
         self.log.info("Reverse proxy setup on {}".format(
             self.endpoint_url,
         ))
@@ -63,7 +67,7 @@ class ReverseProxy(LoggingMixin, HasTraits):
             urlpath,
             target_host_url))
 
-        yield self._reverse_proxy.api_request(
+        yield self._api_request(
             urlpath,
             method='POST',
             body=dict(
@@ -85,7 +89,7 @@ class ReverseProxy(LoggingMixin, HasTraits):
         self.log.info("Deregistering {} redirection".format(urlpath))
 
         try:
-            yield self._reverse_proxy.api_request(urlpath, method='DELETE')
+            yield self._api_request(urlpath, method='DELETE')
         except httpclient.HTTPError as e:
             if e.code == 404:
                 self.log.warning("Could not find urlpath {} when removing"
@@ -95,13 +99,142 @@ class ReverseProxy(LoggingMixin, HasTraits):
             else:
                 raise e
 
+    @gen.coroutine
+    def last_activity(self):
+        """Retrieves the time of the last activity of the registered
+        urlpaths.
+
+        Return
+        ------
+        A dictionary urlpath -> datetime (UTC) of the last activity.
+        The urlpaths have no end slash. Routes without activity
+        information are not included.
+        """
+        routes = yield self.get_routes()
+
+        result = {}
+        for urlpath, route in routes.items():
+            timestamp = route.get("last_activity")
+            if not timestamp:
+                continue
+
+            try:
+                activity = _parse_timestamp(timestamp)
+            except ValueError:
+                self.log.warning("Invalid last activity {} for route "
+                                 "{}".format(timestamp, urlpath))
+                continue
+
+            result[urlpath.rstrip("/")] = activity
+
+        return result
+
+    @gen.coroutine
+    def get_routes(self):
+        """Retrieves all the routes of the proxy in a single request.
+
+        Return
+        ------
+        A dictionary urlpath -> route, where route is a dictionary with
+        at least the target of the route.
+        """
+        response = yield self._api_request("")
+        return escape.json_decode(response.body)
+
+    @gen.coroutine
+    def sync(self, routes, managed):
+        """Makes the routes of the proxy managed by the caller match
+        the given ones, registering the missing ones and unregistering
+        the others. The other routes, such as the ones of the hub, are
+        left untouched.
+
+        Parameters
+        ----------
+        routes: dict
+            urlpath -> target host url of the expected routes.
+        managed: str
+            A regular expression matching the whole urlpaths (without
+            end slash) of the routes managed by the caller.
+
+        Return
+        ------
+        A tuple (registered, unregistered) with the lists of urlpaths
+        that have been registered and unregistered.
+        """
+        managed = re.compile(managed)
+        current = yield self.get_routes()
+        current = {_normalize(urlpath): route.get("target")
+                   for urlpath, route in current.items()}
+        expected = {_normalize(urlpath): target
+                    for urlpath, target in routes.items()}
+
+        to_register = sorted(
+            urlpath for urlpath, target in expected.items()
+            if current.get(urlpath) != target)
+        to_unregister = sorted(
+            urlpath for urlpath in current
+            if urlpath not in expected and managed.fullmatch(urlpath))
+
+        yield [self.register(urlpath, expected[urlpath])
+               for urlpath in to_register]
+        yield [self.unregister(urlpath) for urlpath in to_unregister]
+
+        return to_register, to_unregister
+
+    # Private
+
+    @gen.coroutine
+    def _api_request(self, path, method="GET", body=None):
+        """Performs an authenticated request to the proxy API, retrying
+        after connection failures and server errors.
+
+        Raises
+        ------
+        tornado.httpclient.HTTPError
+            If the request fails.
+        """
+        url = url_path_join(self.endpoint_url, path)
+        if body is not None:
+            body = json.dumps(body)
+
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                response = yield self.http_client.fetch(
+                    url,
+                    service="proxy",
+                    method=method,
+                    headers={
+                        "Authorization": "token {}".format(self.api_token)},
+                    body=body)
+            except (httpclient.HTTPError, OSError) as e:
+                code = getattr(e, "code", 599)
+                if code < 500 or attempt == self.retries:
+                    raise
+
+                self.log.warning("Proxy request {} {} failed: {}. "
+                                 "Retrying in {} seconds".format(
+                                     method, url, e, delay))
+                yield gen.sleep(delay)
+                delay *= 2
+            else:
+                return response
+
+
+def _normalize(urlpath):
+    """Returns the urlpath as reported by the proxy, without the end
+    slash."""
+    return urlpath.rstrip("/") or "/"
+
+
+def _parse_timestamp(timestamp):
+    """Parses the ISO 8601 UTC timestamps of the proxy, e.g.
+    2016-09-01T12:00:00.000Z, into a naive datetime."""
+    timestamp = timestamp.rstrip("Z")
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(timestamp, fmt)
+        except ValueError:
+            pass
 
-def _server_from_url(url):
-    """Creates a orm.Server from a given url"""
-    parsed = parse.urlparse(url)
-    return jupyterhub_orm.Server(
-        proto=parsed.scheme,
-        ip=parsed.hostname,
-        port=parsed.port,
-        base_url=parsed.path
-    )
+    raise ValueError("Invalid timestamp {}".format(timestamp))
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from tornado import testing, web, gen
 
 from remoteappmanager.services.hub import Hub
@@ -60,3 +62,53 @@ class TestHub(utils.AsyncHTTPTestCase, testing.LogTrapTestCase):
         res = yield hub.verify_token("foo", "bar")
         self.assertNotEqual(res, {})
         self.assertEqual(res["name"], "username")
+
+    @testing.gen_test
+    def test_cache(self):
+        endpoint_url = self.get_url("/hub")
+        hub = Hub(endpoint_url=endpoint_url, api_token="whatever",
+                  cache_size=10)
+
+        with mock.patch.object(hub, "_verify_token",
+                               wraps=hub._verify_token) as verify:
+            self.handler.ret_status = 200
+            res = yield hub.verify_token("foo", "bar")
+            self.assertEqual(res["name"], "username")
+
+            # Modifying the result does not alter the cache.
+            res["name"] = "other"
+            res = yield hub.verify_token("foo", "bar")
+            self.assertEqual(res["name"], "username")
+            self.assertEqual(verify.call_count, 1)
+
+            # Concurrent verifications share the same query.
+            results = yield [hub.verify_token("foo", "baz"),
+                             hub.verify_token("foo", "baz")]
+            self.assertEqual(results[0], results[1])
+            self.assertEqual(verify.call_count, 2)
+
+            # Logout.
+            hub.invalidate_token("foo", "bar")
+            self.handler.ret_status = 403
+            res = yield hub.verify_token("foo", "bar")
+            self.assertEqual(res, {})
+            self.assertEqual(verify.call_count, 3)
+
+            # The rejection is cached too.
+            self.handler.ret_status = 200
+            res = yield hub.verify_token("foo", "bar")
+            self.assertEqual(res, {})
+            self.assertEqual(verify.call_count, 3)
+
+    @testing.gen_test
+    def test_server_errors_not_cached(self):
+        endpoint_url = self.get_url("/hub")
+        hub = Hub(endpoint_url=endpoint_url, api_token="whatever",
+                  cache_size=10)
+
+        self.handler.ret_status = 502
+        self.assertEqual((yield hub.verify_token("foo", "bar")), {})
+
+        self.handler.ret_status = 200
+        res = yield hub.verify_token("foo", "bar")
+        self.assertEqual(res["name"], "username")
@@ -1,35 +1,151 @@
-from unittest.mock import Mock
+import json
+from datetime import datetime
 
-from jupyterhub import orm
 from remoteappmanager.services.reverse_proxy import ReverseProxy
-from tornado import gen, testing
+from remoteappmanager.tests import utils
+from tornado import testing, web, httpclient
 
 
-class TestReverseProxy(testing.AsyncTestCase, testing.LogTrapTestCase):
-    @testing.gen_test
-    def test_reverse_proxy_operations(self):
-        coroutine_out = None
+class RoutesHandler(web.RequestHandler):
+    """Mimics the REST API of configurable-http-proxy."""
+    #: urlpath -> route
+    routes = {}
+
+    #: Number of server errors to return before succeeding.
+    failures = 0
+
+    def prepare(self):
+        if self.request.headers.get("Authorization") != "token token":
+            raise web.HTTPError(403)
+
+        if type(self).failures:
+            type(self).failures -= 1
+            raise web.HTTPError(503)
+
+    def get(self, path):
+        self.write(self.routes)
+
+    def post(self, path):
+        body = json.loads(self.request.body.decode("utf-8"))
+        self.routes["/" + path.rstrip("/")] = {"target": body["target"]}
+        self.set_status(201)
 
-        @gen.coroutine
-        def mock_api_request(self, *args, **kwargs):
-            nonlocal coroutine_out
-            yield gen.sleep(0.1)
-            coroutine_out = dict(args=args, kwargs=kwargs)
+    def delete(self, path):
+        if self.routes.pop("/" + path.rstrip("/"), None) is None:
+            raise web.HTTPError(404)
+        self.set_status(204)
 
-        reverse_proxy = ReverseProxy(
-            endpoint_url="http://fake/api",
-            api_token="token")
-        reverse_proxy._reverse_proxy = Mock(spec=orm.Proxy)
-        reverse_proxy._reverse_proxy.api_request = mock_api_request
+
+class TestReverseProxy(utils.AsyncHTTPTestCase, testing.LogTrapTestCase):
+    def get_app(self):
+        RoutesHandler.routes = {
+            "/": {"target": "http://127.0.0.1:8081"},
+        }
+        RoutesHandler.failures = 0
+        return web.Application([("/api/routes/?(.*)", RoutesHandler)])
+
+    def _reverse_proxy(self, api_token="token"):
+        return ReverseProxy(
+            endpoint_url=self.get_url("/api/routes"),
+            api_token=api_token,
+            retry_delay=0.01)
+
+    @testing.gen_test
+    def test_reverse_proxy_operations(self):
+        reverse_proxy = self._reverse_proxy()
 
         yield reverse_proxy.register("/hello/from/me/",
                                      "http://localhost:12312/")
+        self.assertEqual(RoutesHandler.routes["/hello/from/me"],
+                         {"target": "http://localhost:12312/"})
+
+        routes = yield reverse_proxy.get_routes()
+        self.assertEqual(set(routes), {"/", "/hello/from/me"})
 
-        self.assertEqual(coroutine_out["kwargs"]["method"], "POST")
+        yield reverse_proxy.unregister("/hello/from/me/")
+        self.assertNotIn("/hello/from/me", RoutesHandler.routes)
 
+        # Not found is not an error.
         yield reverse_proxy.unregister("/hello/from/me/")
 
-        self.assertEqual(coroutine_out["kwargs"]["method"], "DELETE")
+    @testing.gen_test
+    def test_authentication_failure(self):
+        reverse_proxy = self._reverse_proxy(api_token="wrong")
+        with self.assertRaises(httpclient.HTTPError):
+            yield reverse_proxy.register("/hello/", "http://localhost:1/")
+
+    @testing.gen_test
+    def test_retries(self):
+        reverse_proxy = self._reverse_proxy()
+
+        RoutesHandler.failures = 2
+        yield reverse_proxy.register("/hello/", "http://localhost:1/")
+        self.assertIn("/hello", RoutesHandler.routes)
+
+        RoutesHandler.failures = 3
+        with self.assertRaises(httpclient.HTTPError):
+            yield reverse_proxy.unregister("/hello/")
+
+    @testing.gen_test
+    def test_sync(self):
+        RoutesHandler.routes.update({
+            "/user/foo/containers/1": {"target": "http://127.0.0.1:1"},
+            "/user/foo/containers/2": {"target": "http://127.0.0.1:2"},
+            "/user/foo/containers/3": {"target": "http://127.0.0.1:3"},
+            "/user/bar/containers/4": {"target": "http://127.0.0.1:4"},
+        })
+        reverse_proxy = self._reverse_proxy()
+
+        registered, unregistered = yield reverse_proxy.sync({
+            "/user/foo/containers/1/": "http://127.0.0.1:1",
+            "/user/foo/containers/3/": "http://127.0.0.1:33",
+            "/user/foo/containers/5/": "http://127.0.0.1:5",
+        }, "/user/foo/containers/[^/]+")
+
+        self.assertEqual(registered, ["/user/foo/containers/3",
+                                      "/user/foo/containers/5"])
+        self.assertEqual(unregistered, ["/user/foo/containers/2"])
+        self.assertEqual(RoutesHandler.routes, {
+            "/": {"target": "http://127.0.0.1:8081"},
+            "/user/foo/containers/1": {"target": "http://127.0.0.1:1"},
+            "/user/foo/containers/3": {"target": "http://127.0.0.1:33"},
+            "/user/foo/containers/5": {"target": "http://127.0.0.1:5"},
+            "/user/bar/containers/4": {"target": "http://127.0.0.1:4"},
+        })
+
+        # Only the managed routes are removed.
+        registered, unregistered = yield reverse_proxy.sync(
+            {}, "/user/[^/]+/containers/[^/]+")
+        self.assertEqual(registered, [])
+        self.assertEqual(unregistered, ["/user/bar/containers/4",
+                                        "/user/foo/containers/1",
+                                        "/user/foo/containers/3",
+                                        "/user/foo/containers/5"])
+        self.assertEqual(RoutesHandler.routes, {
+            "/": {"target": "http://127.0.0.1:8081"},
+        })
+
+    @testing.gen_test
+    def test_last_activity(self):
+        RoutesHandler.routes.update({
+            "/user/foo/containers/1/": {
+                "target": "http://127.0.0.1:32768",
+                "last_activity": "2016-09-01T12:00:00.500Z"},
+            "/user/foo/containers/2": {
+                "target": "http://127.0.0.1:32769",
+                "last_activity": "2016-09-01T12:00:00Z"},
+            "/user/foo/containers/3": {
+                "target": "http://127.0.0.1:32770",
+                "last_activity": "yesterday"},
+        })
+
+        reverse_proxy = self._reverse_proxy()
+
+        activity = yield reverse_proxy.last_activity()
+        self.assertEqual(activity, {
+            "/user/foo/containers/1": datetime(2016, 9, 1, 12, 0, 0, 500000),
+            "/user/foo/containers/2": datetime(2016, 9, 1, 12, 0, 0),
+        })
 
     def test_incorrect_init(self):
         with self.assertRaises(ValueError):
@@ -1,6 +1,8 @@
 import json
 import logging
 import hashlib
+import queue
+import time
 import uuid
 import requests
 from collections import namedtuple
@@ -40,6 +42,16 @@ class VirtualDockerClient(object):
         # This one contains the containers that are currently present
         self._containers = []
 
+        # The memory of the simulated host, reported by info
+        self.mem_total = 2 * 1024**3
+
+        # The queues of the active event streams.
+        self._event_queues = []
+
+        # container id -> health status, for the containers with a
+        # health check.
+        self._health = {}
+
     @classmethod
     def with_containers(cls):
         """
@@ -142,6 +154,32 @@ class VirtualDockerClient(object):
                  }
                 for image in self._images]
 
+    def pull(self, repository, tag=None, stream=False, decode=False,
+             **kwargs):
+        """Installs an image from the available ones. Only stream=True
+        and decode=True are supported."""
+        name = repository if tag is None else "{}:{}".format(repository, tag)
+        available = {image.name: image for image in self._available_images}
+
+        def generator():
+            yield {"status": "Pulling from {}".format(repository),
+                   "id": tag or "latest"}
+            image = available.get(name)
+            if image is None:
+                yield {"errorDetail": {"message": "not found"},
+                       "error": "image {} not found".format(name)}
+                return
+
+            yield {"status": "Downloading", "id": image.id[7:19],
+                   "progressDetail": {"current": 50, "total": 100},
+                   "progress": "[=====>     ]"}
+            if image not in self._images:
+                self._images.append(image)
+            yield {"status": "Status: Downloaded newer image for {}".format(
+                name)}
+
+        return generator()
+
     def create_container(self, *args, **kwargs):
         id = self._new_id()
         image = self._find_image(kwargs["image"])
@@ -158,7 +196,7 @@ class VirtualDockerClient(object):
                     "PrivatePort": 8888,
                     "Type": "tcp",
                 }],
-                state="running",
+                state="created",
             )
         )
 
@@ -175,6 +213,14 @@ class VirtualDockerClient(object):
             all_labels = image.labels.copy()
             all_labels.update(container.labels)
 
+            if ('filters' in kwargs and 'id' in kwargs['filters'] and
+                    container.id not in kwargs['filters']['id']):
+                continue
+
+            if ('filters' in kwargs and 'status' in kwargs['filters'] and
+                    container.state not in kwargs['filters']['status']):
+                continue
+
             # Apply filters for labels
             if 'filters' in kwargs and 'label' in kwargs['filters']:
                 label_filters = kwargs['filters']['label']
@@ -182,10 +228,11 @@ class VirtualDockerClient(object):
                 if not isinstance(label_filters, (list, tuple)):
                     label_filters = [label_filters]
 
-                label_filters = (label.split('=') for label in label_filters)
+                label_filters = (label.partition('=')
+                                 for label in label_filters)
                 if any(label_name not in all_labels or
-                       all_labels[label_name] != label_value
-                       for label_name, label_value in label_filters):
+                       (sep and all_labels[label_name] != label_value)
+                       for label_name, sep, label_value in label_filters):
                     continue
 
             results.append(
@@ -224,7 +271,12 @@ class VirtualDockerClient(object):
                     {'HostIp': str(host_ip),
                      'HostPort': str(host_port)}]
 
-        return {'State': container.state,
+        state = {'Status': container.state,
+                 'Running': container.state == 'running'}
+        if container.id in self._health:
+            state['Health'] = {'Status': self._health[container.id]}
+
+        return {'State': state,
                 'Name': '/'+container.name,
                 'Image': image.id,
                 'Config': {
@@ -249,13 +301,44 @@ class VirtualDockerClient(object):
 
     def start(self, *args, **kwargs):
         log.info("VirtualDockerClient.start called with ", args, kwargs)
+        self._set_container_state(args[0], "running")
+        self.emit_event("start", args[0])
 
     def stop(self, *args, **kwargs):
         log.info("VirtualDockerClient.stop called with ", args, kwargs)
+        self._set_container_state(args[0], "exited")
+        self.emit_event("die", args[0])
 
     def remove_container(self, container, *args, **kwargs):
         container = self._find_container(container)
         self._containers.remove(container)
+        self.emit_event("destroy", container.id)
+
+    def rename(self, container, name):
+        container = self._find_container(container)
+        index = self._containers.index(container)
+        self._containers[index] = container._replace(name=name)
+        self.emit_event("rename", container.id)
+
+    def events(self, since=None, until=None, filters=None, decode=None):
+        """Returns a blocking generator of the events emitted from now
+        on. The generator ends when close_events is called."""
+        actions = (filters or {}).get("event")
+        events = queue.Queue()
+        self._event_queues.append(events)
+
+        def generator():
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                # As in docker, "health_status: healthy" matches
+                # the "health_status" filter.
+                if (actions is None or
+                        event["Action"].partition(":")[0] in actions):
+                    yield event
+
+        return generator()
 
     def info(self, *args, **kwargs):
         return {
@@ -267,6 +350,7 @@ class VirtualDockerClient(object):
                                       if x.state == "running"]),
             'ContainersStopped': len([x for x in self._containers
                                       if x.state == "stopped"]),
+            'MemTotal': self.mem_total,
 
         }
 
@@ -281,6 +365,40 @@ class VirtualDockerClient(object):
             _Container(id, name, image, labels, ports, state)
         )
 
+    def emit_event(self, action, object_id, type="container"):
+        """Delivers an event to the event streams."""
+        event = {
+            "status": action,
+            "id": object_id,
+            "Type": type,
+            "Action": action,
+            "Actor": {"ID": object_id, "Attributes": {}},
+            "time": int(time.time())
+        }
+        for events in self._event_queues:
+            events.put(event)
+
+    def set_container_health(self, container_id, status):
+        """Sets the health status of a container, as if it had
+        a health check, and emits the corresponding event."""
+        container = self._find_container(container_id)
+        self._health[container.id] = status
+        self.emit_event("health_status: " + status, container.id)
+
+    def close(self):
+        pass
+
+    def close_events(self):
+        """Terminates the event streams."""
+        event_queues, self._event_queues = self._event_queues, []
+        for events in event_queues:
+            events.put(None)
+
+    def _set_container_state(self, container_name_or_id, state):
+        container = self._find_container(container_name_or_id)
+        index = self._containers.index(container)
+        self._containers[index] = container._replace(state=state)
+
     def _find_image(self, image_name_or_id):
         image_ids = {image.id: image for image in self._images}
         image_names = {image.name: image for image in self._images}
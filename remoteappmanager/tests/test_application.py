@@ -93,11 +93,23 @@ class TestApplication(TempMixin,
         self.assertEqual(app.user.name, "johndoe")
         self.assertIsInstance(app.user.account, test_csv_db.CSVUser)
 
+    def test_no_idle_culler_or_route_reconciler(self):
+        # The admin application takes care of the containers of all users.
+        self.file_config.idle_timeout = 60.0
+        self.file_config.route_reconcile_interval = 60.0
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+
+        self.assertFalse(hasattr(app, "idle_culler"))
+        self.assertFalse(hasattr(app, "route_reconciler"))
+
     def test_start(self):
         with patch(
                 "remoteappmanager.application.Application.listen"
         ) as listen, \
-             patch("tornado.ioloop.IOLoop.current") as current:
+             patch("tornado.ioloop.IOLoop.current") as current, \
+             patch("signal.signal") as set_signal:
 
             current_io = mock.Mock()
             current.return_value = current_io
@@ -110,3 +122,17 @@ class TestApplication(TempMixin,
 
             self.assertTrue(listen.called)
             self.assertTrue(current_io.start.called)
+            self.assertEqual(set_signal.call_count, 2)
+
+    @testing.gen_test
+    def test_stop_drains_warm_pool(self):
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+        app.container_manager.drain_warm_pool = utils.mock_coro_factory()
+
+        with patch.object(self.io_loop, "stop") as stop:
+            yield app.stop()
+
+        self.assertTrue(app.container_manager.drain_warm_pool.called)
+        self.assertTrue(stop.called)
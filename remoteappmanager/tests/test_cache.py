@@ -0,0 +1,62 @@
+import unittest
+
+from remoteappmanager.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = TTLCache(3, 10, timer=self.timer)
+
+    def test_get_set(self):
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("b", 2), 2)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+
+    def test_expiration(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2, ttl=20)
+
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+        self.assertEqual(len(self.cache), 1)
+
+        self.timer.now = 20
+        self.assertEqual(self.cache.items(), [])
+
+    def test_lru_eviction(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.set("c", 3)
+
+        # Touching "a" makes "b" the least recently used.
+        self.cache.get("a")
+        self.cache.set("d", 4)
+
+        self.assertEqual(sorted(k for k, _ in self.cache.items()),
+                         ["a", "c", "d"])
+
+    def test_pop_and_clear(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.assertEqual(self.cache.pop("a"), 1)
+        self.assertIsNone(self.cache.pop("a"))
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            TTLCache(0, 10)
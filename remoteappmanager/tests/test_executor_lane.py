@@ -0,0 +1,36 @@
+import threading
+import unittest
+
+from remoteappmanager.executor_lane import ExecutorLane
+
+
+class TestExecutorLane(unittest.TestCase):
+    def test_queue_depth_and_wait(self):
+        lane = ExecutorLane("test", 1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_job():
+            started.set()
+            return release.wait(5)
+
+        first = lane.submit(blocking_job)
+        second = lane.submit(lambda: 42)
+
+        # The first job has left the queue, the second one is waiting.
+        self.assertTrue(started.wait(5))
+        self.assertEqual(lane.stats()["queue_depth"], 1)
+
+        release.set()
+        self.assertTrue(first.result(5))
+        self.assertEqual(second.result(5), 42)
+
+        stats = lane.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["num_started"], 2)
+        self.assertGreater(stats["max_wait"], 0.0)
+        self.assertGreaterEqual(stats["max_wait"], stats["mean_wait"])
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            ExecutorLane("test", 0)
@@ -170,6 +170,42 @@ class TestFileConfig(TempMixin, unittest.TestCase):
 
         self.assertEqual(config.ga_tracking_id, 'UA-12345-6')
 
+    def test_docker_hosts(self):
+        config = FileConfig()
+        self.assertEqual(config.docker_configs(), [config.docker_config()])
+
+        docker_hosts = textwrap.dedent('''
+        tls = False
+        tls_cert = '{}'
+        tls_key = '{}'
+        docker_hosts = [
+            {{"docker_host": "tcp://192.168.99.100:2375"}},
+            {{"docker_host": "tcp://192.168.99.101:2376",
+              "tls": True,
+              "tls_verify": False}},
+        ]
+        '''.format(
+            os.path.join(self.tempdir, "cert.pem"),
+            os.path.join(self.tempdir, "key.pem")))
+
+        with open(self.config_file, 'w') as fhandle:
+            print(docker_hosts, file=fhandle)
+
+        config = FileConfig()
+        config.parse_config(self.config_file)
+        docker_configs = config.docker_configs()
+
+        self.assertEqual(len(docker_configs), 2)
+        self.assertEqual(docker_configs[0]["base_url"],
+                         "tcp://192.168.99.100:2375")
+        self.assertNotIn("tls", docker_configs[0])
+        self.assertEqual(docker_configs[1]["base_url"],
+                         "https://192.168.99.101:2376")
+        self.assertEqual(docker_configs[1]["tls"].verify, False)
+        self.assertEqual(docker_configs[1]["tls"].cert,
+                         (os.path.join(self.tempdir, "cert.pem"),
+                          os.path.join(self.tempdir, "key.pem")))
+
     def test_file_parsing_not_overriding_bug_131(self):
         docker_config = textwrap.dedent('''
             tls = True
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from tornado import web
+from tornado.httpclient import AsyncHTTPClient, HTTPError
+from tornado.testing import AsyncHTTPTestCase, gen_test, LogTrapTestCase
+
+from remoteappmanager.http_client import HTTPClient, configure_http_client
+from remoteappmanager.metrics import MetricsRegistry
+from remoteappmanager.tests.utils import mock_coro_new_callable
+
+
+class OkHandler(web.RequestHandler):
+    def get(self):
+        self.write("hello")
+
+
+class TestHTTPClient(AsyncHTTPTestCase, LogTrapTestCase):
+    def get_app(self):
+        return web.Application(handlers=[('/ok', OkHandler)])
+
+    @gen_test
+    def test_fetch(self):
+        registry = MetricsRegistry()
+        client = HTTPClient(metrics=registry)
+
+        response = yield client.fetch(self.get_url("/ok"), service="test")
+        self.assertEqual(response.body, b"hello")
+
+        response = yield client.fetch(self.get_url("/missing"),
+                                      service="test",
+                                      raise_error=False)
+        self.assertEqual(response.code, 404)
+
+        with self.assertRaises(HTTPError):
+            yield client.fetch(self.get_url("/missing"), service="test")
+
+        self.assertEqual(
+            registry.gauge("http_client_requests_in_flight",
+                           service="test").value(), 0)
+        self.assertEqual(
+            registry.histogram("http_client_request_seconds",
+                               service="test").snapshot()["count"], 3)
+
+    @gen_test
+    def test_default_timeouts(self):
+        client = HTTPClient(connect_timeout=1.0, request_timeout=2.0)
+
+        with mock.patch("remoteappmanager.http_client.AsyncHTTPClient.fetch",
+                        new_callable=mock_coro_new_callable()) as fetch:
+            yield client.fetch("http://example.com/", request_timeout=3.0)
+
+        _, kwargs = fetch.call_args
+        self.assertEqual(kwargs["connect_timeout"], 1.0)
+        self.assertEqual(kwargs["request_timeout"], 3.0)
+
+
+class TestConfigure(unittest.TestCase):
+    def setUp(self):
+        saved = AsyncHTTPClient._save_configuration()
+        self.addCleanup(AsyncHTTPClient._restore_configuration, saved)
+
+    def test_configure(self):
+        self.assertEqual(configure_http_client(5, use_curl=False), "simple")
+        self.assertEqual(AsyncHTTPClient._save_configuration()[1],
+                         {"max_clients": 5})
+
+        try:
+            import pycurl  # noqa
+        except ImportError:
+            expected = "simple"
+        else:
+            expected = "curl"
+
+        self.assertEqual(configure_http_client(5), expected)
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test, LogTrapTestCase
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.idle_culler import IdleCuller
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+from remoteappmanager.tests.utils import mock_coro_factory
+
+
+NOW = datetime(2016, 9, 1, 12, 0, 0)
+
+
+class TestIdleCuller(AsyncTestCase, LogTrapTestCase):
+    def setUp(self):
+        super().setUp()
+        self.containers = [
+            Container(docker_id="a", urlpath="/user/a/containers/1",
+                      image_name="simphony/mayavi", user="a"),
+            Container(docker_id="b", urlpath="/user/b/containers/2",
+                      image_name="simphony/paraview", user="b"),
+            Container(docker_id="c", urlpath="/user/c/containers/3",
+                      image_name="simphony/mayavi", user="c"),
+        ]
+
+        self.container_manager = mock.Mock(spec=ContainerManager)
+        self.container_manager.find_containers = mock_coro_factory(
+            self.containers)
+        self.container_manager.stop_and_remove_container = \
+            mock_coro_factory()
+
+        self.reverse_proxy = mock.Mock(spec=ReverseProxy)
+        self.reverse_proxy.last_activity = mock_coro_factory({
+            "/user/a/containers/1": NOW - timedelta(seconds=120),
+            "/user/b/containers/2": NOW - timedelta(seconds=120),
+            "/user/c/containers/3": NOW - timedelta(seconds=10),
+        })
+        self.reverse_proxy.unregister = mock_coro_factory()
+
+        self.culler = IdleCuller(
+            container_manager=self.container_manager,
+            reverse_proxy=self.reverse_proxy,
+            default_timeout=60,
+            timeouts={"simphony/paraview": 300})
+        self.culler._now = lambda: NOW
+
+    @gen_test
+    def test_cull(self):
+        culled = yield self.culler.cull()
+
+        self.assertEqual([c.docker_id for c in culled], ["a"])
+        self.assertEqual(
+            self.container_manager.stop_and_remove_container.call_args,
+            (("a",), {}))
+        self.assertEqual(self.reverse_proxy.unregister.call_args,
+                         (("/user/a/containers/1",), {}))
+        self.assertEqual(self.container_manager.find_containers.call_args,
+                         ((), {"user_name": None}))
+
+    @gen_test
+    def test_disabled(self):
+        self.culler.default_timeout = 0
+        culled = yield self.culler.cull()
+        self.assertEqual(culled, [])
+        self.assertFalse(
+            self.container_manager.stop_and_remove_container.called)
+
+    @gen_test
+    def test_unrouted_container(self):
+        self.reverse_proxy.last_activity = mock_coro_factory({})
+
+        culled = yield self.culler.cull()
+        self.assertEqual(culled, [])
+
+        self.culler._now = lambda: NOW + timedelta(seconds=61)
+        culled = yield self.culler.cull()
+        self.assertEqual([c.docker_id for c in culled], ["a", "c"])
+
+    @gen_test
+    def test_proxy_failure(self):
+        self.reverse_proxy.last_activity = mock_coro_factory(
+            side_effect=Exception("boom"))
+        culled = yield self.culler.cull()
+        self.assertEqual(culled, [])
+        self.assertFalse(
+            self.container_manager.stop_and_remove_container.called)
+
+    @gen_test
+    def test_stop_failure(self):
+        self.container_manager.stop_and_remove_container = \
+            mock_coro_factory(side_effect=Exception("boom"))
+        culled = yield self.culler.cull()
+        self.assertEqual(culled, [])
+
+    def test_start_stop(self):
+        self.culler.start()
+        self.assertIsNotNone(self.culler._periodic_callback)
+        self.culler.stop()
+        self.assertIsNone(self.culler._periodic_callback)
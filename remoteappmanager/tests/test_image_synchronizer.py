@@ -0,0 +1,114 @@
+from unittest import mock
+
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test, LogTrapTestCase
+
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.db.interfaces import ABCApplication, ABCDatabase
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.image_synchronizer import (
+    ImageSynchronizer, PRESENT, FAILED)
+from remoteappmanager.tests.mocking.virtual.docker_client import (
+    VirtualDockerClient)
+
+
+class Application(ABCApplication):
+    pass
+
+
+class TestImageSynchronizer(AsyncTestCase, LogTrapTestCase):
+    def setUp(self):
+        super().setUp()
+        # No image is installed on the docker host.
+        self.docker_client = VirtualDockerClient()
+        self.container_manager = ContainerManager(docker_config={})
+        self.container_manager._docker_client._sync_client = \
+            self.docker_client
+
+        self.db = mock.Mock(spec=ABCDatabase)
+        self.db.list_applications.return_value = [
+            Application(0, "simphonyproject/simphony-mayavi:0.6.0"),
+            Application(1, "simphonyproject/ubuntu-image"),
+            Application(2, "simphonyproject/missing:1.0"),
+        ]
+
+        self.synchronizer = ImageSynchronizer(
+            container_manager=self.container_manager,
+            async_db=AsyncDatabase(self.db),
+            retry_delay=0.01)
+
+    @gen_test
+    def test_synchronize(self):
+        with mock.patch.object(self.docker_client, "pull",
+                               wraps=self.docker_client.pull) as pull:
+            yield self.synchronizer.synchronize()
+
+        self.assertEqual(self.synchronizer.status, {
+            "simphonyproject/simphony-mayavi:0.6.0": PRESENT,
+            "simphonyproject/ubuntu-image": PRESENT,
+            "simphonyproject/missing:1.0": FAILED,
+        })
+
+        # One pull each for the available images, three attempts for the
+        # missing one.
+        self.assertEqual(pull.call_count, 5)
+        self.assertIn(mock.call("simphonyproject/ubuntu-image",
+                                tag="latest", stream=True, decode=True),
+                      pull.call_args_list)
+
+        image = yield self.container_manager.image(
+            "simphonyproject/simphony-mayavi:0.6.0")
+        self.assertIsNotNone(image)
+
+        text = self.synchronizer.metrics.as_text()
+        self.assertIn('image_pull_seconds_count{image="simphonyproject/'
+                      'missing:1.0",outcome="failure"} 3', text)
+
+        # Nothing to pull the second time. The removed applications are
+        # forgotten.
+        self.db.list_applications.return_value = [
+            Application(0, "simphonyproject/simphony-mayavi:0.6.0")]
+        with mock.patch.object(self.docker_client, "pull") as pull:
+            yield self.synchronizer.synchronize()
+        self.assertFalse(pull.called)
+        self.assertEqual(self.synchronizer.status, {
+            "simphonyproject/simphony-mayavi:0.6.0": PRESENT})
+
+    @gen_test
+    def test_concurrent_requests(self):
+        with mock.patch.object(self.docker_client, "pull",
+                               wraps=self.docker_client.pull) as pull:
+            results = yield [
+                self.synchronizer.synchronize_image(
+                    "simphonyproject/simphony-mayavi:0.6.0")
+                for _ in range(3)]
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(pull.call_count, 1)
+
+    @gen_test
+    def test_bounded_concurrency(self):
+        self.synchronizer.concurrency = 1
+        self.synchronizer._slots = self.synchronizer._slots_default()
+
+        active = []
+        max_active = []
+
+        @gen.coroutine
+        def pull_image(image_name, progress_callback=None):
+            active.append(image_name)
+            max_active.append(len(active))
+            yield gen.sleep(0.01)
+            active.remove(image_name)
+
+        with mock.patch.object(self.container_manager, "pull_image",
+                               pull_image):
+            yield self.synchronizer.synchronize()
+
+        self.assertEqual(max(max_active), 1)
+
+    @gen_test
+    def test_database_failure(self):
+        self.db.list_applications.side_effect = Exception("boom")
+        yield self.synchronizer.synchronize()
+        self.assertEqual(self.synchronizer.status, {})
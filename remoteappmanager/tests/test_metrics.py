@@ -0,0 +1,111 @@
+import unittest
+
+from remoteappmanager.metrics import Histogram, MetricsRegistry, PhaseTimer
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram("foo", buckets=(1.0, 0.1))
+        self.assertEqual(histogram.buckets, (0.1, 1.0))
+
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 3.65)
+        self.assertEqual(snapshot["buckets"],
+                         [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_histogram(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("foo", "Foo help", phase="a")
+        self.assertIs(registry.histogram("foo", phase="a"), histogram)
+        self.assertIsNot(registry.histogram("foo", phase="b"), histogram)
+        self.assertEqual(len(registry.histograms()), 2)
+
+    def test_as_text(self):
+        registry = MetricsRegistry()
+        registry.histogram("foo", "Foo help", buckets=(1.0,),
+                           phase='a"b').observe(0.5)
+
+        self.assertEqual(
+            registry.as_text(),
+            '# HELP foo Foo help\n'
+            '# TYPE foo histogram\n'
+            'foo_bucket{le="1.0",phase="a\\"b"} 1\n'
+            'foo_bucket{le="+Inf",phase="a\\"b"} 1\n'
+            'foo_sum{phase="a\\"b"} 0.5\n'
+            'foo_count{phase="a\\"b"} 1\n')
+
+    def test_gauge(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("bar", "Bar help", service="hub")
+        self.assertIs(registry.gauge("bar", service="hub"), gauge)
+
+        gauge.inc()
+        gauge.inc(2)
+        gauge.dec()
+        self.assertEqual(gauge.value(), 2)
+
+        self.assertEqual(
+            registry.as_text(),
+            '# HELP bar Bar help\n'
+            '# TYPE bar gauge\n'
+            'bar{service="hub"} 2\n')
+
+    def test_empty(self):
+        self.assertEqual(MetricsRegistry().as_text(), "\n")
+
+
+class TestPhaseTimer(unittest.TestCase):
+    def test_phases(self):
+        timer = FakeTimer()
+        registry = MetricsRegistry()
+        phase_timer = PhaseTimer(registry, "start_seconds", timer=timer)
+
+        with phase_timer.phase("create"):
+            timer.now += 1.5
+
+        with self.assertRaises(ValueError):
+            with phase_timer.phase("start"):
+                timer.now += 0.25
+                raise ValueError()
+
+        self.assertEqual(phase_timer.phases,
+                         [("create", 1.5), ("start", 0.25)])
+        self.assertEqual(phase_timer.total(), 1.75)
+        self.assertEqual(phase_timer.summary(),
+                         "create=1.500s start=0.250s total=1.750s")
+
+        histogram = registry.histogram("start_seconds", phase="create")
+        self.assertEqual(histogram.snapshot()["count"], 1)
+
+    def test_no_registry(self):
+        phase_timer = PhaseTimer()
+        phase_timer.record("foo", 1.0)
+        self.assertEqual(phase_timer.summary(), "foo=1.000s total=1.000s")
+
+    def test_on_phase(self):
+        started = []
+        phase_timer = PhaseTimer(on_phase=started.append)
+
+        with phase_timer.phase("create"):
+            self.assertEqual(started, ["create"])
+
+        with phase_timer.phase("start"):
+            pass
+
+        self.assertEqual(started, ["create", "start"])
@@ -1,9 +1,13 @@
+import itertools
+import socket
+import unittest
 from unittest import mock
 from tornado import web
 from tornado.testing import AsyncHTTPTestCase, gen_test, LogTrapTestCase
 
 from remoteappmanager.tests.utils import mock_coro_new_callable
-from remoteappmanager.netutils import wait_for_http_server_2xx
+from remoteappmanager.netutils import (
+    wait_for_http_server_2xx, probe_delays, _tcp_connect)
 
 
 class ShortHandler(web.RequestHandler):
@@ -23,11 +27,16 @@ class LongHandler(ShortHandler):
     error_count = 100000
 
 
+class OkHandler(ShortHandler):
+    error_count = 0
+
+
 class TestUtils(AsyncHTTPTestCase, LogTrapTestCase):
     def get_app(self):
 
         app = web.Application(handlers=[('/short', ShortHandler),
-                                        ('/long', LongHandler)])
+                                        ('/long', LongHandler),
+                                        ('/ok', OkHandler)])
         return app
 
     @gen_test
@@ -39,16 +48,59 @@ class TestUtils(AsyncHTTPTestCase, LogTrapTestCase):
 
     @gen_test
     def test_failures(self):
-        with mock.patch("remoteappmanager.netutils.AsyncHTTPClient.fetch",
+        with mock.patch("remoteappmanager.http_client.AsyncHTTPClient.fetch",
                         new_callable=mock_coro_new_callable(
                             side_effect=OSError("boo"))), \
                 self.assertRaises(TimeoutError):
 
             yield wait_for_http_server_2xx(self.get_url("/short"), timeout=1)
 
-        with mock.patch("remoteappmanager.netutils.AsyncHTTPClient.fetch",
+        with mock.patch("remoteappmanager.http_client.AsyncHTTPClient.fetch",
                         new_callable=mock_coro_new_callable(
                             side_effect=Exception("boo"))), \
                 self.assertRaises(TimeoutError):
 
             yield wait_for_http_server_2xx(self.get_url("/short"), timeout=1)
+
+    @gen_test
+    def test_tcp_check(self):
+        yield wait_for_http_server_2xx(self.get_url("/ok"), timeout=2,
+                                       tcp_check=True)
+
+        # Nobody listens on a port we just released: the HTTP request
+        # must never be attempted.
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        with mock.patch("remoteappmanager.http_client.AsyncHTTPClient.fetch",
+                        new_callable=mock_coro_new_callable()) as fetch, \
+                self.assertRaises(TimeoutError):
+            yield wait_for_http_server_2xx(
+                "http://127.0.0.1:{}/".format(port),
+                timeout=0.5, tcp_check=True)
+
+        self.assertFalse(fetch.called)
+
+    @gen_test
+    def test_tcp_connect(self):
+        result = yield _tcp_connect(self.get_url("/ok"), 1)
+        self.assertTrue(result)
+
+
+class TestProbeDelays(unittest.TestCase):
+    def test_backoff(self):
+        delays = probe_delays(0.5, 2.0, 2.0, 0.0)
+        self.assertEqual(list(itertools.islice(delays, 5)),
+                         [0.5, 1.0, 2.0, 2.0, 2.0])
+
+    def test_fixed(self):
+        delays = probe_delays(0.1, 0.1, 1.0, 0.0)
+        self.assertEqual(list(itertools.islice(delays, 3)),
+                         [0.1, 0.1, 0.1])
+
+    def test_jitter(self):
+        for delay in itertools.islice(probe_delays(1.0, 1.0, 2.0, 0.5), 50):
+            self.assertGreater(delay, 0.5)
+            self.assertLessEqual(delay, 1.0)
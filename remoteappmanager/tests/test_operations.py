@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+from remoteappmanager import operations
+from remoteappmanager.operations import OperationTracker
+
+
+class TestOperationTracker(unittest.TestCase):
+    def test_new_and_get(self):
+        tracker = OperationTracker()
+        operation = tracker.new("johndoe", "mapping")
+
+        self.assertEqual(operation.phase, operations.QUEUED)
+        self.assertIs(tracker.get(operation.identifier, "johndoe"),
+                      operation)
+        self.assertIsNone(tracker.get(operation.identifier, "other"))
+        self.assertIsNone(tracker.get("unknown", "johndoe"))
+        self.assertEqual(tracker.list("johndoe"), [operation])
+        self.assertEqual(tracker.list("other"), [])
+
+    def test_phases(self):
+        operation = OperationTracker().new("johndoe", "mapping")
+
+        operation.on_phase("create")
+        self.assertEqual(operation.phase, operations.CREATING)
+        operation.on_phase("unknown")
+        self.assertEqual(operation.phase, operations.CREATING)
+        operation.on_phase("start")
+        self.assertEqual(operation.phase, operations.STARTING)
+        operation.on_phase("readiness")
+        self.assertEqual(operation.phase, operations.WAITING_READY)
+        operation.on_phase("proxy_register")
+        self.assertEqual(operation.phase, operations.REGISTERING)
+        self.assertFalse(operation.is_completed())
+
+        operation.succeeded("12345")
+        self.assertEqual(operation.phase, operations.READY)
+        self.assertEqual(operation.url_id, "12345")
+        self.assertTrue(operation.is_completed())
+
+    def test_completed_operations_expire(self):
+        tracker = OperationTracker(ttl=10)
+        with mock.patch("time.monotonic", return_value=100):
+            failed = tracker.new("johndoe", "mapping")
+            failed.failed("Boom!")
+            running = tracker.new("johndoe", "mapping")
+
+        with mock.patch("time.monotonic", return_value=105):
+            self.assertIs(tracker.get(failed.identifier, "johndoe"), failed)
+
+        with mock.patch("time.monotonic", return_value=111):
+            self.assertIsNone(tracker.get(failed.identifier, "johndoe"))
+            self.assertIs(tracker.get(running.identifier, "johndoe"),
+                          running)
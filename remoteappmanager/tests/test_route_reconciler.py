@@ -0,0 +1,67 @@
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test, LogTrapTestCase
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.route_reconciler import RouteReconciler
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+from remoteappmanager.tests.utils import mock_coro_factory
+
+
+class TestRouteReconciler(AsyncTestCase, LogTrapTestCase):
+    def setUp(self):
+        super().setUp()
+        self.containers = [
+            Container(docker_id="a", urlpath="/user/a/containers/1",
+                      ip="127.0.0.1", port=1000, user="a"),
+            Container(docker_id="b", urlpath="/user/a/containers/2",
+                      ip="127.0.0.1", port=2000, user="a"),
+        ]
+
+        self.container_manager = mock.Mock(spec=ContainerManager)
+        self.container_manager.find_containers = mock_coro_factory(
+            self.containers)
+
+        self.reverse_proxy = mock.Mock(spec=ReverseProxy)
+        self.reverse_proxy.sync = mock_coro_factory(
+            (["/user/a/containers/2"], ["/user/a/containers/3"]))
+
+        self.reconciler = RouteReconciler(
+            container_manager=self.container_manager,
+            reverse_proxy=self.reverse_proxy,
+            user_name="a",
+            managed_urlpaths="/user/a/containers/[^/]+")
+
+    @gen_test
+    def test_reconcile(self):
+        registered, unregistered = yield self.reconciler.reconcile()
+
+        self.assertEqual(registered, ["/user/a/containers/2"])
+        self.assertEqual(unregistered, ["/user/a/containers/3"])
+        self.assertEqual(self.container_manager.find_containers.call_args,
+                         ((), {"user_name": "a"}))
+        self.assertEqual(self.reverse_proxy.sync.call_args, ((
+            {"/user/a/containers/1": self.containers[0].host_url,
+             "/user/a/containers/2": self.containers[1].host_url},
+            "/user/a/containers/[^/]+"), {}))
+
+    @gen_test
+    def test_failures(self):
+        self.reverse_proxy.sync = mock_coro_factory(
+            side_effect=Exception("Boom!"))
+        result = yield self.reconciler.reconcile()
+        self.assertEqual(result, ([], []))
+
+        self.reverse_proxy.sync = mock_coro_factory()
+        self.container_manager.find_containers = mock_coro_factory(
+            side_effect=Exception("Boom!"))
+        result = yield self.reconciler.reconcile()
+        self.assertEqual(result, ([], []))
+        self.assertFalse(self.reverse_proxy.sync.called)
+
+    def test_start_stop(self):
+        self.reconciler.start()
+        self.assertIsNotNone(self.reconciler._periodic_callback)
+        self.reconciler.stop()
+        self.assertIsNone(self.reconciler._periodic_callback)
@@ -1,2 +1,3 @@
 from .container import ContainerHandler  # noqa
 from .application import ApplicationHandler  # noqa
+from .operation import OperationHandler  # noqa
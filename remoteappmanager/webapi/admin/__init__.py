@@ -1,5 +1,5 @@
 from .container import ContainerHandler  # noqa
 from .application import ApplicationHandler  # noqa
 from .user import UserHandler  # noqa
-from .accounting import AccountingHandler  # noqa
+from .accounting import AccountingHandler, AccountingBatchHandler  # noqa
 from .stats import StatsHandler  # noqa
@@ -1,8 +1,10 @@
+import uuid
+
 from tornado import gen
 from tornadowebapi.exceptions import NotFound, BadQueryArguments, \
     BadRepresentation
 from tornadowebapi.resource_handler import ResourceHandler
-from tornadowebapi.traitlets import Unicode, Bool
+from tornadowebapi.traitlets import Unicode, Bool, List, Dict
 
 from tornadowebapi import exceptions
 from tornadowebapi.resource import Resource
@@ -31,20 +33,18 @@ class AccountingHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def create(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
 
-        acc_user = db.get_user(id=int(resource.user_id))
+        acc_user = yield db.get_user(id=int(resource.user_id))
         if acc_user is None:
             raise BadRepresentation()
 
-        volume = (resource.volume_source +
-                  ":"+resource.volume_target +
-                  ":"+resource.volume_mode)
-        if resource.volume_target == "" or resource.volume_source == "":
-            volume = None
+        volume = _volume(resource.volume_source,
+                         resource.volume_target,
+                         resource.volume_mode)
 
         try:
-            id = db.grant_access(
+            id = yield db.grant_access(
                 resource.image_name,
                 acc_user.name,
                 resource.allow_home,
@@ -59,10 +59,10 @@ class AccountingHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def delete(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
 
         try:
-            db.revoke_access_by_id(resource.identifier)
+            yield db.revoke_access_by_id(resource.identifier)
         except db_exceptions.NotFound:
             raise exceptions.NotFound()
 
@@ -72,18 +72,18 @@ class AccountingHandler(ResourceHandler):
         if filter_ is None:
             raise BadQueryArguments("Filter is required")
 
-        db = self.application.db
+        db = self.application.async_db
         if (isinstance(filter_, And) and
                 len(filter_.filters) == 1 and
                 isinstance(filter_.filters[0], Eq) and
                 filter_.filters[0].key == "user_id"):
 
             user_id = int(filter_.filters[0].value)
-            acc_user = db.get_user(id=user_id)
+            acc_user = yield db.get_user(id=user_id)
             if acc_user is None:
                 raise NotFound()
 
-            accountings = db.get_accounting_for_user(acc_user)
+            accountings = yield db.get_accounting_for_user(acc_user)
 
             response = []
             for acc in accountings:
@@ -100,3 +100,101 @@ class AccountingHandler(ResourceHandler):
             item_response.set(response)
         else:
             raise BadQueryArguments("Empty filter specified")
+
+
+class AccountingBatch(Resource):
+    """Grants or revokes many accountings at once."""
+    #: Either "grant" or "revoke"
+    action = Unicode(allow_empty=False, strip=True)
+
+    #: Each item has the same fields of an Accounting. Once applied,
+    #: each granted item also reports the identifier of its accounting.
+    accountings = List(Dict)
+
+    @classmethod
+    def collection_name(cls):
+        return "accounting_batches"
+
+
+class AccountingBatchHandler(ResourceHandler):
+    resource_class = AccountingBatch
+
+    @gen.coroutine
+    @authenticated
+    def create(self, resource, **kwargs):
+        """Applies all the grants or revocations, or none of them if any
+        is invalid. The outcome of the batch can be retrieved for a while
+        afterwards."""
+        if resource.action not in ("grant", "revoke"):
+            raise BadRepresentation(
+                message="action must be either grant or revoke")
+
+        db = self.application.async_db
+
+        # Only the users named in the batch are looked up.
+        try:
+            user_ids = sorted({int(entry.get("user_id"))
+                               for entry in resource.accountings})
+        except (TypeError, ValueError):
+            raise BadRepresentation(message="invalid user_id")
+
+        users = yield [db.get_user(id=user_id) for user_id in user_ids]
+        user_names = {str(user_id): user.name
+                      for user_id, user in zip(user_ids, users)
+                      if user is not None}
+
+        grants = []
+        outcome = []
+        for entry in resource.accountings:
+            user_id = str(int(entry.get("user_id")))
+            user_name = user_names.get(user_id)
+            image_name = entry.get("image_name")
+            if user_name is None or not image_name:
+                raise BadRepresentation()
+
+            grants.append(dict(
+                app_name=image_name,
+                user_name=user_name,
+                allow_home=bool(entry.get("allow_home", False)),
+                allow_view=True,
+                volume=_volume(entry.get("volume_source"),
+                               entry.get("volume_target"),
+                               entry.get("volume_mode"))))
+            outcome.append(dict(entry, user_id=user_id))
+
+        try:
+            if resource.action == "grant":
+                ids = yield db.grant_access_bulk(grants)
+                for item, id in zip(outcome, ids):
+                    item["identifier"] = str(id)
+            else:
+                yield db.revoke_access_bulk(grants)
+        except db_exceptions.NotFound:
+            raise exceptions.NotFound()
+        except db_exceptions.UnsupportedOperation:
+            raise exceptions.Unable()
+        except ValueError:
+            raise BadRepresentation(message="invalid volume")
+
+        resource.identifier = uuid.uuid4().hex
+        self.application.accounting_batches.set(
+            resource.identifier, (resource.action, outcome))
+
+    @gen.coroutine
+    @authenticated
+    def retrieve(self, resource, **kwargs):
+        """Returns the outcome of an applied batch."""
+        batch = self.application.accounting_batches.get(resource.identifier)
+        if batch is None:
+            raise NotFound()
+
+        resource.action, resource.accountings = batch
+
+
+def _volume(source, target, mode):
+    """Returns the volume string for the grant, or None if the volume
+    source or target are not specified."""
+    if not source or not target:
+        return None
+
+    return "{}:{}:{}".format(source, target, mode)
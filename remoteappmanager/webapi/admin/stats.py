@@ -1,6 +1,6 @@
 from tornado import gen
 
-from tornadowebapi.traitlets import Unicode, Int
+from tornadowebapi.traitlets import Unicode, Int, Dict
 from tornadowebapi.singleton_resource import SingletonResource
 from tornadowebapi.resource_handler import ResourceHandler
 
@@ -18,6 +18,9 @@ class Stats(SingletonResource):
     num_applications = Int()
     #: Total number of running containers.
     num_running_containers = Int()
+    #: Image name -> "present", "pulling" or "failed", for the images of
+    #: the applications. Only available if the images are synchronized.
+    image_status = Dict(optional=True)
 
 
 class StatsHandler(ResourceHandler):
@@ -29,10 +32,18 @@ class StatsHandler(ResourceHandler):
     def retrieve(self, resource, **kwargs):
         app = self.application
         manager = self.application.container_manager
-        containers = (yield manager.find_containers())
+        containers, users, applications = yield [
+            manager.find_containers(),
+            app.async_db.list_users(),
+            app.async_db.list_applications(),
+        ]
 
         resource.realm = app.file_config.docker_realm
-        resource.num_total_users = len(app.db.list_users())
+        resource.num_total_users = len(users)
         resource.num_active_users = len(set([c.user for c in containers]))
-        resource.num_applications = len(app.db.list_applications())
+        resource.num_applications = len(applications)
         resource.num_running_containers = len(containers)
+
+        synchronizer = getattr(app, "image_synchronizer", None)
+        if synchronizer is not None:
+            resource.image_status = dict(synchronizer.status)
@@ -115,6 +115,107 @@ class TestAccounting(WebAPITestCase):
                                   httpstatus.OK)
         self.assertEqual(len(data["identifiers"]), 2)
 
+    def test_batch(self):
+        accountings = [
+            {"user_id": "0",
+             "image_name": "simphonyproject/ubuntu-image:latest",
+             "allow_home": True,
+             "volume_source": "/foo",
+             "volume_target": "/bar",
+             "volume_mode": "ro"},
+            {"user_id": "0",
+             "image_name": "simphonyproject/simphony-mayavi:0.6.0"},
+        ]
+
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.grant_access_bulk"
+                        ) as mock_grant_access_bulk:
+            mock_grant_access_bulk.return_value = ["1", "2"]
+            self.post("/user/johndoe/api/v1/accounting_batches/",
+                      {"action": "grant", "accountings": accountings},
+                      httpstatus.CREATED)
+
+            grants = mock_grant_access_bulk.call_args[0][0]
+            self.assertEqual(grants, [
+                dict(app_name="simphonyproject/ubuntu-image:latest",
+                     user_name="johndoe",
+                     allow_home=True,
+                     allow_view=True,
+                     volume="/foo:/bar:ro"),
+                dict(app_name="simphonyproject/simphony-mayavi:0.6.0",
+                     user_name="johndoe",
+                     allow_home=False,
+                     allow_view=True,
+                     volume=None),
+            ])
+
+        # The outcome of the batch can be retrieved.
+        [(batch_id, _)] = self._app.accounting_batches.items()
+        _, data = self.get(
+            "/user/johndoe/api/v1/accounting_batches/{}/".format(batch_id),
+            httpstatus.OK)
+        self.assertEqual(data["action"], "grant")
+        self.assertEqual(
+            [item["identifier"] for item in data["accountings"]],
+            ["1", "2"])
+        self.assertEqual(data["accountings"][1]["image_name"],
+                         "simphonyproject/simphony-mayavi:0.6.0")
+        self._app.accounting_batches.clear()
+
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.revoke_access_bulk"
+                        ) as mock_revoke_access_bulk:
+            self.post("/user/johndoe/api/v1/accounting_batches/",
+                      {"action": "revoke", "accountings": accountings},
+                      httpstatus.CREATED)
+            self.assertEqual(mock_revoke_access_bulk.call_args[0][0],
+                             grants)
+
+    def test_batch_looks_up_named_users(self):
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.list_users"
+                        ) as mock_list_users, \
+                mock.patch("remoteappmanager.tests.mocking."
+                           "dummy.DummyDB.revoke_access_bulk"):
+            self.post("/user/johndoe/api/v1/accounting_batches/",
+                      {"action": "revoke",
+                       "accountings": [
+                           {"user_id": "0", "image_name": "image_id1"},
+                           {"user_id": "0", "image_name": "image_id2"}]},
+                      httpstatus.CREATED)
+            self.assertFalse(mock_list_users.called)
+
+    def test_batch_not_found(self):
+        self.get("/user/johndoe/api/v1/accounting_batches/12345/",
+                 httpstatus.NOT_FOUND)
+
+    def test_batch_invalid(self):
+        self.post("/user/johndoe/api/v1/accounting_batches/",
+                  {"action": "frobnicate", "accountings": []},
+                  httpstatus.BAD_REQUEST)
+
+        self.post("/user/johndoe/api/v1/accounting_batches/",
+                  {"action": "grant",
+                   "accountings": [{"user_id": "234",
+                                    "image_name": "image_id1"}]},
+                  httpstatus.BAD_REQUEST)
+
+        self.post("/user/johndoe/api/v1/accounting_batches/",
+                  {"action": "grant",
+                   "accountings": [{"user_id": "foo",
+                                    "image_name": "image_id1"}]},
+                  httpstatus.BAD_REQUEST)
+
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.grant_access_bulk"
+                        ) as mock_grant_access_bulk:
+            mock_grant_access_bulk.side_effect = UnsupportedOperation()
+            self.post("/user/johndoe/api/v1/accounting_batches/",
+                      {"action": "grant",
+                       "accountings": [{"user_id": "0",
+                                        "image_name": "image_id1"}]},
+                      httpstatus.INTERNAL_SERVER_ERROR)
+
     def test_delete_failed_auth(self):
         self._app.hub.verify_token.return_value = {}
 
@@ -6,6 +6,7 @@ from tornadowebapi.traitlets import Unicode, OneOf, Bool, List
 from tornadowebapi.resource_handler import ResourceHandler
 
 from remoteappmanager.webapi.decorators import authenticated
+from remoteappmanager.webapi.user_applications import user_applications
 
 
 class Container(ResourceFragment):
@@ -43,7 +44,7 @@ class ApplicationHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def retrieve(self, resource, **kwargs):
-        accs = self.application.db.get_accounting_for_user(
+        accs = yield self.application.async_db.get_accounting_for_user(
             self.current_user.account
         )
         identifier = resource.identifier
@@ -69,7 +70,34 @@ class ApplicationHandler(ResourceHandler):
             user_name=self.current_user.name,
             mapping_id=identifier)
 
-        resource.mapping_id = identifier
+        self._fill(resource, image, policy, containers)
+
+    @gen.coroutine
+    @authenticated
+    def items(self, items_response, **kwargs):
+        """Retrieves a dictionary containing the image and the associated
+        container, if active, as values."""
+        user_apps = yield user_applications(self.application,
+                                            self.current_user)
+        result = []
+        for user_app in user_apps:
+            resource = self.resource_class(
+                identifier=user_app.accounting.id)
+            self._fill(resource,
+                       user_app.image,
+                       user_app.accounting.application_policy,
+                       user_app.containers)
+            result.append(resource)
+
+        items_response.set(result)
+
+    ##################
+    # Private
+
+    def _fill(self, resource, image, policy, containers):
+        """Fills the resource with the image, the policy and the
+        container of the application."""
+        resource.mapping_id = resource.identifier
         resource.image = Image()
         resource.image.fill({
             "name": image.name,
@@ -87,23 +115,3 @@ class ApplicationHandler(ResourceHandler):
             # API considers a broader possibility for future extension.
             resource.container = Container()
             resource.container.fill(containers[0])
-
-    @gen.coroutine
-    @authenticated
-    def items(self, items_response, **kwargs):
-        """Retrieves a dictionary containing the image and the associated
-        container, if active, as values."""
-        accs = self.application.db.get_accounting_for_user(
-            self.current_user.account)
-
-        result = []
-        for entry in accs:
-            resource = self.resource_class(identifier=entry.id)
-            try:
-                yield self.retrieve(resource)
-            except NotFound:
-                continue
-
-            result.append(resource)
-
-        items_response.set(result)
@@ -2,14 +2,59 @@ import os
 from datetime import timedelta
 
 from tornado import gen
+from tornado.ioloop import IOLoop
 
 from tornadowebapi import exceptions
 from tornadowebapi.resource import Resource
 from tornadowebapi.resource_handler import ResourceHandler
 from tornadowebapi.traitlets import Unicode, Dict, Absent
 
+from remoteappmanager.docker.admission import AdmissionError
+from remoteappmanager.metrics import PhaseTimer
 from remoteappmanager.netutils import wait_for_http_server_2xx
 from remoteappmanager.webapi.decorators import authenticated
+from remoteappmanager.webapi.user_applications import user_applications
+
+
+def container_volumes(user_name, policy, log):
+    """Returns the volumes to mount in a container started with the
+    given policy.
+
+    Parameters
+    ----------
+    user_name : str
+        the username
+    policy : ABCApplicationPolicy
+        The startup policy for the application
+    log : Logger
+        Where to report the volumes that are not available.
+
+    Returns
+    -------
+    A dictionary {volume_source: {'bind': volume_target,
+                                  'mode': volume_mode}}
+    """
+    mount_home = policy.allow_home
+    volume_spec = (policy.volume_source,
+                   policy.volume_target,
+                   policy.volume_mode)
+
+    volumes = {}
+
+    if mount_home:
+        home_path = os.environ.get('HOME')
+        if home_path:
+            volumes[home_path] = {'bind': '/workspace', 'mode': 'rw'}
+        else:
+            log.warning('HOME (%s) is not available for %s',
+                        home_path, user_name)
+
+    if None not in volume_spec:
+        volume_source, volume_target, volume_mode = volume_spec
+        volumes[volume_source] = {'bind': volume_target,
+                                  'mode': volume_mode}
+
+    return volumes
 
 
 class Container(Resource):
@@ -19,19 +64,29 @@ class Container(Resource):
     image_name = Unicode(scope="output", allow_empty=False, strip=True)
 
 
-class ContainerHandler(ResourceHandler):
-    resource_class = Container
+class ContainerStartMixin:
+    """Starts containers on behalf of the current user. Used by the
+    resource handlers that start containers."""
 
     @gen.coroutine
-    @authenticated
-    def create(self, resource, **kwargs):
-        """Create the container."""
-
+    def _prepare_start(self, resource):
+        """Validates the request to start a container.
+
+        Return
+        ------
+        A tuple (app, policy, environment) with the application and policy
+        of the requested mapping, and the environment of the container.
+
+        Raises
+        ------
+        BadRepresentation
+            If the request is invalid.
+        """
         mapping_id = resource.mapping_id
 
         webapp = self.application
         account = self.current_user.account
-        accountings = webapp.db.get_accounting_for_user(account)
+        accountings = yield webapp.async_db.get_accounting_for_user(account)
         container_manager = webapp.container_manager
 
         choice = [(accounting.id,
@@ -58,122 +113,172 @@ class ContainerHandler(ResourceHandler):
             self.log.exception("Invalid configurables")
             raise exceptions.BadRepresentation(message="invalid configurables")
 
-        # Everything is fine. Start and wait for the container to come online.
-        try:
-            container = yield self._start_container(
-                self.current_user.name,
-                app,
-                policy,
-                mapping_id,
-                self.application.command_line_config.base_urlpath,
-                environment=environment
-                )
-        except Exception as e:
-            raise exceptions.Unable(message=str(e))
+        return app, policy, environment
 
-        try:
-            yield self._wait_for_container_ready(container)
-        except Exception as e:
-            self._remove_container_noexcept(container)
-            raise exceptions.Unable(message=str(e))
+    def _container_starter(self):
+        """Returns the starter of the containers of the current user."""
+        return ContainerStarter(
+            self.application, self.current_user.name, self.log)
 
-        try:
-            yield self.application.reverse_proxy.register(
-                container.urlpath,
-                container.host_url)
-        except Exception as e:
-            self._remove_container_noexcept(container)
-            raise exceptions.Unable(message=str(e))
+    @gen.coroutine
+    def _start_and_register(self, app, policy, mapping_id, environment):
+        """Starts the container of the current user, waits for it to be
+        ready and registers it in the reverse proxy.
+        See ContainerStarter.start_and_register."""
+        container = yield self._container_starter().start_and_register(
+            app, policy, mapping_id, environment)
+        return container
 
-        resource.identifier = container.url_id
+    def _environment_from_configurables(self, image, resource):
+        """Helper routine: extracts the configurables from the
+        image, matches them to the appropriate configurables
+        data in the representation, and returns the resulting environment
+        """
+        env = {}
 
-    @gen.coroutine
-    @authenticated
-    def retrieve(self, resource, **kwargs):
-        """Return the representation of the running container."""
-        container_manager = self.application.container_manager
-        container = yield container_manager.find_container(
-            url_id=resource.identifier,
-            user_name=self.current_user.name)
+        if resource.configurables is Absent:
+            return env
 
-        if container is None:
-            self.log.warning("Could not find container for id {}".format(
-                resource.identifier))
-            raise exceptions.NotFound()
+        for img_conf in image.configurables:
+            config_dict = resource.configurables.get(img_conf.tag)
+            env.update(img_conf.config_dict_to_env(config_dict))
 
-        return resource.fill(dict(
-            name=container.name,
-            image_name=container.image_name,
-            mapping_id=container.mapping_id,
-        ))
+        return env
+
+
+class ContainerStarter:
+    """Starts the containers of a user, waits for them to be ready and
+    registers them in the reverse proxy. It holds no reference to the
+    request, so that a start can continue after the response is sent."""
+
+    def __init__(self, webapp, user_name, log):
+        """
+        Parameters
+        ----------
+        webapp: BaseApplication
+            The tornado application
+        user_name: str
+            The user starting the containers
+        log: Logger
+            Where to report the progress of the starts.
+        """
+        self.webapp = webapp
+        self.user_name = user_name
+        self.log = log
 
     @gen.coroutine
-    @authenticated
-    def delete(self, resource, **kwargs):
-        """Stop the container."""
-        container_manager = self.application.container_manager
-        container = yield container_manager.find_container(
-            url_id=resource.identifier,
-            user_name=self.current_user.name
-        )
+    def start_and_register(self, app, policy, mapping_id, environment,
+                           on_phase=None):
+        """Starts the container, waits for it to be ready and registers
+        it in the reverse proxy.
 
-        if not container:
-            self.log.warning("Could not find container for id {}".format(
-                             resource.identifier))
-            raise exceptions.NotFound()
+        Parameters
+        ----------
+        app : ABCApplication
+            the application to start
+        policy : ABCApplicationPolicy
+            The startup policy for the application
+        mapping_id: str
+            The mapping id of the application
+        environment: Dict
+            A dictionary of envvars to pass to the container.
+        on_phase: callable or None
+            Invoked with the name of each phase of the start when it begins.
 
-        try:
-            yield self.application.reverse_proxy.unregister(
-                container.urlpath
-            )
-        except Exception:
-            # If we can't remove the reverse proxy, we cannot do much more
-            # than log the problem and keep going, because we want to stop
-            # the container regardless.
-            self.log.exception("Could not remove reverse "
-                               "proxy for id {}".format(resource.identifier))
+        Return
+        ------
+        remoteappmanager.docker.container.Container
 
-        try:
-            yield container_manager.stop_and_remove_container(
-                container.docker_id)
-        except Exception:
-            self.log.exception("Could not stop and remove container "
-                               "for id {}".format(resource.identifier))
+        Raises
+        ------
+        Unable
+            If the container could not be started.
+        """
+        phase_timer = PhaseTimer(
+            self.webapp.metrics,
+            "container_start_phase_seconds",
+            "Duration of the phases of a container start",
+            on_phase=on_phase)
 
-    @gen.coroutine
-    @authenticated
-    def items(self, items_response, **kwargs):
-        """"Return the list of containers we are currently running."""
-        container_manager = self.application.container_manager
+        # Wait for our turn, if too many containers are starting.
+        try:
+            with phase_timer.phase("admission"):
+                admission = yield self._admit(self.user_name,
+                                              mapping_id)
+        except AdmissionError as e:
+            self.log.warning("Start for user {} not admitted: {}".format(
+                self.user_name, e))
+            raise exceptions.Unable(message=str(e))
 
-        accountings = self.application.db.get_accounting_for_user(
-            self.current_user.account)
+        # Everything is fine. Start and wait for the container to come online.
+        try:
+            with admission:
+                container = yield self._start_container(
+                    self.user_name,
+                    app,
+                    policy,
+                    mapping_id,
+                    self.webapp.command_line_config.base_urlpath,
+                    environment=environment,
+                    phase_timer=phase_timer
+                    )
+        except Exception as e:
+            self._log_start_phases(mapping_id, phase_timer)
+            raise exceptions.Unable(message=str(e))
 
-        running_containers = []
+        try:
+            with phase_timer.phase("readiness"):
+                yield self._wait_for_container_ready(container)
+        except Exception as e:
+            self._log_start_phases(mapping_id, phase_timer)
+            self._remove_container_noexcept(container)
+            raise exceptions.Unable(message=str(e))
 
-        for accounting in accountings:
-            image = yield container_manager.image(accounting.application.image)
+        try:
+            with phase_timer.phase("proxy_register"):
+                yield self.webapp.reverse_proxy.register(
+                    container.urlpath,
+                    container.host_url)
+        except Exception as e:
+            self._log_start_phases(mapping_id, phase_timer)
+            self._remove_container_noexcept(container)
+            raise exceptions.Unable(message=str(e))
 
-            if image is None:
-                # The user has access to an application that is no longer
-                # available in docker. We just move on.
-                continue
+        self._log_start_phases(mapping_id, phase_timer)
+        return container
 
-            container = yield container_manager.find_container(
-                user_name=self.current_user.name,
-                mapping_id=accounting.id)
+    def _log_start_phases(self, mapping_id, phase_timer):
+        """Logs the duration of the phases of a container start."""
+        self.log.info("Start phases for user {}, mapping {}: {}".format(
+            self.user_name, mapping_id, phase_timer.summary()))
 
-            if container is None:
-                continue
+    @gen.coroutine
+    def _admit(self, user_name, mapping_id):
+        """Obtains the admission to start a container for the user,
+        waiting in the queue if needed. The container of the same mapping,
+        if running, does not count for the quota, as the start replaces it.
+
+        Raises
+        ------
+        AdmissionError
+            If the start is refused.
+        """
+        webapp = self.webapp
+        admission_controller = webapp.admission_controller
 
-            rest_container = Container(identifier=container.url_id)
-            rest_container.fill(container)
-            running_containers.append(rest_container)
+        running = 0
+        if admission_controller.user_quota > 0:
+            containers = yield webapp.container_manager.find_containers(
+                user_name=user_name)
+            running = len([container for container in containers
+                           if container.mapping_id != mapping_id])
 
-        items_response.set(running_containers)
+        admission = yield admission_controller.admit(
+            user_name,
+            running=running,
+            timeout=webapp.file_config.admission_queue_timeout)
 
-    ##################
-    # Private
+        return admission
 
     @gen.coroutine
     def _remove_container_noexcept(self, container):
@@ -182,7 +287,7 @@ class ContainerHandler(ResourceHandler):
 
         # Note, can't use a context manager to perform this, because
         # context managers are only allowed to yield once
-        container_manager = self.application.container_manager
+        container_manager = self.webapp.container_manager
         try:
             yield container_manager.stop_and_remove_container(
                 container.docker_id)
@@ -200,7 +305,8 @@ class ContainerHandler(ResourceHandler):
                          policy,
                          mapping_id,
                          base_urlpath,
-                         environment):
+                         environment,
+                         phase_timer=None):
         """Start the container. This method is a helper method that
         works with low level data and helps in issuing the request to the
         data container.
@@ -219,33 +325,17 @@ class ContainerHandler(ResourceHandler):
         environment: Dict
             A dictionary of envvars to pass to the container.
 
+        phase_timer: PhaseTimer or None
+            The timer recording the duration of the start phases.
+
         Returns
         -------
         remoteappmanager.docker.container.Container
         """
 
         image_name = app.image
-        mount_home = policy.allow_home
-        volume_spec = (policy.volume_source,
-                       policy.volume_target,
-                       policy.volume_mode)
-
-        manager = self.application.container_manager
-        volumes = {}
-
-        if mount_home:
-            home_path = os.environ.get('HOME')
-            if home_path:
-                volumes[home_path] = {'bind': '/workspace', 'mode': 'rw'}
-            else:
-                self.log.warning('HOME (%s) is not available for %s',
-                                 home_path, user_name)
-                pass
-
-        if None not in volume_spec:
-            volume_source, volume_target, volume_mode = volume_spec
-            volumes[volume_source] = {'bind': volume_target,
-                                      'mode': volume_mode}
+        manager = self.webapp.container_manager
+        volumes = container_volumes(user_name, policy, self.log)
 
         try:
             f = manager.start_container(user_name,
@@ -253,11 +343,12 @@ class ContainerHandler(ResourceHandler):
                                         mapping_id,
                                         base_urlpath,
                                         volumes,
-                                        environment
+                                        environment,
+                                        phase_timer=phase_timer
                                         )
             container = yield gen.with_timeout(
                 timedelta(
-                    seconds=self.application.file_config.network_timeout
+                    seconds=self.webapp.file_config.network_timeout
                 ),
                 f
             )
@@ -278,22 +369,6 @@ class ContainerHandler(ResourceHandler):
 
         return container
 
-    def _environment_from_configurables(self, image, resource):
-        """Helper routine: extracts the configurables from the
-        image, matches them to the appropriate configurables
-        data in the representation, and returns the resulting environment
-        """
-        env = {}
-
-        if resource.configurables is Absent:
-            return env
-
-        for img_conf in image.configurables:
-            config_dict = resource.configurables.get(img_conf.tag)
-            env.update(img_conf.config_dict_to_env(config_dict))
-
-        return env
-
     @gen.coroutine
     def _wait_for_container_ready(self, container):
         """ Wait until the container is ready to be connected
@@ -313,6 +388,110 @@ class ContainerHandler(ResourceHandler):
             container.port,
             container.urlpath)
 
+        file_config = self.webapp.file_config
+        timeout = file_config.network_timeout
+        loop = IOLoop.current()
+        tic = loop.time()
+
+        if file_config.readiness_health_events:
+            # When the image defines a HEALTHCHECK, docker tells us when
+            # the container is ready, and the HTTP probe below will succeed
+            # at the first attempt.
+            manager = self.webapp.container_manager
+            yield manager.wait_for_container_healthy(
+                container.docker_id, timeout)
+
         yield wait_for_http_server_2xx(
             server_url,
-            self.application.file_config.network_timeout)
+            max(timeout - (loop.time() - tic), 0),
+            connect_timeout=file_config.readiness_connect_timeout,
+            initial_delay=file_config.readiness_initial_delay,
+            max_delay=file_config.readiness_max_delay,
+            backoff=file_config.readiness_backoff,
+            jitter=file_config.readiness_jitter,
+            tcp_check=file_config.readiness_tcp_check,
+            http_client=self.webapp.http_client)
+
+
+class ContainerHandler(ContainerStartMixin, ResourceHandler):
+    resource_class = Container
+
+    @gen.coroutine
+    @authenticated
+    def create(self, resource, **kwargs):
+        """Create the container."""
+        app, policy, environment = yield self._prepare_start(resource)
+        container = yield self._start_and_register(
+            app, policy, resource.mapping_id, environment)
+        resource.identifier = container.url_id
+
+    @gen.coroutine
+    @authenticated
+    def retrieve(self, resource, **kwargs):
+        """Return the representation of the running container."""
+        container_manager = self.application.container_manager
+        container = yield container_manager.find_container(
+            url_id=resource.identifier,
+            user_name=self.current_user.name)
+
+        if container is None:
+            self.log.warning("Could not find container for id {}".format(
+                resource.identifier))
+            raise exceptions.NotFound()
+
+        return resource.fill(dict(
+            name=container.name,
+            image_name=container.image_name,
+            mapping_id=container.mapping_id,
+        ))
+
+    @gen.coroutine
+    @authenticated
+    def delete(self, resource, **kwargs):
+        """Stop the container."""
+        container_manager = self.application.container_manager
+        container = yield container_manager.find_container(
+            url_id=resource.identifier,
+            user_name=self.current_user.name
+        )
+
+        if not container:
+            self.log.warning("Could not find container for id {}".format(
+                             resource.identifier))
+            raise exceptions.NotFound()
+
+        try:
+            yield self.application.reverse_proxy.unregister(
+                container.urlpath
+            )
+        except Exception:
+            # If we can't remove the reverse proxy, we cannot do much more
+            # than log the problem and keep going, because we want to stop
+            # the container regardless.
+            self.log.exception("Could not remove reverse "
+                               "proxy for id {}".format(resource.identifier))
+
+        try:
+            yield container_manager.stop_and_remove_container(
+                container.docker_id)
+        except Exception:
+            self.log.exception("Could not stop and remove container "
+                               "for id {}".format(resource.identifier))
+
+    @gen.coroutine
+    @authenticated
+    def items(self, items_response, **kwargs):
+        """"Return the list of containers we are currently running."""
+        user_apps = yield user_applications(self.application,
+                                            self.current_user)
+        running_containers = []
+        for user_app in user_apps:
+            if not user_app.containers:
+                continue
+
+            container = user_app.containers[0]
+            rest_container = Container(identifier=container.url_id)
+            rest_container.fill(container)
+            running_containers.append(rest_container)
+
+        items_response.set(running_containers)
@@ -0,0 +1,105 @@
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from tornadowebapi import exceptions
+from tornadowebapi.resource import Resource
+from tornadowebapi.resource_handler import ResourceHandler
+from tornadowebapi.traitlets import Unicode, Dict, Int
+
+from remoteappmanager import operations
+from remoteappmanager.webapi.container import ContainerStartMixin
+from remoteappmanager.webapi.decorators import authenticated
+
+
+class Operation(Resource):
+    """A container start running in background."""
+    mapping_id = Unicode(allow_empty=False, strip=True)
+    configurables = Dict(optional=True, scope="input")
+    #: One of queued, creating, starting, waiting_ready, registering,
+    #: ready or failed.
+    phase = Unicode(scope="output", allow_empty=False)
+    #: The identifier of the container resource, once ready.
+    container_id = Unicode(scope="output", optional=True)
+    #: The reason of the failure, if failed.
+    error = Unicode(scope="output", optional=True)
+    #: The position in the start queue, while queued.
+    queue_position = Int(scope="output", optional=True)
+
+
+class OperationHandler(ContainerStartMixin, ResourceHandler):
+    """Starts containers in background. Creating an operation returns as
+    soon as the request is validated, and the operation can be polled
+    until its phase is ready or failed."""
+    resource_class = Operation
+
+    @gen.coroutine
+    @authenticated
+    def create(self, resource, **kwargs):
+        """Starts the container in background."""
+        app, policy, environment = yield self._prepare_start(resource)
+
+        operation = self.application.operations.new(
+            self.current_user.name, resource.mapping_id)
+        # The start outlives the request, so it must not refer to the
+        # handler.
+        IOLoop.current().spawn_callback(
+            _run, self._container_starter(), operation,
+            app, policy, environment)
+
+        resource.identifier = operation.identifier
+
+    @gen.coroutine
+    @authenticated
+    def retrieve(self, resource, **kwargs):
+        """Returns the state of the operation."""
+        operation = self.application.operations.get(
+            resource.identifier, self.current_user.name)
+
+        if operation is None:
+            raise exceptions.NotFound()
+
+        self._fill(resource, operation)
+
+    @gen.coroutine
+    @authenticated
+    def items(self, items_response, **kwargs):
+        """Returns the operations of the current user."""
+        resources = []
+        for operation in self.application.operations.list(
+                self.current_user.name):
+            resource = Operation(identifier=operation.identifier)
+            self._fill(resource, operation)
+            resources.append(resource)
+
+        items_response.set(resources)
+
+    ##################
+    # Private
+
+    def _fill(self, resource, operation):
+        resource.mapping_id = operation.mapping_id
+        resource.phase = operation.phase
+        if operation.url_id:
+            resource.container_id = operation.url_id
+        if operation.error:
+            resource.error = operation.error
+        if operation.phase == operations.QUEUED:
+            resource.queue_position = (
+                self.application.admission_controller.queue_position(
+                    operation.user_name))
+
+
+@gen.coroutine
+def _run(starter, operation, app, policy, environment):
+    """Performs the start, tracking its progress in the operation."""
+    try:
+        container = yield starter.start_and_register(
+            app, policy, operation.mapping_id, environment,
+            on_phase=operation.on_phase)
+    except exceptions.Unable as e:
+        operation.failed(e.message or "unable to start the container")
+    except Exception as e:
+        starter.log.exception("Unexpected error starting container")
+        operation.failed(str(e) or type(e).__name__)
+    else:
+        operation.succeeded(container.url_id)
@@ -1,12 +1,13 @@
 from unittest.mock import Mock
 
-from tornado import web, gen
+from tornado import web, gen, locks
 
 from remoteappmanager.tests.utils import mock_coro_factory
 from tornadowebapi import registry
 from tornadowebapi.authenticator import NullAuthenticator
 from tornadowebapi.http import httpstatus
 
+from remoteappmanager.db.async_db import AsyncDatabase
 from remoteappmanager.docker.container import Container
 from remoteappmanager.docker.image import Image
 from remoteappmanager.webapi import ApplicationHandler
@@ -62,6 +63,8 @@ class TestApplication(WebAPITestCase):
                 application=application_mock_2,
                 application_policy=policy),
         ])
+        app.async_db = AsyncDatabase(app.db)
+        app.image_lookup_slots = locks.Semaphore(8)
         return app
 
     def test_items(self):
@@ -185,3 +188,24 @@ class TestApplication(WebAPITestCase):
     def test_retrieve_no_user(self):
         self.reg.authenticator = NullAuthenticator
         self.get("/api/v1/applications/one/", httpstatus.NOT_FOUND)
+
+    def test_items_with_container(self):
+        manager = self._app.container_manager
+        manager.find_containers = mock_coro_factory(return_value=[
+            Container(name="container",
+                      image_name="xxx",
+                      url_id="yyy",
+                      mapping_id="one")])
+
+        _, data = self.get("/api/v1/applications/", httpstatus.OK)
+
+        self.assertEqual(data["items"]["one"]["container"], {
+            'image_name': 'xxx',
+            'name': 'container',
+            'url_id': 'yyy'})
+        self.assertNotIn("container", data["items"]["two"])
+
+        # A single listing of the containers of the user, and one lookup
+        # per image.
+        self.assertEqual(manager.find_containers.call_count, 1)
+        self.assertEqual(manager.image.call_count, 2)
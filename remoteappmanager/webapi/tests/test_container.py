@@ -4,6 +4,7 @@ from remoteappmanager.tests.webapi_test_case import WebAPITestCase
 from tornadowebapi.authenticator import NullAuthenticator
 from tornadowebapi.http import httpstatus
 
+from remoteappmanager.docker.admission import AdmissionController
 from remoteappmanager.docker.image import Image
 from remoteappmanager.docker.container import Container as DockerContainer
 from remoteappmanager.tests.mocking import dummy
@@ -27,7 +28,7 @@ class TestContainer(WebAPITestCase):
         manager.image = mock_coro_factory(Image())
         manager.find_containers = mock_coro_factory([
                 DockerContainer(user="johndoe",
-                                mapping_id="whatever",
+                                mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c",
                                 url_id="12345",
                                 name="container",
                                 image_name="image")
@@ -37,27 +38,26 @@ class TestContainer(WebAPITestCase):
             "/user/johndoe/api/v1/containers/",
             httpstatus.OK)
 
-        # We get two because we have two mapping ids, hence the find_containers
-        # gets called once per each mapping id.
-        # This is a kind of unusual case, because we only get one item
-        # in the items list, due to the nature of the test.
         self.assertEqual(
             data,
-            {'identifiers': ['12345', '12345'],
-             'total': 2,
+            {'identifiers': ['12345'],
+             'total': 1,
              'offset': 0,
              'items': {
                  '12345': {
                      'image_name': 'image',
                      'name': 'container',
-                     'mapping_id': 'whatever'
+                     'mapping_id': 'cbaee2e8ef414f9fb0f1c97416b8aa6c'
                  }
              }})
 
+        # A single listing of the containers of the user.
+        self.assertEqual(manager.find_containers.call_count, 1)
+
     def test_items_with_none_container(self):
         manager = self._app.container_manager
         manager.image = mock_coro_factory(Image())
-        manager.find_container = mock_coro_factory(None)
+        manager.find_containers = mock_coro_factory([])
 
         code, data = self.get("/user/johndoe/api/v1/containers/",
                               httpstatus.OK)
@@ -96,6 +96,31 @@ class TestContainer(WebAPITestCase):
                 httpstatus.CREATED
             )
 
+    def test_create_replacing_does_not_count_for_quota(self):
+        with patch("remoteappmanager"
+                   ".webapi"
+                   ".container"
+                   ".wait_for_http_server_2xx",
+                   new_callable=mock_coro_new_callable()):
+
+            self._app.admission_controller = AdmissionController(
+                user_quota=1)
+            manager = self._app.container_manager
+            manager.find_containers = mock_coro_factory([
+                DockerContainer(user="johndoe",
+                                mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c",
+                                url_id="12345")])
+            manager.start_container = mock_coro_factory(DockerContainer(
+                url_id="3456"
+            ))
+
+            # The start replaces the running container of the same mapping.
+            self.post(
+                "/user/johndoe/api/v1/containers/",
+                dict(mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c"),
+                httpstatus.CREATED
+            )
+
     def test_create_fails(self):
         with patch("remoteappmanager"
                    ".webapi"
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from tornadowebapi.http import httpstatus
+
+from remoteappmanager.docker.container import Container as DockerContainer
+from remoteappmanager.tests.mocking import dummy
+from remoteappmanager.tests.utils import (
+    mock_coro_factory,
+    mock_coro_new_callable)
+from remoteappmanager.tests.webapi_test_case import WebAPITestCase
+from remoteappmanager.webapi import operation as operation_module
+from remoteappmanager.webapi.container import ContainerStarter
+
+
+class TestOperation(WebAPITestCase):
+    def get_app(self):
+        app = dummy.create_application()
+        app.hub.verify_token.return_value = {
+            'pending': None,
+            'name': app.settings['user'],
+            'admin': False,
+            'server': app.settings['base_urlpath']}
+        return app
+
+    def _start_and_wait(self):
+        self.post(
+            "/user/johndoe/api/v1/operations/",
+            dict(
+                mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c",
+                configurables={
+                    "resolution": {
+                        "resolution": "1024x768"
+                    }
+                }
+            ),
+            httpstatus.CREATED
+        )
+
+        for _ in range(100):
+            _, data = self.get("/user/johndoe/api/v1/operations/",
+                               httpstatus.OK)
+            self.assertEqual(data["total"], 1)
+            operation_id = data["identifiers"][0]
+            operation = data["items"][operation_id]
+            if operation["phase"] in ("ready", "failed"):
+                break
+
+        _, data = self.get(
+            "/user/johndoe/api/v1/operations/{}/".format(operation_id),
+            httpstatus.OK)
+        self.assertEqual(data, operation)
+        return operation
+
+    def test_create(self):
+        with patch("remoteappmanager"
+                   ".webapi"
+                   ".container"
+                   ".wait_for_http_server_2xx",
+                   new_callable=mock_coro_new_callable()):
+
+            manager = self._app.container_manager
+            manager.start_container = mock_coro_factory(DockerContainer(
+                url_id="3456"
+            ))
+            operation = self._start_and_wait()
+
+        self.assertEqual(operation, {
+            "mapping_id": "cbaee2e8ef414f9fb0f1c97416b8aa6c",
+            "phase": "ready",
+            "container_id": "3456"})
+
+    def test_create_fails(self):
+        with patch("remoteappmanager"
+                   ".webapi"
+                   ".container"
+                   ".wait_for_http_server_2xx",
+                   new_callable=mock_coro_new_callable()):
+
+            self._app.container_manager.start_container = mock_coro_factory(
+                side_effect=Exception("Boom!"))
+            operation = self._start_and_wait()
+
+        self.assertEqual(operation, {
+            "mapping_id": "cbaee2e8ef414f9fb0f1c97416b8aa6c",
+            "phase": "failed",
+            "error": "Boom!"})
+
+    def test_create_fails_for_invalid_mapping_id(self):
+        self.post(
+            "/user/johndoe/api/v1/operations/",
+            dict(mapping_id="whatever"),
+            httpstatus.BAD_REQUEST
+        )
+
+    def test_retrieve_unknown(self):
+        self.get("/user/johndoe/api/v1/operations/12345/",
+                 httpstatus.NOT_FOUND)
+
+    def test_start_does_not_refer_to_handler(self):
+        with patch("remoteappmanager.webapi.operation.IOLoop") as mock_loop:
+            self.post(
+                "/user/johndoe/api/v1/operations/",
+                dict(mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c"),
+                httpstatus.CREATED
+            )
+
+        args = mock_loop.current.return_value.spawn_callback.call_args[0]
+        self.assertIs(args[0], operation_module._run)
+        starter = args[1]
+        self.assertIsInstance(starter, ContainerStarter)
+        self.assertIs(starter.webapp, self._app)
+        self.assertEqual(starter.user_name, "johndoe")
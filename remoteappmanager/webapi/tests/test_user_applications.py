@@ -0,0 +1,85 @@
+from unittest.mock import Mock
+
+from tornado import gen, locks
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.image import Image
+from remoteappmanager.tests.utils import mock_coro_factory
+from remoteappmanager.webapi.user_applications import user_applications
+
+
+class TestUserApplications(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.webapp = Mock()
+        self.webapp.db.get_accounting_for_user.return_value = [
+            Mock(id="one", application=Mock(image="hello1")),
+            Mock(id="two", application=Mock(image="hello2")),
+            Mock(id="three", application=Mock(image="hello1")),
+            Mock(id="four", application=Mock(image="missing")),
+        ]
+        self.webapp.async_db = AsyncDatabase(self.webapp.db)
+        self.webapp.image_lookup_slots = locks.Semaphore(1)
+
+        self.lookups = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+        @gen.coroutine
+        def image(image_name):
+            self.lookups.append(image_name)
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+            yield gen.sleep(0.01)
+            self.concurrent -= 1
+            if image_name == "missing":
+                return None
+            return Image(name=image_name)
+
+        self.webapp.container_manager.image = image
+        self.webapp.container_manager.find_containers = mock_coro_factory(
+            return_value=[Container(name="container", url_id="yyy",
+                                    mapping_id="two")])
+
+        self.user = Mock()
+        self.user.name = "johndoe"
+
+    @gen_test
+    def test_user_applications(self):
+        result = yield user_applications(self.webapp, self.user)
+
+        # The application with a missing image is skipped.
+        self.assertEqual([user_app.accounting.id for user_app in result],
+                         ["one", "two", "three"])
+        self.assertEqual([user_app.image.name for user_app in result],
+                         ["hello1", "hello2", "hello1"])
+        self.assertEqual([len(user_app.containers) for user_app in result],
+                         [0, 1, 0])
+
+        # Each image is looked up once, one at a time.
+        self.assertEqual(sorted(self.lookups),
+                         ["hello1", "hello2", "missing"])
+        self.assertEqual(self.max_concurrent, 1)
+
+        manager = self.webapp.container_manager
+        self.assertEqual(manager.find_containers.call_args[1],
+                         {"user_name": "johndoe"})
+        self.assertFalse(self.webapp.log.warning.called)
+
+    @gen_test
+    def test_duplicate_containers(self):
+        self.webapp.container_manager.find_containers = mock_coro_factory(
+            return_value=[
+                Container(docker_id="first", url_id="yyy", mapping_id="two"),
+                Container(docker_id="second", url_id="zzz", mapping_id="two"),
+            ])
+
+        result = yield user_applications(self.webapp, self.user)
+
+        # Reported, not discarded.
+        self.assertEqual(
+            [c.docker_id for c in result[1].containers], ["first", "second"])
+        self.assertTrue(self.webapp.log.warning.called)
+        self.assertIn("second", self.webapp.log.warning.call_args[0][0])
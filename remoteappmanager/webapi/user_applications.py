@@ -0,0 +1,80 @@
+import collections
+
+from tornado import gen
+
+#: An application the user has access to: the accounting entry granting
+#: the access, the docker image, and the containers the user is running
+#: for this accounting entry.
+UserApplication = collections.namedtuple(
+    "UserApplication", ["accounting", "image", "containers"])
+
+
+@gen.coroutine
+def user_applications(webapp, user):
+    """Retrieves the applications the user has access to.
+
+    The accounting is read once, each image is looked up once even
+    if used by several applications, and the containers of the user are
+    listed once instead of once per application.
+
+    Parameters
+    ----------
+    webapp: BaseApplication
+        The tornado application
+    user: User
+        The user
+
+    Return
+    ------
+    A list of UserApplication, in the accounting order. The applications
+    whose image is no longer available in docker are skipped. A user
+    should run at most one container per application: the duplicates
+    are logged, and the callers report the first container.
+    """
+    accountings = yield webapp.async_db.get_accounting_for_user(
+        user.account)
+
+    image_names = sorted({accounting.application.image
+                          for accounting in accountings})
+    images = yield [_lookup_image(webapp, image_name)
+                    for image_name in image_names]
+    images = dict(zip(image_names, images))
+
+    containers = yield webapp.container_manager.find_containers(
+        user_name=user.name)
+    containers_by_mapping = {}
+    for container in containers:
+        containers_by_mapping.setdefault(
+            container.mapping_id, []).append(container)
+
+    result = []
+    for accounting in accountings:
+        image = images[accounting.application.image]
+        if image is None:
+            # The user has access to an application that is no longer
+            # available in docker. We just move on.
+            continue
+
+        app_containers = containers_by_mapping.get(accounting.id, [])
+        if len(app_containers) > 1:
+            webapp.log.warning(
+                "Found {} containers for user {} and mapping {}: {}. "
+                "Only the first one is reported.".format(
+                    len(app_containers),
+                    user.name,
+                    accounting.id,
+                    ", ".join(c.docker_id for c in app_containers)))
+
+        result.append(UserApplication(accounting, image, app_containers))
+
+    return result
+
+
+@gen.coroutine
+def _lookup_image(webapp, image_name):
+    """Looks up an image, waiting for a free slot so that a user with
+    many applications does not flood docker with queries."""
+    with (yield webapp.image_lookup_slots.acquire()):
+        image = yield webapp.container_manager.image(image_name)
+
+    return image
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""Compares the sqlite performance profiles of the remoteappmanager
+database under concurrent access.
+
+Several processes, as the per-user remoteappmanagers and the admin
+application do, share the same database file. Each one reads its
+accounting and, once in a while, grants and revokes an application.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import sqlalchemy.exc
+import tabulate
+
+from remoteappmanager.db.orm import ORMDatabase, SQLITE_PROFILES, Database
+
+NUM_APPLICATIONS = 10
+
+
+def create_database(path, num_users):
+    """Creates the database, with one user per process and a few
+    applications granted to each of them."""
+    Database("sqlite:///"+path).reset()
+    database = ORMDatabase("sqlite:///"+path)
+    for i in range(NUM_APPLICATIONS):
+        database.create_application("app{}".format(i))
+
+    grants = []
+    for i in range(num_users):
+        database.create_user("user{}".format(i))
+        grants.extend(
+            dict(app_name="app{}".format(j), user_name="user{}".format(i))
+            for j in range(NUM_APPLICATIONS // 2))
+    database.grant_access_bulk(grants)
+
+
+def worker(path, profile, index, duration, write_ratio, results):
+    """Reads the accounting of a user and writes, for the given
+    duration. Puts (operations, errors, max latency) in results."""
+    database = ORMDatabase("sqlite:///"+path,
+                           accounting_cache_ttl=0,
+                           sqlite_profile=profile)
+    user_name = "user{}".format(index)
+    user = database.get_user(user_name=user_name)
+
+    operations = errors = 0
+    max_latency = 0.0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        start = time.monotonic()
+        try:
+            if operations % write_ratio == 0:
+                app_name = "app{}".format(
+                    NUM_APPLICATIONS - 1 - operations % 3)
+                database.grant_access(app_name, user_name, False, False, None)
+                database.revoke_access(app_name, user_name,
+                                       False, False, None)
+            else:
+                database.get_accounting_for_user(user)
+        except sqlalchemy.exc.OperationalError:
+            errors += 1
+        operations += 1
+        max_latency = max(max_latency, time.monotonic() - start)
+
+    results.put((operations, errors, max_latency))
+
+
+def run(profile, num_processes, duration, write_ratio):
+    """Runs the workers on a fresh database with the given profile."""
+    tempdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tempdir, "remoteappmanager.db")
+        create_database(path, num_processes)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(path, profile, i, duration, write_ratio, results))
+            for i in range(num_processes)]
+
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(tempdir)
+
+    operations = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    max_latency = max(outcome[2] for outcome in outcomes)
+    return [profile,
+            operations,
+            "{:.0f}".format(operations / duration),
+            errors,
+            "{:.3f}".format(max_latency)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=8,
+                        help="Number of processes sharing the database")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Duration (s) of each run")
+    parser.add_argument("--write-ratio", type=int, default=20,
+                        help="One operation in WRITE_RATIO is a write")
+    parser.add_argument("--profiles", nargs="+",
+                        default=sorted(SQLITE_PROFILES),
+                        choices=sorted(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    table = [run(profile, args.processes, args.duration, args.write_ratio)
+             for profile in args.profiles]
+
+    print(tabulate.tabulate(
+        table,
+        headers=["Profile", "Operations", "Ops/s", "Errors",
+                 "Max latency (s)"]))
+
+
+if __name__ == "__main__":
+    main()
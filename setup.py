@@ -46,7 +46,7 @@ on_rtd = os.environ.get('READTHEDOCS') == 'True'
 if on_rtd:
     # These are the dependencies of jupyterhub that we need to have in order
     # for our code to import on RTD.
-    requirements.extend(["sqlalchemy>=1.0"])
+    requirements.extend(["sqlalchemy>=1.0", "alembic>=0.8"])
 else:
     requirements.extend([
         "jupyterhub>0.7",